@@ -2,6 +2,10 @@
 ASGI config for kucms project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Async views such as ``kucms.async_views.async_login`` run natively on its
+event loop; run it with an ASGI server, e.g. ``uvicorn config.asgi:application``.
+The ``events/`` Server-Sent Events stream needs it: each subscriber is an
+idle coroutine here, where under WSGI it would hold a worker thread.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
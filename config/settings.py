@@ -137,8 +137,15 @@ AUTH_PASSWORD_VALIDATORS = [
 #
 #
 # }
+# Set JWT_STATELESS_AUTH=True to authenticate API calls from token claims
+# without loading the user from the database. Token revocation markers are
+# then kept in the cache, so it needs a shared CACHE_BACKEND (see CACHES)
+JWT_STATELESS_AUTH = os.getenv("JWT_STATELESS_AUTH", "False").lower() == "true"
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'kucms.authentication.StatelessJWTAuthentication'
+        if JWT_STATELESS_AUTH else
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
@@ -149,10 +156,94 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'kucms.tokens.KucmsTokenObtainPairSerializer',
+}
+
+# Raise instead of logging when a view exceeds its declared query budget
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "False").lower() == "true"
+
+# CSV student import: rows per bulk insert and password hashing processes
+STUDENT_IMPORT_BATCH_SIZE = int(os.getenv("STUDENT_IMPORT_BATCH_SIZE", "500"))
+STUDENT_IMPORT_WORKERS = int(os.getenv("STUDENT_IMPORT_WORKERS", "0")) or None
+
+# Background jobs: a running job whose worker has not renewed its heartbeat
+# for JOB_LEASE_SECONDS is claimed again, up to JOB_MAX_ATTEMPTS runs in all
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Async login: password hashing threads and how many hashes each event loop
+# may queue before further logins are refused with 503
+LOGIN_HASH_WORKERS = int(os.getenv("LOGIN_HASH_WORKERS", "4"))
+LOGIN_HASH_QUEUE_DEPTH = int(os.getenv("LOGIN_HASH_QUEUE_DEPTH", "64"))
+
+# Seconds a user's resolved course scope stays cached
+ACADEMIC_SCOPE_CACHE_TIMEOUT = int(os.getenv("ACADEMIC_SCOPE_CACHE_TIMEOUT", "600"))
+
+# Rows per INSERT ... ON DUPLICATE KEY UPDATE when bulk recording attendance
+ATTENDANCE_BULK_BATCH_SIZE = int(os.getenv("ATTENDANCE_BULK_BATCH_SIZE", "500"))
+# Where attendance marks live: 'rows' (one Attendance row per class day) or
+# 'bitmap' (one AttendanceMonth row per student, course and month). Run
+# backfill_attendance_months before switching to 'bitmap'.
+ATTENDANCE_STORAGE = os.getenv("ATTENDANCE_STORAGE", "rows")
+# Serve large GET lists (grades, attendance, courses) from .values() rows
+# instead of model instances; the JSON is the same either way
+VALUES_SERIALIZERS = os.getenv("VALUES_SERIALIZERS", "True").lower() == "true"
+
+
+# Scopes, token revocation markers and cached responses live here; use a
+# shared backend (e.g. Redis or Memcached) when running several processes
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Seconds a cached list response is kept for course-scoped readers
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", "300"))
+# The dashboard's due-assignment window moves with the clock, so keep it shorter
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", "120"))
 
 # Add media settings if not already present
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploads that must never be served, e.g. student CSVs with passwords
+# waiting for the import worker; keep it outside MEDIA_ROOT
+PRIVATE_UPLOAD_ROOT = os.getenv("PRIVATE_UPLOAD_ROOT", os.path.join(BASE_DIR, 'private'))
+
+# How course file downloads are delivered once permission is checked:
+# 'django' streams them (with Range support), 'nginx' uses X-Accel-Redirect
+# to FILE_ACCEL_PREFIX, 'sendfile' uses X-Sendfile
+FILE_DELIVERY = os.getenv("FILE_DELIVERY", "django")
+FILE_ACCEL_PREFIX = os.getenv("FILE_ACCEL_PREFIX", "/protected-media/")
+SIGNED_FILE_URL_MAX_AGE = int(os.getenv("SIGNED_FILE_URL_MAX_AGE", "300"))
+
+# Start-of-year rollover: academic years begin in this month, and students
+# are promoted this many per transaction
+ACADEMIC_YEAR_START_MONTH = int(os.getenv("ACADEMIC_YEAR_START_MONTH", "8"))
+ROLLOVER_BATCH_SIZE = int(os.getenv("ROLLOVER_BATCH_SIZE", "1000"))
+# Rows per transaction when archive_academic_year moves a closed year out
+# of the attendance, grade and comment tables
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# Chunked uploads: partial files live in UPLOAD_SESSION_DIR until finalized
+UPLOAD_SESSION_DIR = os.path.join(MEDIA_ROOT, 'partial-uploads')
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(5 * 1024 * 1024)))
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", str(32 * 1024 * 1024)))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(2 * 1024 * 1024 * 1024)))
+
+# Live event stream (kucms.events): MemoryBackend serves one ASGI process,
+# kucms.events.CacheBackend shares events through a shared CACHES backend.
+# EVENTS_HISTORY events are kept for clients resuming with Last-Event-ID.
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "kucms.events.MemoryBackend")
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+# Seconds between heartbeats on an idle stream, and before the server closes
+# a stream so the client reconnects (and re-resolves its courses)
+EVENT_STREAM_HEARTBEAT = int(os.getenv("EVENT_STREAM_HEARTBEAT", "15"))
+EVENT_STREAM_MAX_AGE = int(os.getenv("EVENT_STREAM_MAX_AGE", "3600"))
+# Milliseconds browsers wait before reconnecting a dropped stream
+EVENT_STREAM_RETRY = int(os.getenv("EVENT_STREAM_RETRY", "3000"))
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -16,10 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 
+# Uploaded files are not served from MEDIA_URL; they go through the
+# permission-checked download actions and signed links in kucms.files
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('kucms/', include('kucms.urls')),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
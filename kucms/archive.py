@@ -0,0 +1,350 @@
+"""
+Archival of closed academic years.
+
+Attendance, grades and comments of courses whose class belongs to a closed
+academic year are moved into Archived* tables, so that the hot tables and
+their indexes only hold the years still in use. A run first copies each
+table into the archive in primary-key batches, checkpointing as it goes,
+then marks the year complete, and finally deletes the copied rows from the
+hot tables. Reads of an archived year go to the archive from that point on,
+so no row is ever invisible. Whether a year is archived is always read from
+AcademicYearArchive, never from a per-process cache, so every worker
+switches the moment the year is complete. Writes to courses of an archived
+year are refused (ensure_not_archived), and a last copy pass once the year
+is complete picks up rows written while the first pass ran. Each purge
+batch locks its hot rows and compares them with their copies first, so a
+row edited or deleted after it was copied is re-copied or dropped from the
+archive rather than lost.
+
+With ATTENDANCE_STORAGE = 'bitmap' attendance is copied from the
+AttendanceMonth rows instead, expanded into one ArchivedAttendance row per
+mark. Those take negated record ids (see kucms.attendance_bitmap), which
+cannot collide with the ids of Attendance rows archived from other years.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Exists, OuterRef, QuerySet, When
+from django.utils import timezone
+
+from .attendance import summaries_suspended
+from .attendance_bitmap import bitmap_storage_enabled, day_bit, days_of, record_id
+from .models import (
+    AcademicYearArchive, AnnouncementComment, ArchivedAnnouncementComment, ArchivedAssignmentComment,
+    ArchivedAttendance, ArchivedGrade, AssignmentComment, Attendance, AttendanceMonth, Class, Grade
+)
+from .pagination import comment_count
+from .rollover import current_academic_year, start_year, valid_academic_year
+
+# kind -> (hot model, archive model, lookup from the hot row to its academic year)
+ARCHIVES = {
+    'attendance': (Attendance, ArchivedAttendance, 'course__class_group__academic_year'),
+    'grade': (Grade, ArchivedGrade, 'course__class_group__academic_year'),
+    'assignment_comment': (
+        AssignmentComment, ArchivedAssignmentComment, 'assignment__course__class_group__academic_year'
+    ),
+    'announcement_comment': (
+        AnnouncementComment, ArchivedAnnouncementComment, 'announcement__course__class_group__academic_year'
+    ),
+}
+
+# Attendance kept as month bitmaps, archived into the same table as Attendance rows
+MONTH_ARCHIVE = (AttendanceMonth, ArchivedAttendance, 'course__class_group__academic_year')
+
+_state = threading.local()
+
+
+@contextmanager
+def purging():
+    """
+    Mark hot-table deletes as moves into the archive, so signal handlers
+    keep what describes the row (search documents) rather than removing it
+    """
+    previous = getattr(_state, 'purging', False)
+    _state.purging = True
+    try:
+        yield
+    finally:
+        _state.purging = previous
+
+
+def purge_in_progress():
+    return getattr(_state, 'purging', False)
+
+
+def archived_year_exists(academic_year):
+    """
+    Exists() of a complete archive of academic_year, which may be an OuterRef
+    """
+    return Exists(AcademicYearArchive.objects.filter(status='complete', academic_year=academic_year))
+
+
+def complete_years():
+    """
+    Subquery of the academic years whose reads have switched to the archive
+    """
+    return AcademicYearArchive.objects.filter(status='complete').values('academic_year')
+
+
+def is_archived(academic_year):
+    return AcademicYearArchive.objects.filter(status='complete', academic_year=academic_year).exists()
+
+
+def course_archived(course_id):
+    """
+    Whether a course belongs to an archived year, in one query
+    """
+    return AcademicYearArchive.objects.filter(
+        status='complete',
+        academic_year__in=Class.objects.filter(course__id=course_id).values('academic_year'),
+    ).exists()
+
+
+def ensure_not_archived(course_id):
+    """
+    Refuse writes to courses of archived years, whose reads come from the archive
+    """
+    if course_archived(course_id):
+        raise ValidationError({'course': ['This course belongs to an archived academic year.']})
+
+
+def source_model(kind, academic_year):
+    """
+    The model holding `kind` rows of an academic year: the archive once the
+    year has been archived, the hot table otherwise
+    """
+    hot, archived, _ = ARCHIVES[kind]
+    return archived if academic_year and is_archived(academic_year) else hot
+
+
+def course_source(kind, course_id):
+    """
+    source_model for the academic year of a course, in one query
+    """
+    hot, archived, _ = ARCHIVES[kind]
+    return archived if course_archived(course_id) else hot
+
+
+def year_queryset(kind, academic_year):
+    """
+    `kind` rows of one academic year, from whichever table holds them
+    """
+    hot, archived, year_lookup = ARCHIVES[kind]
+    if is_archived(academic_year):
+        return archived.objects.filter(academic_year=academic_year)
+    return hot.objects.filter(**{year_lookup: academic_year})
+
+
+class ArchiveChain:
+    """
+    Archived rows followed by the hot rows of the years still in use, read
+    as one sequence Django's Paginator can count and slice.
+
+    Each part is an ordered queryset (or MonthRecords); a slice only queries
+    the parts it covers.
+    """
+    def __init__(self, *parts):
+        self.parts = parts
+        self._lengths = None
+
+    def lengths(self):
+        if self._lengths is None:
+            self._lengths = [part.count() if isinstance(part, QuerySet) else len(part) for part in self.parts]
+        return self._lengths
+
+    def count(self):
+        return sum(self.lengths())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('ArchiveChain only supports slicing')
+        start, stop, _ = index.indices(self.count())
+        items = []
+        offset = 0
+        for part, length in zip(self.parts, self.lengths()):
+            if start < offset + length and stop > offset:
+                items.extend(part[max(start - offset, 0):stop - offset])
+            offset += length
+        return items
+
+
+def comment_count_expression(kind, parent_field):
+    """
+    comment_count annotation reading archived threads from the archive
+    """
+    hot, archived, _ = ARCHIVES[kind]
+    return Case(
+        When(archived_year_exists(OuterRef('course__class_group__academic_year')),
+             then=comment_count(archived, parent_field)),
+        default=comment_count(hot, parent_field),
+    )
+
+
+def closed_year(academic_year):
+    """
+    Whether an academic year has ended and may be archived
+    """
+    # Compared by start year: as strings, '2026' sorts before '2026-2027'
+    return valid_academic_year(academic_year) and start_year(academic_year) < start_year(current_academic_year())
+
+
+def archive_kinds():
+    """
+    The tables archive_academic_year copies, attendance from wherever it is stored
+    """
+    if bitmap_storage_enabled():
+        return ['attendance_month' if kind == 'attendance' else kind for kind in ARCHIVES]
+    return list(ARCHIVES)
+
+
+def archive_source(kind):
+    return MONTH_ARCHIVE if kind == 'attendance_month' else ARCHIVES[kind]
+
+
+def archived_copies(kind, academic_year, rows):
+    """
+    Unsaved archive rows for values() of hot rows
+    """
+    _, archived, _ = archive_source(kind)
+    if kind != 'attendance_month':
+        return [archived(academic_year=academic_year, **row) for row in rows]
+    return [
+        archived(
+            id=-record_id(row['id'], day), academic_year=academic_year, course_id=row['course_id'],
+            student_id=row['student_id'], date=day, is_present=bool(row['present'] & day_bit(day)),
+        )
+        for row in rows
+        for day in days_of(row['month'], row['marked'])
+    ]
+
+
+def archived_range(kind, after, last):
+    """
+    Filter for the archive rows copied from hot rows with pk in (after, last]
+    """
+    if kind != 'attendance_month':
+        return {'pk__gt': after, 'pk__lte': last}
+    # Days 1 to 31 of each month row, negated
+    return {'pk__gte': -(last * 32 + 31), 'pk__lt': -(after * 32 + 31)}
+
+
+def copy_batch(archive, kind, batch_size):
+    """
+    Copy the next batch of a table after its checkpoint; returns rows copied
+    """
+    hot, archived, year_lookup = archive_source(kind)
+    fields = [field.attname for field in hot._meta.concrete_fields]
+    with transaction.atomic():
+        archive = AcademicYearArchive.objects.select_for_update().get(pk=archive.pk)
+        last_pk = archive.checkpoints.get(kind, 0)
+        rows = list(
+            hot.objects.filter(**{year_lookup: archive.academic_year}, pk__gt=last_pk)
+            .order_by('pk').values(*fields)[:batch_size]
+        )
+        if rows:
+            copies = archived_copies(kind, archive.academic_year, rows)
+            archived.objects.bulk_create(copies, ignore_conflicts=True)
+            archive.checkpoints[kind] = rows[-1]['id']
+            archive.copied[kind] = archive.copied.get(kind, 0) + len(copies)
+            archive.save(update_fields=['checkpoints', 'copied'])
+    return archive, len(rows)
+
+
+def purge_batch(archive, kind, batch_size):
+    """
+    Move the next batch of copied hot rows out of the hot table; returns rows deleted.
+
+    The batch is locked and checked against the archive first: copies of
+    rows edited since they were copied are replaced, copies of rows deleted
+    or moved out of the year since are removed, and rows missing from the
+    archive are copied. The purge checkpoint advances in the same
+    transaction, so an interrupted purge resumes after the last batch.
+    """
+    hot, archived, year_lookup = archive_source(kind)
+    fields = [field.attname for field in hot._meta.concrete_fields]
+    archived_fields = [field.attname for field in archived._meta.concrete_fields]
+    checkpoint = archive.checkpoints.get(kind, 0)
+    after = archive.checkpoints.get(f'{kind}:purged', 0)
+    if after >= checkpoint:
+        return 0
+    # Summaries keep counting archived attendance; search keeps archived comments
+    with transaction.atomic(), summaries_suspended(), purging():
+        rows = list(
+            hot.objects.select_for_update(of=('self',))
+            .filter(**{year_lookup: archive.academic_year}, pk__gt=after, pk__lte=checkpoint)
+            .order_by('pk').values(*fields)[:batch_size]
+        )
+        last = rows[-1]['id'] if len(rows) == batch_size else checkpoint
+        stored = {
+            row['id']: row for row in archived.objects.filter(
+                academic_year=archive.academic_year, **archived_range(kind, after, last)
+            ).values(*archived_fields)
+        }
+        copies = archived_copies(kind, archive.academic_year, rows)
+        stale = [
+            copy for copy in copies
+            if stored.get(copy.pk) != {name: getattr(copy, name) for name in archived_fields}
+        ]
+        current = {copy.pk for copy in copies}
+        outdated = [pk for pk in stored if pk not in current] + [copy.pk for copy in stale if copy.pk in stored]
+        if outdated:
+            archived.objects.filter(pk__in=outdated).delete()
+        if stale:
+            archived.objects.bulk_create(stale)
+        hot.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        archive.checkpoints[f'{kind}:purged'] = last
+        archive.purged[kind] = archive.purged.get(kind, 0) + len(rows)
+        AcademicYearArchive.objects.filter(pk=archive.pk).update(
+            checkpoints=archive.checkpoints, purged=archive.purged
+        )
+    return len(rows)
+
+
+def archive_academic_year(academic_year, batch_size=None, user=None, progress=None):
+    """
+    Move a closed academic year into the archive tables, resuming an interrupted run.
+
+    progress, if given, is called with (phase, kind, rows) after each batch.
+    """
+    if not closed_year(academic_year):
+        raise ValueError(f'{academic_year} has not ended yet')
+    batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 1000)
+    archive, _ = AcademicYearArchive.objects.get_or_create(
+        academic_year=academic_year, defaults={'created_by_id': user.id if user else None}
+    )
+    kinds = archive_kinds()
+
+    def copy_all(archive):
+        for kind in kinds:
+            while True:
+                archive, count = copy_batch(archive, kind, batch_size)
+                if progress:
+                    progress('copy', kind, archive.copied.get(kind, 0))
+                if count < batch_size:
+                    break
+        return archive
+
+    try:
+        archive = copy_all(archive)
+        if archive.status != 'complete':
+            archive.status = 'complete'
+            archive.finished_at = timezone.now()
+            archive.save(update_fields=['status', 'finished_at'])
+        # Writes are refused from here on; copy what arrived during the first pass
+        archive = copy_all(archive)
+
+        for kind in kinds:
+            while purge_batch(archive, kind, batch_size):
+                if progress:
+                    progress('purge', kind, archive.purged.get(kind, 0))
+    except Exception:
+        if archive.status != 'complete':
+            AcademicYearArchive.objects.filter(pk=archive.pk).update(status='failed')
+        raise
+    return archive
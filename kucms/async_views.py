@@ -0,0 +1,206 @@
+"""
+Async views, served natively when the project runs under ASGI (config/asgi.py)
+"""
+import asyncio
+import json
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .events import get_backend
+from .models import User
+from .scope import get_scope
+from .tokens import KucmsRefreshToken
+
+# Password hashing is CPU bound, so it runs on a small dedicated pool rather
+# than the event loop or the default executor shared with sync_to_async
+hash_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'LOGIN_HASH_WORKERS', 4),
+    thread_name_prefix='login-hash',
+)
+# Per event loop: asyncio primitives belong to one loop, and under WSGI or
+# async_to_sync several loops run at once in different threads
+hash_slots = weakref.WeakKeyDictionary()
+
+
+def login_error(detail, status=400, retry_after=None):
+    response = JsonResponse({'detail': detail}, status=status)
+    if retry_after is not None:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+def hash_and_fail(password):
+    """
+    Spend a password hash for an unknown account, so it answers as slowly as a real one
+    """
+    make_password(password)
+    return False
+
+
+def hash_queue():
+    """
+    Semaphore bounding the hashes queued by the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in hash_slots:
+        hash_slots[loop] = asyncio.Semaphore(getattr(settings, 'LOGIN_HASH_QUEUE_DEPTH', 64))
+    return hash_slots[loop]
+
+
+async def check_password(user, password):
+    """
+    Verify a password on the hashing pool, refusing work once the queue is full.
+
+    With no user the password is still hashed, and the result is False.
+    """
+    queue = hash_queue()
+    if queue.locked():
+        return None
+    async with queue:
+        loop = asyncio.get_running_loop()
+        if user is None:
+            return await loop.run_in_executor(hash_executor, hash_and_fail, password)
+        return await loop.run_in_executor(hash_executor, user.check_password, password)
+
+
+@csrf_exempt
+@require_POST
+async def async_login(request):
+    """
+    Async counterpart of LoginView.
+
+    Unknown emails, wrong passwords and the wrong user type all get the same
+    answer after the same hashing work, so responses do not reveal which
+    accounts exist or their roles. Requests beyond the hashing queue depth
+    are shed with 503 instead of piling up.
+    """
+    try:
+        data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return login_error('Invalid JSON body.')
+    email = data.get('email')
+    password = data.get('password')
+    user_type = data.get('user_type')
+
+    if not email or not password:
+        return login_error('Email and password are required.')
+
+    user = await User.objects.filter(email=email, is_active=True).afirst()
+    valid = await check_password(user, password)
+    if valid is None:
+        return login_error('Too many login attempts in progress, retry shortly.', status=503, retry_after=1)
+    if not valid or user.user_type != user_type:
+        return login_error('Invalid credentials')
+
+    refresh = await sync_to_async(KucmsRefreshToken.for_user)(user)
+    return JsonResponse({
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'user_type': user.user_type,
+    })
+
+
+def stream_scope(request):
+    """
+    Authenticate like the REST API and resolve the caller's scope, or None.
+
+    EventSource cannot set headers, so a JWT may also be passed as
+    ?access_token=.
+    """
+    token = request.GET.get('access_token')
+    if token and 'HTTP_AUTHORIZATION' not in request.META:
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    api_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = api_request.user
+    except APIException:
+        return None
+    if not user or not user.is_authenticated:
+        return None
+    return get_scope(api_request)
+
+
+def sse_message(data, event=None, id=None):
+    lines = []
+    if id is not None:
+        lines.append(f'id: {id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_messages(scope, last_id):
+    """
+    SSE messages for one subscriber: their course events after last_id,
+    heartbeat comments while idle, and a resync event when events were lost.
+    """
+    backend = get_backend()
+    heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+    closes_at = time.monotonic() + getattr(settings, 'EVENT_STREAM_MAX_AGE', 3600)
+    yield f'retry: {getattr(settings, "EVENT_STREAM_RETRY", 3000)}\n\n'
+    last_sent = time.monotonic()
+    while True:
+        events, gap = await backend.read(last_id)
+        if gap:
+            # Missed events are gone; the client refetches and follows from now
+            last_id = await backend.latest_id()
+            yield sse_message({}, event='resync', id=last_id)
+            last_sent = time.monotonic()
+            events = [event for event in events if event.id > last_id]
+        for event in events:
+            last_id = event.id
+            if scope.can_view_course(event.course_id):
+                yield sse_message(event.data, event=event.type, id=event.id)
+                last_sent = time.monotonic()
+
+        now = time.monotonic()
+        if now >= closes_at:
+            return
+        if now - last_sent >= heartbeat:
+            # Keeps proxies from timing out an idle connection
+            yield ': heartbeat\n\n'
+            last_sent = now
+        await backend.wait(last_id, min(last_sent + heartbeat, closes_at) - now)
+
+
+@require_GET
+async def event_stream(request):
+    """
+    Server-Sent Events stream of new announcements and comments in the
+    caller's courses.
+
+    Pass the id of the last event seen as the Last-Event-ID header (browsers
+    do this when reconnecting) or the lastEventId parameter to resume after
+    it; otherwise the stream starts with the next event. The server closes
+    the stream after EVENT_STREAM_MAX_AGE seconds so that clients reconnect
+    with a fresh scope. Serve it through config/asgi.py: under WSGI each
+    subscriber holds a worker thread.
+    """
+    scope = await sync_to_async(stream_scope)(request)
+    if scope is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('lastEventId')
+    try:
+        last_id = int(last_id)
+    except (TypeError, ValueError):
+        last_id = await get_backend().latest_id()
+
+    response = StreamingHttpResponse(event_messages(scope, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
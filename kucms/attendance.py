@@ -0,0 +1,328 @@
+"""
+Attendance write paths shared by the API endpoints, and maintenance of the
+AttendanceSummary totals they feed.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from . import bitsets
+from .attendance_bitmap import (
+    bitmap_storage_enabled, course_marks, write_marks, clear_mark, day_bit, split_record_id,
+    expected_summaries as bitmap_expected_summaries
+)
+from .models import (
+    AcademicYearArchive, ArchivedAttendance, Attendance, AttendanceMonth, AttendanceSummary, Student
+)
+from .response_cache import bump_course_version
+
+UNIQUE_FIELDS = ['course', 'student', 'date']
+
+_state = threading.local()
+
+
+@contextmanager
+def summaries_suspended():
+    """
+    Stop signal handlers from touching AttendanceSummary, for bulk
+    maintenance that reconciles the totals itself afterwards
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def summaries_enabled():
+    return not getattr(_state, 'suspended', False)
+
+
+def summary_periods(date):
+    """
+    Summary periods a single attendance day counts towards
+    """
+    return ('', date.strftime('%Y-%m'))
+
+
+def add_contribution(deltas, student_id, course_id, date, is_present, sign=1):
+    """
+    Accumulate the effect of adding (sign=1) or removing (sign=-1) one mark
+    """
+    for period in summary_periods(date):
+        present, total = deltas[(student_id, course_id, period)]
+        deltas[(student_id, course_id, period)] = (
+            present + sign * int(is_present), total + sign
+        )
+
+
+def apply_summary_deltas(deltas):
+    """
+    Apply {(student_id, course_id, period): (present, total)} changes.
+
+    Missing summary rows are created empty first, then rows sharing the same
+    change are updated together, so a whole class costs a handful of queries.
+    """
+    deltas = {key: value for key, value in deltas.items() if value != (0, 0)}
+    if not deltas:
+        return
+    AttendanceSummary.objects.bulk_create(
+        [
+            AttendanceSummary(student_id=student_id, course_id=course_id, period=period)
+            for student_id, course_id, period in deltas
+        ],
+        ignore_conflicts=True,
+    )
+    # A mark changes a student's all-time and monthly rows alike, so both
+    # periods go in the same update
+    periods = defaultdict(set)
+    for (student_id, course_id, period), change in deltas.items():
+        periods[(student_id, course_id, change)].add(period)
+    groups = defaultdict(list)
+    for (student_id, course_id, change), student_periods in periods.items():
+        groups[(course_id, frozenset(student_periods), change)].append(student_id)
+    for (course_id, group_periods, (present, total)), student_ids in groups.items():
+        AttendanceSummary.objects.filter(
+            course_id=course_id, period__in=sorted(group_periods), student_id__in=student_ids
+        ).update(
+            present_count=F('present_count') + present,
+            total_count=F('total_count') + total,
+        )
+    for course_id in {course_id for _, course_id, _ in deltas}:
+        bump_course_version(course_id, 'records')
+
+
+def course_roster(course, student_ids=None):
+    """
+    Ids of the students enrolled in a course's class, optionally limited to student_ids
+    """
+    roster = Student.objects.filter(
+        program_id=course.class_group.program_id,
+        current_semester=course.class_group.semester,
+    )
+    if student_ids is not None:
+        roster = roster.filter(id__in=student_ids)
+    return set(roster.values_list('id', flat=True))
+
+
+def upsert_kwargs():
+    kwargs = {'update_conflicts': True, 'update_fields': ['is_present']}
+    # MySQL resolves conflicts on any unique key and rejects an explicit target
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = UNIQUE_FIELDS
+    return kwargs
+
+
+def record_attendance(course, date, marks, batch_size=None):
+    """
+    Create or update a day's attendance for a course in bulk.
+
+    `marks` maps student id to is_present. Students must belong to the
+    course roster. Returns the number of rows created and updated.
+    """
+    return record_marks(
+        course, {(student_id, date): is_present for student_id, is_present in marks.items()}, batch_size
+    )
+
+
+def record_marks(course, marks, batch_size=None):
+    """
+    Create or update attendance for a course across several days.
+
+    `marks` maps (student id, date) to is_present; see record_attendance.
+    """
+    from .archive import ensure_not_archived
+
+    ensure_not_archived(course.id)
+    batch_size = batch_size or getattr(settings, 'ATTENDANCE_BULK_BATCH_SIZE', 500)
+    student_ids = {student_id for student_id, _ in marks}
+    dates = {date for _, date in marks}
+
+    enrolled = course_roster(course, student_ids)
+    outsiders = sorted(student_ids - enrolled)
+    if outsiders:
+        raise ValidationError({'student_id': [f'Students not enrolled in this course: {outsiders}']})
+
+    # Callers that already hold a transaction (single-mark views) need no savepoint
+    with transaction.atomic(savepoint=False):
+        if bitmap_storage_enabled():
+            existing = write_marks(course, marks, batch_size)
+        else:
+            # Locked until the upsert commits, so a concurrent submission of
+            # the same sheet waits and then sees these marks as existing
+            existing = {
+                (student_id, date): is_present
+                for student_id, date, is_present in Attendance.objects.select_for_update().filter(
+                    course=course, date__in=dates, student_id__in=student_ids
+                ).values_list('student_id', 'date', 'is_present')
+                if (student_id, date) in marks
+            }
+            Attendance.objects.bulk_create(
+                [
+                    Attendance(course=course, student_id=student_id, date=date, is_present=is_present)
+                    for (student_id, date), is_present in marks.items()
+                ],
+                batch_size=batch_size,
+                **upsert_kwargs()
+            )
+
+        deltas = defaultdict(lambda: (0, 0))
+        for (student_id, date), is_present in marks.items():
+            if (student_id, date) in existing:
+                if existing[(student_id, date)] == is_present:
+                    continue
+                add_contribution(deltas, student_id, course.id, date, existing[(student_id, date)], sign=-1)
+            add_contribution(deltas, student_id, course.id, date, is_present)
+        apply_summary_deltas(deltas)
+
+    return {'created': len(marks) - len(existing), 'updated': len(existing)}
+
+
+def remove_mark(record):
+    """
+    Delete one attendance record from whichever storage holds it
+    """
+    if not bitmap_storage_enabled():
+        # Signal handlers take it out of the summaries
+        record.delete()
+        return
+    month_id, _ = split_record_id(record.pk)
+    with transaction.atomic(savepoint=False):
+        month = AttendanceMonth.objects.select_for_update().filter(pk=month_id).first()
+        if month is None or not month.marked & day_bit(record.date):
+            return
+        deltas = defaultdict(lambda: (0, 0))
+        add_contribution(
+            deltas, month.student_id, month.course_id, record.date,
+            bool(month.present & day_bit(record.date)), sign=-1
+        )
+        clear_mark(month, record.date)
+        apply_summary_deltas(deltas)
+
+
+def attendance_matrix(course, start=None, end=None, source=Attendance):
+    """
+    A course register as packed bitsets.
+
+    Dates are the days with any mark in [start, end]. Each student of the
+    roster, plus anyone with marks in the range, gets a `marked` bitset of
+    the days they have a record for and a `present` bitset of the days they
+    attended, both indexed like `dates`. `source` is the model the rows are
+    read from (ArchivedAttendance for an archived year).
+    """
+    if source is Attendance and bitmap_storage_enabled():
+        rows = list(course_marks(course, start, end))
+    else:
+        records = source.objects.filter(course=course)
+        if start:
+            records = records.filter(date__gte=start)
+        if end:
+            records = records.filter(date__lte=end)
+        rows = list(records.order_by('student_id', 'date').values_list('student_id', 'date', 'is_present'))
+
+    dates = sorted({date for _, date, _ in rows})
+    position = {date: index for index, date in enumerate(dates)}
+    marked = defaultdict(list)
+    present = defaultdict(list)
+    for student_id, date, is_present in rows:
+        marked[student_id].append(position[date])
+        if is_present:
+            present[student_id].append(position[date])
+
+    students = (
+        Student.objects.filter(
+            Q(program_id=course.class_group.program_id, current_semester=course.class_group.semester)
+            | Q(id__in=list(marked))
+        )
+        .order_by('registration_number', 'id')
+        .values('id', 'registration_number', 'user__first_name', 'user__last_name')
+    )
+    return {
+        'course_id': course.id,
+        'dates': dates,
+        'students': [
+            {
+                'id': student['id'],
+                'registration_number': student['registration_number'],
+                'name': f"{student['user__first_name']} {student['user__last_name']}".strip(),
+                'marked': bitsets.encode(marked[student['id']], len(dates)),
+                'present': bitsets.encode(present[student['id']], len(dates)),
+            }
+            for student in students
+        ],
+    }
+
+
+def expected_summaries(attendance):
+    """
+    Recompute summary totals from an Attendance queryset
+    """
+    rows = (
+        attendance
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('student_id', 'course_id', 'year', 'month')
+        .annotate(present=Count('id', filter=Q(is_present=True)), total=Count('id'))
+        .order_by()
+    )
+    totals = defaultdict(lambda: (0, 0))
+    for row in rows:
+        month = f"{row['year']:04d}-{row['month']:02d}"
+        for period in ('', month):
+            key = (row['student_id'], row['course_id'], period)
+            present, total = totals[key]
+            totals[key] = (present + row['present'], total + row['total'])
+    return totals
+
+
+def rebuild_summaries(course_ids):
+    """
+    Reconcile AttendanceSummary rows for some courses with the raw records.
+
+    Returns how many summary rows were created, corrected and deleted.
+    """
+    with transaction.atomic():
+        # Archived years count once, from the archive, even before their hot rows are purged
+        archived = AcademicYearArchive.objects.filter(status='complete').values_list('academic_year', flat=True)
+        if bitmap_storage_enabled():
+            expected = bitmap_expected_summaries(course_ids, exclude_years=archived)
+        else:
+            expected = expected_summaries(
+                Attendance.objects.filter(course_id__in=course_ids)
+                .exclude(course__class_group__academic_year__in=archived)
+            )
+        archived_totals = expected_summaries(
+            ArchivedAttendance.objects.filter(course_id__in=course_ids, academic_year__in=archived)
+        )
+        for key, (present, total) in archived_totals.items():
+            current_present, current_total = expected[key]
+            expected[key] = (current_present + present, current_total + total)
+        current = {
+            (summary.student_id, summary.course_id, summary.period): summary
+            for summary in AttendanceSummary.objects.filter(course_id__in=course_ids).select_for_update()
+        }
+        stale = [summary.pk for key, summary in current.items() if key not in expected]
+        changed = []
+        missing = []
+        for (student_id, course_id, period), (present, total) in expected.items():
+            summary = current.get((student_id, course_id, period))
+            if summary is None:
+                missing.append(AttendanceSummary(
+                    student_id=student_id, course_id=course_id, period=period,
+                    present_count=present, total_count=total,
+                ))
+            elif (summary.present_count, summary.total_count) != (present, total):
+                summary.present_count, summary.total_count = present, total
+                changed.append(summary)
+        AttendanceSummary.objects.filter(pk__in=stale).delete()
+        AttendanceSummary.objects.bulk_update(changed, ['present_count', 'total_count'], batch_size=1000)
+        AttendanceSummary.objects.bulk_create(missing, batch_size=1000)
+    for course_id in course_ids:
+        bump_course_version(course_id, 'records')
+    return {'created': len(missing), 'corrected': len(changed), 'deleted': len(stale)}
@@ -0,0 +1,281 @@
+"""
+Bitmap storage for attendance history.
+
+With ATTENDANCE_STORAGE = 'bitmap', marks are kept as one AttendanceMonth
+row per student, course and month, holding day bitmaps, instead of one
+Attendance row per class day. That is about twenty times fewer rows and
+index entries. Reads expand the bitmaps into unsaved Attendance objects, so
+serializers and reports see the same records either way. Their ids are
+month row id * 32 + day, which stay stable while the month row exists.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Attendance, AttendanceMonth
+
+
+def bitmap_storage_enabled():
+    return getattr(settings, 'ATTENDANCE_STORAGE', 'rows') == 'bitmap'
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def record_id(month_id, day):
+    return month_id * 32 + day.day
+
+
+def split_record_id(value):
+    """
+    (month row id, day of month) of an expanded record id
+    """
+    return divmod(int(value), 32)
+
+
+def days_of(month, bitmap):
+    """
+    Dates of a month whose bit is set in bitmap, in order
+    """
+    return [month.replace(day=bit + 1) for bit in range(31) if bitmap >> bit & 1]
+
+
+def month_rows(course_id=None, student_id=None, start=None, end=None):
+    rows = AttendanceMonth.objects.all()
+    if course_id is not None:
+        rows = rows.filter(course_id=course_id)
+    if student_id is not None:
+        rows = rows.filter(student_id=student_id)
+    if start:
+        rows = rows.filter(month__gte=month_of(start))
+    if end:
+        rows = rows.filter(month__lte=month_of(end))
+    return rows
+
+
+def expand(months, start=None, end=None):
+    """
+    Attendance records, in date order within each month row, for AttendanceMonth rows
+    """
+    for month in months:
+        student = month.student if AttendanceMonth.student.is_cached(month) else None
+        course = month.course if AttendanceMonth.course.is_cached(month) else None
+        for day in days_of(month.month, month.marked):
+            if (start and day < start) or (end and day > end):
+                continue
+            record = Attendance(
+                id=record_id(month.pk, day), course_id=month.course_id, student_id=month.student_id,
+                date=day, is_present=bool(month.present & day_bit(day)),
+            )
+            if student is not None:
+                record.student = student
+            if course is not None:
+                record.course = course
+            yield record
+
+
+class MonthRecords:
+    """
+    The records expanded from an ordered AttendanceMonth queryset, as a
+    sequence Django's Paginator can count and slice like a queryset of
+    Attendance rows.
+
+    Counting reads only each row's marked bitmap; a slice then loads and
+    expands just the month rows it covers.
+    """
+    def __init__(self, months):
+        self.months = months
+        self._starts = None
+
+    def starts(self):
+        """
+        [(month row id, index of its first record)], plus the total
+        """
+        if self._starts is None:
+            starts, total = [], 0
+            for pk, marked in self.months.values_list('pk', 'marked'):
+                starts.append((pk, total))
+                total += bin(marked).count('1')
+            self._starts = starts, total
+        return self._starts
+
+    def __len__(self):
+        return self.starts()[1]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('MonthRecords only supports slicing')
+        starts, total = self.starts()
+        start, stop, _ = index.indices(total)
+        covered = [
+            (pk, first) for position, (pk, first) in enumerate(starts)
+            if first < stop and (position + 1 == len(starts) or starts[position + 1][1] > start)
+        ]
+        if not covered:
+            return []
+        records = list(expand(self.months.filter(pk__in=[pk for pk, _ in covered])))
+        offset = start - covered[0][1]
+        return records[offset:offset + stop - start]
+
+
+def get_record(months, value):
+    """
+    The expanded record with id `value` among an AttendanceMonth queryset, or None
+    """
+    try:
+        month_id, day = split_record_id(value)
+    except (TypeError, ValueError):
+        return None
+    month = months.filter(pk=month_id).first()
+    if month is None:
+        return None
+    return next((record for record in expand([month]) if record.date.day == day), None)
+
+
+def course_marks(course, start=None, end=None):
+    """
+    (student_id, date, is_present) for a course, ordered by student and date
+    """
+    rows = (
+        month_rows(course.id, start=start, end=end)
+        .order_by('student_id', 'month')
+        .values_list('student_id', 'month', 'marked', 'present')
+    )
+    for student_id, month, marked, present in rows:
+        for day in days_of(month, marked):
+            if (start and day < start) or (end and day > end):
+                continue
+            yield student_id, day, bool(present & day_bit(day))
+
+
+def write_marks(course, marks, batch_size=None):
+    """
+    Store {(student_id, date): is_present} marks for a course.
+
+    Returns the previous value of marks that already existed. Month rows are
+    locked while they are rewritten, so call inside a transaction.
+    """
+    batch_size = batch_size or getattr(settings, 'ATTENDANCE_BULK_BATCH_SIZE', 500)
+    changes = defaultdict(lambda: [0, 0])
+    for (student_id, day), is_present in marks.items():
+        change = changes[(student_id, month_of(day))]
+        change[0] |= day_bit(day)
+        if is_present:
+            change[1] |= day_bit(day)
+    if not changes:
+        return {}
+
+    AttendanceMonth.objects.bulk_create(
+        [AttendanceMonth(student_id=student_id, course=course, month=month) for student_id, month in changes],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    rows = AttendanceMonth.objects.select_for_update().filter(
+        course=course,
+        student_id__in={student_id for student_id, _ in changes},
+        month__in={month for _, month in changes},
+    )
+    existing = {}
+    changed = []
+    for row in rows:
+        change = changes.get((row.student_id, row.month))
+        if change is None:
+            continue
+        bits, present = change
+        for day in days_of(row.month, row.marked & bits):
+            existing[(row.student_id, day)] = bool(row.present & day_bit(day))
+        row.marked |= bits
+        row.present = row.present & ~bits | present
+        changed.append(row)
+    AttendanceMonth.objects.bulk_update(changed, ['marked', 'present'], batch_size=batch_size)
+    return existing
+
+
+def clear_mark(month_row, day):
+    """
+    Remove one day from a locked month row, deleting the row once it is empty
+    """
+    bit = day_bit(day)
+    month_row.marked &= ~bit
+    month_row.present &= ~bit
+    if month_row.marked:
+        month_row.save(update_fields=['marked', 'present'])
+    else:
+        month_row.delete()
+
+
+def expected_summaries(course_ids, exclude_years=()):
+    """
+    Summary totals recomputed from the month rows of some courses, leaving
+    out those of courses in exclude_years
+    """
+    totals = defaultdict(lambda: (0, 0))
+    rows = AttendanceMonth.objects.filter(course_id__in=course_ids).exclude(
+        course__class_group__academic_year__in=exclude_years
+    ).values_list(
+        'student_id', 'course_id', 'month', 'marked', 'present'
+    )
+    for student_id, course_id, month, marked, present in rows:
+        for period in ('', month.strftime('%Y-%m')):
+            key = (student_id, course_id, period)
+            present_total, total = totals[key]
+            totals[key] = (present_total + bin(present).count('1'), total + bin(marked).count('1'))
+    return totals
+
+
+def backfill_course(course_id, delete_rows=False, batch_size=1000):
+    """
+    Rebuild a course's month rows from its Attendance rows.
+
+    Existing month rows of the course are replaced, so this can be repeated
+    while the rows are kept. With delete_rows the Attendance rows are removed in the same
+    transaction. Returns (attendance rows read, month rows written).
+
+    Only runs while attendance is served from the rows: once it is served
+    from the bitmaps, the month rows hold marks the Attendance rows lack and
+    replacing them would lose those.
+    """
+    from .attendance import summaries_suspended
+
+    if bitmap_storage_enabled():
+        raise ValueError('Cannot backfill month rows while ATTENDANCE_STORAGE is bitmap')
+    months = defaultdict(lambda: [0, 0])
+    count = 0
+    with transaction.atomic():
+        records = (
+            Attendance.objects.filter(course_id=course_id)
+            .values_list('pk', 'student_id', 'date', 'is_present')
+            .iterator(chunk_size=batch_size)
+        )
+        pks = []
+        for pk, student_id, day, is_present in records:
+            month = months[(student_id, month_of(day))]
+            month[0] |= day_bit(day)
+            if is_present:
+                month[1] |= day_bit(day)
+            pks.append(pk)
+            count += 1
+        if not count:
+            # Nothing to rebuild from, e.g. the rows were already moved
+            return 0, 0
+        AttendanceMonth.objects.filter(course_id=course_id).delete()
+        AttendanceMonth.objects.bulk_create(
+            [
+                AttendanceMonth(student_id=student_id, course_id=course_id, month=month,
+                                marked=marked, present=present)
+                for (student_id, month), (marked, present) in months.items()
+            ],
+            batch_size=batch_size,
+        )
+        if delete_rows:
+            # The totals are unchanged; the marks only move to the month rows
+            with summaries_suspended():
+                for start in range(0, len(pks), batch_size):
+                    Attendance.objects.filter(pk__in=pks[start:start + batch_size]).delete()
+    return count, len(months)
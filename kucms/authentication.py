@@ -0,0 +1,80 @@
+"""
+Stateless JWT authentication.
+
+StatelessJWTAuthentication trusts the signed claims written by
+KucmsRefreshToken instead of loading the User row on every request. A
+cache entry per user records when their tokens were revoked (account
+deactivated, password changed, or a change to the role or profile the
+claims were copied from); tokens from logins before that point are
+refused until they expire. The markers must be seen by every process, so
+kucms.checks refuses a per-process default cache while this is enabled.
+"""
+import time
+
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+REQUIRED_CLAIMS = ('user_type', 'auth_time')
+PROFILE_CLAIMS = ('student_id', 'faculty_id', 'program_id', 'semester', 'scope_gen')
+
+
+def revocation_key(user_id):
+    return f'kucms:auth:revoked:{user_id}'
+
+
+def revoke_user_tokens(user_id):
+    """
+    Refuse every token issued to a user before now.
+
+    The marker only has to outlive the longest-lived token.
+    """
+    lifetime = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    cache.set(revocation_key(user_id), time.time(), timeout=int(lifetime) + 60)
+
+
+def tokens_revoked_at(user_id):
+    return cache.get(revocation_key(user_id))
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user backed entirely by token claims
+    """
+    @cached_property
+    def user_type(self):
+        return self.token.get('user_type')
+
+    @cached_property
+    def profile_claims(self):
+        return {claim: self.token.get(claim) for claim in PROFILE_CLAIMS}
+
+    def __eq__(self, other):
+        other_id = getattr(other, 'pk', None)
+        if other_id is None:
+            return NotImplemented
+        return str(self.id) == str(other_id)
+
+    __hash__ = TokenUser.__hash__
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds the user from claims with no queries.
+
+    Tokens issued before the kucms claims existed fall back to the regular
+    database lookup.
+    """
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in REQUIRED_CLAIMS):
+            return super().get_user(validated_token)
+
+        user = ClaimsUser(validated_token)
+        revoked_at = tokens_revoked_at(user.id)
+        if revoked_at is not None and validated_token['auth_time'] <= revoked_at:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return user
+
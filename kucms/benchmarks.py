@@ -0,0 +1,379 @@
+"""
+Endpoint benchmark runner.
+
+Walks every route registered on the kucms router and times it as an admin,
+a faculty member and a student, recording latency percentiles, query counts
+and payload sizes.
+"""
+import random
+import time
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .models import User, Faculty, Student, Course, Attendance, AttendanceMonth, Grade
+from .serializers import (
+    AttendanceSerializer, AttendanceValuesSerializer, CourseSerializer, CourseValuesSerializer,
+    GradeSerializer, GradeValuesSerializer
+)
+from .urls import router
+
+URL_PREFIX = '/kucms/'
+ROLES = ('admin', 'faculty', 'student')
+# Detail actions serving the object's file, skipped for objects without one
+FILE_ACTIONS = ('download', 'signed_url')
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of samples
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def benchmark_users(roles=None):
+    """
+    Pick one representative user per role from the current database.
+
+    Raises CommandError when one of roles (all of them by default) has no
+    such user, rather than leaving it out of the results.
+    """
+    users = {
+        'admin': User.objects.filter(is_staff=True, is_active=True).order_by('pk').first(),
+        'faculty': None,
+        'student': None,
+    }
+    faculty = Faculty.objects.filter(course__isnull=False).select_related('user').order_by('pk').first()
+    if faculty:
+        users['faculty'] = faculty.user
+    for student in Student.objects.select_related('user').order_by('pk')[:50]:
+        if Course.objects.filter(
+            class_group__program_id=student.program_id,
+            class_group__semester=student.current_semester
+        ).exists():
+            users['student'] = student.user
+            break
+    roles = roles or ROLES
+    missing = [role for role in roles if users[role] is None]
+    if missing:
+        raise CommandError(
+            f"No {', '.join(missing)} user to benchmark as; seed the database "
+            f"with seed_university or create one"
+        )
+    return {role: users[role] for role in roles}
+
+
+def benchmark_course_id(user):
+    """
+    A course whose attendance register user may view
+    """
+    courses = Course.objects.all()
+    if user.user_type == 'faculty':
+        courses = courses.filter(faculty__user=user)
+    return courses.order_by('pk').values_list('pk', flat=True).first()
+
+
+def action_params(user, prefix, action):
+    """
+    Query parameters needed by list-level actions that cannot run bare, or
+    None to skip an action user may not call
+    """
+    if prefix == 'attendance' and action in ('matrix', 'course_summary'):
+        if user.user_type == 'student':
+            return None
+        course_id = benchmark_course_id(user)
+        if course_id is None:
+            return None
+        return {'course_id': course_id}
+    if prefix == 'attendance' and action == 'student_report':
+        student = Student.objects.filter(attendance__isnull=False)
+        if user.user_type == 'student':
+            student = student.filter(user=user)
+        elif user.user_type == 'faculty':
+            student = student.filter(attendance__course__faculty__user=user)
+        student = student.order_by('pk').first()
+        if student is None:
+            return None
+        course_id = student.attendance_set.order_by('pk').values_list('course_id', flat=True).first()
+        return {'student_id': student.id, 'course_id': course_id}
+    return {}
+
+
+def discover_endpoints(client, user):
+    """
+    Yield (name, url, params) for every GET route on the router visible to user
+    """
+    for prefix, viewset, basename in router.registry:
+        if not hasattr(viewset, 'list'):
+            # Nothing to list, so no object to request either
+            continue
+        list_url = f'{URL_PREFIX}{prefix}/'
+        yield f'{basename}-list', list_url, {}
+
+        response = client.get(list_url)
+        detail = None
+        if response.status_code == 200:
+            data = response.json()
+            results = data.get('results', data) if isinstance(data, dict) else data
+            if results:
+                detail = results[0]
+        if detail is not None:
+            yield f'{basename}-detail', f"{list_url}{detail['id']}/", {}
+
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping:
+                continue
+            if extra.detail:
+                if detail is None:
+                    continue
+                if extra.__name__ in FILE_ACTIONS and not detail.get('file'):
+                    continue
+                url = f"{list_url}{detail['id']}/{extra.url_path}/"
+            else:
+                url = f'{list_url}{extra.url_path}/'
+            params = action_params(user, prefix, extra.__name__)
+            if params is None:
+                continue
+            yield f'{basename}-{extra.url_name}', url, params
+
+
+def time_endpoint(client, url, params, iterations):
+    """
+    Request url repeatedly and summarise latency, queries and payload size
+    """
+    client.get(url, params)  # warm caches and lazy imports
+    samples = []
+    queries = 0
+    size = 0
+    status_code = None
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            samples.append((time.perf_counter() - start) * 1000)
+        queries = len(captured)
+        size = len(response.content)
+        status_code = response.status_code
+    return {
+        'status': status_code,
+        'p50_ms': round(percentile(samples, 0.50), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+        'queries': queries,
+        'bytes': size,
+    }
+
+
+def run_benchmarks(iterations=20, roles=None):
+    """
+    Benchmark every router endpoint for each role and return the results
+    """
+    results = []
+    for role, user in benchmark_users(roles).items():
+        client = APIClient()
+        client.force_authenticate(user)
+        for name, url, params in discover_endpoints(client, user):
+            result = time_endpoint(client, url, params, iterations)
+            result.update({'role': role, 'endpoint': name, 'url': url, 'params': params})
+            results.append(result)
+    return sorted(results, key=lambda r: (r['role'], r['endpoint']))
+
+
+def compare_results(old, new):
+    """
+    Pair up two result lists and report the change for each endpoint
+    """
+    previous = {(r['role'], r['endpoint']): r for r in old}
+    rows = []
+    for result in new:
+        before = previous.get((result['role'], result['endpoint']))
+        if before is None:
+            continue
+        rows.append({
+            'role': result['role'],
+            'endpoint': result['endpoint'],
+            'p95_ms': (before['p95_ms'], result['p95_ms']),
+            'queries': (before['queries'], result['queries']),
+            'bytes': (before['bytes'], result['bytes']),
+        })
+    return rows
+
+
+def table_size(model):
+    """
+    (data bytes, index bytes) of a model's table, or (None, None) when the
+    database cannot report them
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(table)}')
+            cursor.fetchall()
+            cursor.execute(
+                'SELECT data_length, index_length FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s', [table]
+            )
+            row = cursor.fetchone()
+            return (row[0], row[1]) if row else (None, None)
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_relation_size(%s), pg_indexes_size(%s)', [table, table])
+            return cursor.fetchone()
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT SUM(CASE WHEN name = %s THEN pgsize ELSE 0 END), "
+                    "SUM(CASE WHEN name = %s THEN 0 ELSE pgsize END) FROM dbstat "
+                    "WHERE name = %s OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table, table, table]
+                )
+            except Exception:
+                # SQLite built without the dbstat virtual table
+                return None, None
+            return cursor.fetchone()
+    return None, None
+
+
+def storage_report(models):
+    report = []
+    for model in models:
+        data, index = table_size(model)
+        report.append({'table': model._meta.db_table, 'rows': model.objects.count(),
+                       'data_bytes': data, 'index_bytes': index})
+    return report
+
+
+def attendance_report_params(samples, seed=0):
+    """
+    (student_id, course_id, period) triples with attendance to report on
+    """
+    pairs = list(
+        Attendance.objects.values_list('student_id', 'course_id').distinct().order_by('student_id', 'course_id')[:5000]
+    )
+    rng = random.Random(seed)
+    params = []
+    for student_id, course_id in rng.sample(pairs, min(samples, len(pairs))):
+        day = Attendance.objects.filter(student_id=student_id, course_id=course_id).values_list('date', flat=True).first()
+        params.append((student_id, course_id, day.strftime('%Y-%m')))
+    return params
+
+
+def benchmark_attendance_storage(samples=20, iterations=10):
+    """
+    Compare the row-per-day and bitmap attendance stores on the same data.
+
+    Both tables must hold the same marks (run backfill_attendance_months
+    without --delete-rows). Returns table sizes and, per store, the latency
+    of student reports with records and of course registers.
+    """
+    admin = benchmark_users(['admin'])['admin']
+    client = APIClient()
+    client.force_authenticate(admin)
+    params = attendance_report_params(samples)
+    results = []
+    for storage in ('rows', 'bitmap'):
+        with override_settings(ATTENDANCE_STORAGE=storage):
+            for name, url, query in (
+                ('student_report', URL_PREFIX + 'attendance/student_report/',
+                 lambda student_id, course_id, period: {
+                     'student_id': student_id, 'course_id': course_id,
+                     'period': period, 'include_records': 'true',
+                 }),
+                ('matrix', URL_PREFIX + 'attendance/matrix/',
+                 lambda student_id, course_id, period: {'course_id': course_id}),
+            ):
+                timings = [time_endpoint(client, url, query(*sample), iterations) for sample in params]
+                results.append({
+                    'storage': storage,
+                    'endpoint': name,
+                    'samples': len(timings),
+                    'p50_ms': round(percentile([t['p50_ms'] for t in timings], 0.50), 3),
+                    'p95_ms': round(percentile([t['p95_ms'] for t in timings], 0.95), 3),
+                    'queries': max(t['queries'] for t in timings),
+                    'bytes': max(t['bytes'] for t in timings),
+                })
+    return {'storage': storage_report([Attendance, AttendanceMonth]), 'latency': results}
+
+
+# name -> (queryset, model serializer, values serializer, list endpoint or None)
+SERIALIZER_BENCHMARKS = {
+    'grade': (
+        lambda: Grade.objects.select_related('student__user'),
+        GradeSerializer, GradeValuesSerializer, 'grades/',
+    ),
+    'attendance': (
+        lambda: Attendance.objects.select_related('student__user'),
+        AttendanceSerializer, AttendanceValuesSerializer, 'attendance/',
+    ),
+    'course': (
+        lambda: Course.objects.select_related('faculty__user', 'class_group__program'),
+        CourseSerializer, CourseValuesSerializer, None,
+    ),
+}
+
+
+def time_render(render, iterations):
+    """
+    Median milliseconds of render() and the JSON it produced
+    """
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        content = render()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(percentile(samples, 0.50), 3), content
+
+
+def benchmark_serializers(rows=1000, iterations=10):
+    """
+    Compare model and values serializers on the same rows.
+
+    Each pair is timed from the query through JSON rendering, and the two
+    renderings must be byte for byte identical. The list endpoints are then
+    requested as an admin with VALUES_SERIALIZERS off and on, and their
+    bodies compared too.
+    """
+    renderer = JSONRenderer()
+    results = []
+    for name, (queryset, serializer_class, values_class, endpoint) in SERIALIZER_BENCHMARKS.items():
+        rows_queryset = lambda: queryset().order_by('pk')[:rows]
+        model_ms, model_json = time_render(
+            lambda: renderer.render(serializer_class(rows_queryset(), many=True).data), iterations
+        )
+        values_ms, values_json = time_render(
+            lambda: renderer.render(values_class(values_class.rows(rows_queryset()), many=True).data), iterations
+        )
+        results.append({
+            'name': name,
+            'rows': len(values_class.rows(rows_queryset())),
+            'model_ms': model_ms,
+            'values_ms': values_ms,
+            'speedup': round(model_ms / values_ms, 2) if values_ms else None,
+            'identical': model_json == values_json,
+        })
+
+    admin = benchmark_users(['admin'])['admin']
+    endpoints = []
+    client = APIClient()
+    client.force_authenticate(admin)
+    for name, (_, _, _, endpoint) in SERIALIZER_BENCHMARKS.items():
+        if endpoint is None:
+            continue
+        url = URL_PREFIX + endpoint
+        timings = {}
+        bodies = {}
+        for enabled in (False, True):
+            with override_settings(VALUES_SERIALIZERS=enabled):
+                timings[enabled] = time_endpoint(client, url, {}, iterations)
+                bodies[enabled] = client.get(url).content
+        endpoints.append({
+            'name': name,
+            'url': url,
+            'p50_ms': (timings[False]['p50_ms'], timings[True]['p50_ms']),
+            'queries': (timings[False]['queries'], timings[True]['queries']),
+            'identical': bodies[False] == bodies[True],
+        })
+    return {'serializers': results, 'endpoints': endpoints}
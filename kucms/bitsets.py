@@ -0,0 +1,41 @@
+"""
+Packed bitsets for attendance registers.
+
+A bitset of length n covers n positions (e.g. the class days of a register)
+and is sent as standard base64 of ceil(n / 8) bytes. Position 0 is the most
+significant bit of the first byte, so a client can test position i with
+bytes[i >> 3] & (0x80 >> (i & 7)). Unused bits of the last byte are zero.
+"""
+import base64
+import binascii
+
+
+def encode(positions, length):
+    """
+    Base64 bitset of `length` bits with the given positions set
+    """
+    data = bytearray((length + 7) // 8)
+    for position in positions:
+        if not 0 <= position < length:
+            raise ValueError(f'Bit {position} is outside a bitset of {length}')
+        data[position >> 3] |= 0x80 >> (position & 7)
+    return base64.b64encode(bytes(data)).decode()
+
+
+def decode(value, length):
+    """
+    Positions set in a base64 bitset of `length` bits, in ascending order
+    """
+    try:
+        data = base64.b64decode(value, validate=True)
+    except (binascii.Error, TypeError):
+        raise ValueError('Not valid base64')
+    if len(data) != (length + 7) // 8:
+        raise ValueError(f'Expected {(length + 7) // 8} bytes for {length} bits, got {len(data)}')
+    if length % 8 and data[-1] & (0xFF >> (length % 8)):
+        raise ValueError(f'Bits beyond position {length - 1} must be zero')
+    return [
+        index * 8 + bit
+        for index, byte in enumerate(data) if byte
+        for bit in range(8) if byte & (0x80 >> bit)
+    ]
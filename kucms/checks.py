@@ -0,0 +1,35 @@
+"""
+System checks for settings kucms cannot run safely with
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+STATELESS_AUTHENTICATION = 'kucms.authentication.StatelessJWTAuthentication'
+
+# Backends whose entries are only seen by the process that wrote them
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def revocation_cache_check(app_configs, **kwargs):
+    """
+    Stateless JWT authentication needs its revocation markers in a shared cache
+    """
+    rest_framework = getattr(settings, 'REST_FRAMEWORK', {})
+    if STATELESS_AUTHENTICATION not in rest_framework.get('DEFAULT_AUTHENTICATION_CLASSES', ()):
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [Error(
+        'Stateless JWT authentication is on but the default cache is per-process.',
+        hint=(
+            'Revoked tokens are only refused by the process that revoked them. Set CACHE_BACKEND '
+            'to a shared backend such as Redis or Memcached, or turn JWT_STATELESS_AUTH off.'
+        ),
+        obj=backend,
+        id='kucms.E001',
+    )]
@@ -0,0 +1,148 @@
+"""
+Student dashboard: what the student frontend shows after login, in one call.
+
+Every section is a single values() query over the courses in the student's
+scope, so a full dashboard costs five queries on a cache miss. Responses are
+cached per student under the content and records versions of their
+courses, which signal handlers bump on every relevant write, and the cache
+key doubles as the ETag.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.reverse import reverse
+
+from .models import Announcement, Assignment, AttendanceSummary, Course, Grade
+from .response_cache import course_versions
+
+MAX_DUE_ASSIGNMENTS = 50
+
+
+def full_name(first, last):
+    return f'{first} {last}'.strip()
+
+
+def courses_section(request, scope, days, limit):
+    rows = (
+        Course.objects.filter(id__in=scope.course_ids).order_by('code')
+        .values('id', 'code', 'name', 'faculty__user__first_name', 'faculty__user__last_name')
+    )
+    return [
+        {
+            'id': row['id'],
+            'code': row['code'],
+            'name': row['name'],
+            'faculty_name': full_name(row['faculty__user__first_name'], row['faculty__user__last_name']),
+        }
+        for row in rows
+    ]
+
+
+def assignments_section(request, scope, days, limit):
+    now = timezone.now()
+    rows = (
+        Assignment.objects.filter(
+            course_id__in=scope.course_ids,
+            due_date__gte=now,
+            due_date__lt=now + timedelta(days=days),
+        )
+        .order_by('due_date', 'id')
+        .values('id', 'course_id', 'title', 'due_date', 'file')[:MAX_DUE_ASSIGNMENTS]
+    )
+    return [
+        {
+            'id': row['id'],
+            'course': row['course_id'],
+            'title': row['title'],
+            'due_date': row['due_date'],
+            'file': reverse('assignment-download', args=[row['id']], request=request) if row['file'] else None,
+        }
+        for row in rows
+    ]
+
+
+def announcements_section(request, scope, days, limit):
+    rows = (
+        Announcement.objects.filter(course_id__in=scope.course_ids)
+        .order_by('-created_at', '-id')
+        .values('id', 'course_id', 'title', 'content', 'created_at')[:limit]
+    )
+    return [
+        {
+            'id': row['id'],
+            'course': row['course_id'],
+            'title': row['title'],
+            'content': row['content'],
+            'created_at': row['created_at'],
+        }
+        for row in rows
+    ]
+
+
+def attendance_section(request, scope, days, limit):
+    rows = (
+        AttendanceSummary.objects.filter(
+            student_id=scope.student_id, course_id__in=scope.course_ids, period=''
+        )
+        .order_by('course_id')
+        .values('course_id', 'present_count', 'total_count')
+    )
+    return [
+        {
+            'course': row['course_id'],
+            'present': row['present_count'],
+            'total': row['total_count'],
+            'percentage': round(100 * row['present_count'] / row['total_count'], 2) if row['total_count'] else None,
+        }
+        for row in rows
+    ]
+
+
+def grades_section(request, scope, days, limit):
+    rows = (
+        Grade.objects.filter(student_id=scope.student_id, course_id__in=scope.course_ids)
+        .order_by('-date', '-id')
+        .values('id', 'course_id', 'title', 'marks_obtained', 'total_marks', 'date')[:limit]
+    )
+    return [
+        {
+            'id': row['id'],
+            'course': row['course_id'],
+            'title': row['title'],
+            'marks_obtained': str(row['marks_obtained']),
+            'total_marks': str(row['total_marks']),
+            'date': row['date'],
+        }
+        for row in rows
+    ]
+
+
+SECTIONS = {
+    'courses': courses_section,
+    'assignments': assignments_section,
+    'announcements': announcements_section,
+    'attendance': attendance_section,
+    'grades': grades_section,
+}
+
+
+def build_dashboard(request, scope, sections, days, limit):
+    data = {name: SECTIONS[name](request, scope, days, limit) for name in sections}
+    data['generated_at'] = timezone.now()
+    return data
+
+
+def dashboard_cache_key(request, scope, sections, days, limit):
+    course_ids = sorted(scope.course_ids)
+    content = course_versions(course_ids)
+    records = course_versions(course_ids, 'records')
+    raw = '|'.join([
+        request.get_host(),
+        str(scope.student_id),
+        ','.join(sections),
+        str(days),
+        str(limit),
+        ','.join(f'{course_id}:{content[course_id]}:{records[course_id]}' for course_id in course_ids),
+    ])
+    return 'kucms:dashboard:' + hashlib.sha256(raw.encode()).hexdigest()
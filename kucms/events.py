@@ -0,0 +1,173 @@
+"""
+Live course events for the Server-Sent Events stream.
+
+Signal handlers publish new announcements and comments once their
+transaction commits; async stream views wait on the backend and forward the
+events of the subscriber's courses. Event ids only grow, and they are seeded
+from the clock so they keep growing across restarts, which lets a client
+resume from Last-Event-ID.
+
+EVENTS_BACKEND selects the backend:
+
+- MemoryBackend (default) keeps recent events in process. It suits a single
+  ASGI process.
+- CacheBackend shares events between processes through the Django cache.
+  It needs Redis or Memcached.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .models import Announcement, AnnouncementComment, AssignmentComment
+from .serializers import AnnouncementCommentSerializer, AnnouncementSerializer, AssignmentCommentSerializer
+
+# model -> (event type, course id of an instance, serializer)
+SOURCES = {
+    Announcement: ('announcement', lambda obj: obj.course_id, AnnouncementSerializer),
+    AnnouncementComment: (
+        'announcement_comment', lambda obj: obj.announcement.course_id, AnnouncementCommentSerializer
+    ),
+    AssignmentComment: (
+        'assignment_comment', lambda obj: obj.assignment.course_id, AssignmentCommentSerializer
+    ),
+}
+
+
+def initial_event_id():
+    return time.time_ns() // 1000
+
+
+class Event:
+    def __init__(self, id, type, course_id, data):
+        self.id = id
+        self.type = type
+        self.course_id = course_id
+        self.data = data
+
+
+class MemoryBackend:
+    """
+    In-process ring buffer of recent events with asyncio wake-ups
+    """
+    def __init__(self, history=1000):
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=history)
+        self.last_id = initial_event_id()
+        self.waiters = set()
+
+    def publish(self, type, course_id, data):
+        with self.lock:
+            self.last_id += 1
+            event = Event(self.last_id, type, course_id, data)
+            self.events.append(event)
+            waiters = list(self.waiters)
+        # Publishers run in sync threads; wake each subscriber on its own loop
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return event
+
+    async def latest_id(self):
+        return self.last_id
+
+    async def read(self, last_id):
+        """
+        Events after last_id, and whether some were already dropped
+        """
+        with self.lock:
+            events = [event for event in self.events if event.id > last_id]
+            # Everything up to floor has left the buffer (or predates this process)
+            floor = self.events[0].id - 1 if self.events else self.last_id
+        return events, last_id < floor
+
+    async def wait(self, last_id, timeout):
+        """
+        Wait up to timeout seconds for an event after last_id; False on timeout
+        """
+        entry = (asyncio.get_running_loop(), asyncio.Event())
+        with self.lock:
+            if self.last_id > last_id:
+                return True
+            self.waiters.add(entry)
+        try:
+            await asyncio.wait_for(entry[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self.lock:
+                self.waiters.discard(entry)
+
+
+class CacheBackend:
+    """
+    Events shared between processes through the cache; subscribers poll
+    """
+    LAST_KEY = 'kucms:events:last'
+    poll_interval = 1.0
+
+    def __init__(self, history=1000, ttl=3600):
+        self.history = history
+        self.ttl = ttl
+
+    def event_key(self, event_id):
+        return f'kucms:events:{event_id}'
+
+    def publish(self, type, course_id, data):
+        cache.add(self.LAST_KEY, initial_event_id(), timeout=None)
+        event = Event(cache.incr(self.LAST_KEY), type, course_id, data)
+        cache.set(self.event_key(event.id), event, timeout=self.ttl)
+        return event
+
+    async def latest_id(self):
+        return await cache.aget(self.LAST_KEY) or 0
+
+    async def read(self, last_id):
+        latest = await self.latest_id()
+        if latest <= last_id:
+            return [], False
+        first = max(last_id + 1, latest - self.history + 1)
+        found = await cache.aget_many([self.event_key(i) for i in range(first, latest + 1)])
+        events = [found[key] for key in sorted(found, key=lambda key: int(key.rsplit(':', 1)[1]))]
+        return events, first > last_id + 1 or len(events) < latest - first + 1
+
+    async def wait(self, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            if await self.latest_id() > last_id:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = import_string(getattr(settings, 'EVENTS_BACKEND', 'kucms.events.MemoryBackend'))
+                _backend = backend_class(history=getattr(settings, 'EVENTS_HISTORY', 1000))
+    return _backend
+
+
+def publish(type, course_id, data):
+    return get_backend().publish(type, course_id, data)
+
+
+
+def publish_instance(instance):
+    """
+    Publish a new announcement or comment, shaped like its API representation
+    """
+    event_type, course_id, serializer_class = SOURCES[instance.__class__]
+    return publish(event_type, course_id(instance), dict(serializer_class(instance).data))
@@ -0,0 +1,141 @@
+"""
+Index advisor.
+
+Replays the benchmark endpoints (see benchmarks.py) for each role, captures
+the SELECT statements they run, and EXPLAINs each distinct statement shape
+on the current database. Plans that scan a whole table, sort without an
+index (filesort) or spill to a temporary table are reported as findings.
+MySQL, SQLite and PostgreSQL plans are understood.
+"""
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from .benchmarks import benchmark_users, discover_endpoints
+
+LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'IN \((?:\?, )*\?\)')
+SQLITE_TABLE_RE = re.compile(r'^(?:SCAN|SEARCH) (?:TABLE )?(\S+)')
+POSTGRES_TABLE_RE = re.compile(r'Seq Scan on (\S+)')
+
+# The response and scope caches would hide most queries, so replays run
+# against a cache that never hits
+UNCACHED = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def statement_shape(sql):
+    """
+    SQL with literals and IN lists collapsed, so repeats group together
+    """
+    return IN_LIST_RE.sub('IN (...)', LITERAL_RE.sub('?', sql))
+
+
+def capture_statements(roles=None):
+    """
+    Map each distinct SELECT shape to an example statement and the endpoints running it
+    """
+    statements = {}
+    with override_settings(CACHES=UNCACHED):
+        for role, user in benchmark_users(roles).items():
+            client = APIClient()
+            client.force_authenticate(user)
+            for name, url, params in discover_endpoints(client, user):
+                with CaptureQueriesContext(connection) as captured:
+                    client.get(url, params)
+                for query in captured:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    entry = statements.setdefault(statement_shape(sql), {'sql': sql, 'endpoints': set()})
+                    entry['endpoints'].add(f'{role}:{name}')
+    return statements
+
+
+def explain(sql):
+    """
+    Plan rows for a statement as dicts, in the backend's own vocabulary
+    """
+    prefix = {
+        'sqlite': 'EXPLAIN QUERY PLAN ',
+        'postgresql': 'EXPLAIN ',
+    }.get(connection.vendor, 'EXPLAIN ')
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def mysql_findings(plan, min_rows):
+    findings = []
+    for row in plan:
+        table = row.get('table') or ''
+        extra = row.get('Extra') or ''
+        rows = row.get('rows') or 0
+        if row.get('type') == 'ALL' and rows >= min_rows:
+            findings.append((table, 'full scan', f'~{rows} rows, possible keys: {row.get("possible_keys")}'))
+        elif row.get('type') == 'index' and rows >= min_rows and 'Using index' not in extra:
+            findings.append((table, 'full index scan', f'~{rows} rows via {row.get("key")}'))
+        if 'Using filesort' in extra:
+            findings.append((table, 'filesort', extra))
+        if 'Using temporary' in extra:
+            findings.append((table, 'temporary table', extra))
+    return findings
+
+
+def sqlite_findings(plan, min_rows):
+    findings = []
+    for row in plan:
+        detail = row.get('detail') or ''
+        match = SQLITE_TABLE_RE.match(detail)
+        table = match.group(1) if match else ''
+        if detail.startswith('SCAN') and 'INDEX' not in detail:
+            findings.append((table, 'full scan', detail))
+        elif 'TEMP B-TREE FOR ORDER BY' in detail or 'TEMP B-TREE FOR RIGHT PART OF ORDER BY' in detail:
+            findings.append((table, 'filesort', detail))
+        elif 'TEMP B-TREE' in detail:
+            findings.append((table, 'temporary table', detail))
+    return findings
+
+
+def postgresql_findings(plan, min_rows):
+    findings = []
+    for row in plan:
+        line = next(iter(row.values()), '') or ''
+        match = POSTGRES_TABLE_RE.search(line)
+        if match:
+            findings.append((match.group(1), 'full scan', line.strip()))
+        elif re.search(r'->\s+Sort|^Sort', line.strip()):
+            findings.append(('', 'filesort', line.strip()))
+    return findings
+
+
+PLAN_READERS = {
+    'mysql': mysql_findings,
+    'sqlite': sqlite_findings,
+    'postgresql': postgresql_findings,
+}
+
+
+def advise(roles=None, min_rows=0, ignore_tables=()):
+    """
+    Replay the endpoints and return one finding per problem in each statement plan
+    """
+    reader = PLAN_READERS.get(connection.vendor)
+    if reader is None:
+        raise NotImplementedError(f'No EXPLAIN reader for {connection.vendor}')
+
+    findings = []
+    for shape, entry in capture_statements(roles).items():
+        for table, issue, detail in reader(explain(entry['sql']), min_rows):
+            if table.strip('`"') in ignore_tables:
+                continue
+            findings.append({
+                'table': table.strip('`"'),
+                'issue': issue,
+                'detail': detail,
+                'endpoints': sorted(entry['endpoints']),
+                'sql': entry['sql'],
+            })
+    return sorted(findings, key=lambda f: (f['table'], f['issue'], f['sql']))
@@ -0,0 +1,152 @@
+"""
+Fan-out-on-write activity feed.
+
+When an announcement, assignment or note is published, signal handlers
+write a FeedEntry for the class the course belongs to, carrying the class's
+program and semester. A student's feed is then one indexed range scan on
+(program, semester, created_at, id) paged with keyset cursors, instead of
+joining every content table through course -> class -> program.
+"""
+from django.db import transaction
+from django.db.models import Subquery
+
+from .models import Announcement, Assignment, Course, FeedEntry, Note
+from .pagination import KeysetPagination
+
+SUMMARY_LENGTH = 300
+
+# kind -> (model, timestamp field, summary text)
+SOURCES = {
+    'announcement': (Announcement, 'created_at', lambda obj: obj.content),
+    'assignment': (Assignment, 'created_at', lambda obj: obj.description),
+    'note': (Note, 'uploaded_at', lambda obj: ''),
+}
+
+
+class FeedPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+def kind_for(model):
+    for kind, (source_model, _, _) in SOURCES.items():
+        if source_model is model:
+            return kind
+    return None
+
+
+def summarize(text):
+    text = ' '.join((text or '').split())
+    if len(text) > SUMMARY_LENGTH:
+        return text[:SUMMARY_LENGTH - 1] + '…'
+    return text
+
+
+def course_classes(course_ids):
+    """
+    {course_id: (class_group_id, program_id, semester)}
+    """
+    return {
+        row[0]: row[1:]
+        for row in Course.objects.filter(id__in=course_ids).values_list(
+            'id', 'class_group_id', 'class_group__program_id', 'class_group__semester'
+        )
+    }
+
+
+def placement_of(obj):
+    """
+    (class_group_id, program_id, semester) of obj's course, without a query
+    when the course and its class are already loaded
+    """
+    if type(obj).course.is_cached(obj) and Course.class_group.is_cached(obj.course):
+        class_group = obj.course.class_group
+        return class_group.pk, class_group.program_id, class_group.semester
+    return course_classes([obj.course_id]).get(obj.course_id)
+
+
+def entry_for(kind, obj, placement):
+    _, timestamp, summary = SOURCES[kind]
+    class_group_id, program_id, semester = placement
+    return FeedEntry(
+        class_group_id=class_group_id, program_id=program_id, semester=semester,
+        course_id=obj.course_id, kind=kind, object_id=obj.pk,
+        title=obj.title[:200], summary=summarize(summary(obj)),
+        created_at=getattr(obj, timestamp),
+    )
+
+
+def publish(kind, obj, created=False):
+    """
+    Fan a new item out to its class, or refresh an existing one's text and
+    placement, which follows the item when it moves to another course
+    """
+    if created:
+        placement = placement_of(obj)
+        if placement:
+            FeedEntry.objects.bulk_create([entry_for(kind, obj, placement)], ignore_conflicts=True)
+        return
+    course = Course.objects.filter(pk=obj.course_id)
+    FeedEntry.objects.filter(kind=kind, object_id=obj.pk).update(
+        course_id=obj.course_id,
+        class_group_id=Subquery(course.values('class_group_id')),
+        program_id=Subquery(course.values('class_group__program_id')),
+        semester=Subquery(course.values('class_group__semester')),
+        title=obj.title[:200], summary=summarize(SOURCES[kind][2](obj)),
+    )
+
+
+def unpublish(kind, object_id):
+    FeedEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def move_course(course):
+    """
+    Re-home a course's entries after it moves to another class
+    """
+    moved = FeedEntry.objects.filter(course_id=course.pk).exclude(class_group_id=course.class_group_id)
+    if moved.exists():
+        class_group = course.class_group
+        moved.update(class_group_id=class_group.pk, program_id=class_group.program_id,
+                     semester=class_group.semester)
+
+
+def retarget_class(class_group):
+    FeedEntry.objects.filter(class_group_id=class_group.pk).exclude(
+        program_id=class_group.program_id, semester=class_group.semester
+    ).update(program_id=class_group.program_id, semester=class_group.semester)
+
+
+def rebuild_feed(batch_size=1000, progress=None):
+    """
+    Regenerate every feed entry from the content tables; returns entries written per kind
+    """
+    counts = {}
+    FeedEntry.objects.all().delete()
+    placements = course_classes(Course.objects.values('id'))
+    for kind, (model, _, _) in SOURCES.items():
+        counts[kind] = 0
+        last_pk = 0
+        while True:
+            batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            with transaction.atomic():
+                FeedEntry.objects.bulk_create(
+                    [entry_for(kind, obj, placements[obj.course_id]) for obj in batch],
+                    ignore_conflicts=True,
+                )
+            counts[kind] += len(batch)
+            if progress:
+                progress(kind, counts[kind])
+    return counts
+
+
+def student_feed(scope, kinds=None):
+    """
+    Feed entries visible to a student, for FeedPagination to page through
+    """
+    entries = FeedEntry.objects.filter(program_id=scope.program_id, semester=scope.semester)
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    return entries
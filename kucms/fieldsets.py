@@ -0,0 +1,178 @@
+"""
+Sparse fieldsets and opt-in expansion.
+
+GET requests may name the fields they want in the response:
+
+    ?fields=id,title,due_date     only these top-level fields
+    ?expand=class_details         nested representations to include
+
+Nested representations (user_details, class_details) are the expensive
+part of a response, so once either parameter is given they are left out
+unless named in expand (or in fields). Requests without either parameter
+get the full representation as before.
+
+Viewsets using SparseFieldsViewMixin also shape their list and detail
+querysets to the selected fields. Only the relations those fields read are
+joined, and .only() loads just the columns they need.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+# Model methods used as serializer sources -> the columns they read
+METHOD_COLUMNS = {
+    'get_full_name': ('first_name', 'last_name'),
+}
+
+
+def parse_names(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def sparse_fieldset(request):
+    """
+    (fields, expand) requested by a GET, each a set or None; None without either
+    """
+    if request is None or request.method != 'GET':
+        return None
+    fields = parse_names(request.query_params.get('fields'))
+    expand = parse_names(request.query_params.get('expand'))
+    if fields is None and expand is None:
+        return None
+    return fields, expand
+
+
+def select_fields(names, expandable, fields, expand):
+    """
+    The names to render, in their declared order, or ValidationError for unknown ones
+    """
+    errors = {}
+    unknown = sorted((fields or set()) - set(names))
+    if unknown:
+        errors['fields'] = [f"Unknown fields: {', '.join(unknown)}"]
+    unexpandable = sorted((expand or set()) - set(expandable))
+    if unexpandable:
+        errors['expand'] = [f"Cannot expand: {', '.join(unexpandable)}"]
+    if errors:
+        raise serializers.ValidationError(errors)
+    wanted = (fields or set()) | (expand or set())
+    return [
+        name for name in names
+        if name in wanted or (fields is None and name not in expandable)
+    ]
+
+
+def expandable_fields(fields):
+    return {name for name, field in fields.items() if isinstance(field, serializers.BaseSerializer)}
+
+
+def is_root(serializer):
+    parent = getattr(serializer, 'parent', None)
+    if isinstance(parent, serializers.ListSerializer):
+        parent = getattr(parent, 'parent', None)
+    return parent is None
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying ?fields= and ?expand= of the request in its context.
+
+    Only the top-level serializer of a GET response is narrowed; nested
+    serializers and writes keep all their fields. Serializers whose
+    SerializerMethodFields read model columns list them in method_columns,
+    so viewsets can still limit the columns they load.
+    """
+    method_columns = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = sparse_fieldset(self.context.get('request'))
+        if sparse is None or not is_root(self):
+            return fields
+        selected = select_fields(list(fields), expandable_fields(fields), *sparse)
+        return {name: fields[name] for name in selected}
+
+
+def collect_paths(serializer, model, prefix, annotations, related, columns):
+    """
+    Add the select_related paths and .only() columns rendering serializer's
+    fields from `model` needs. False when a field's source cannot be traced
+    to columns, e.g. a property.
+    """
+    for name, field in serializer.fields.items():
+        if field.source == '*':
+            sources = getattr(serializer, 'method_columns', {}).get(name)
+            if sources is None:
+                return False
+            columns.update(prefix + column for column in sources)
+            continue
+        current, path = model, prefix
+        attrs = field.source_attrs
+        for position, attr in enumerate(attrs):
+            last = position == len(attrs) - 1
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if not path and attr in annotations:
+                    break
+                if last and attr in METHOD_COLUMNS:
+                    columns.update(path + column for column in METHOD_COLUMNS[attr])
+                    break
+                return False
+            if not model_field.concrete:
+                if last and model_field.many_to_many:
+                    # Read through its own query, not a column
+                    break
+                return False
+            columns.add(path + attr)
+            if last and not isinstance(field, serializers.BaseSerializer):
+                break
+            if not model_field.is_relation:
+                return False
+            related.add(path + attr)
+            if last:
+                if not collect_paths(field, model_field.related_model, f'{path}{attr}__', (), related, columns):
+                    return False
+                break
+            current, path = model_field.related_model, f'{path}{attr}__'
+    return True
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    queryset joined and narrowed to what serializer renders, or unchanged
+    when some field cannot be traced
+    """
+    related, columns = set(), set()
+    if not collect_paths(serializer, queryset.model, '', queryset.query.annotations, related, columns):
+        return queryset
+    queryset = queryset.select_related(None)
+    if related:
+        # select_related() without paths would follow every foreign key
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(queryset.model._meta.pk.name, *sorted(columns))
+
+
+class SparseFieldsViewMixin:
+    """
+    Viewset mixin shaping list and retrieve querysets to ?fields= and ?expand=
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def field_requested(self, name):
+        """
+        Whether the response will include the plain (not nested) field `name`,
+        e.g. to skip an annotation nobody asked for
+        """
+        sparse = sparse_fieldset(self.request)
+        if sparse is None:
+            return True
+        fields, expand = sparse
+        return name in (fields or set()) | (expand or set()) or fields is None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in self.sparse_actions or sparse_fieldset(self.request) is None:
+            return queryset
+        return sparse_queryset(queryset, self.get_serializer())
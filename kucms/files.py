@@ -0,0 +1,185 @@
+"""
+Permission-checked delivery of uploaded course files.
+
+After a view has checked that the caller can see a file, the transfer is
+handed to the front server when FILE_DELIVERY is 'nginx' (X-Accel-Redirect)
+or 'sendfile' (X-Sendfile for Apache/lighttpd). Otherwise Django streams the
+file itself with HTTP Range support. For nginx, MEDIA_ROOT is exposed as an
+internal location, e.g.
+
+    location /protected-media/ {
+        internal;
+        alias /path/to/media/;
+    }
+
+Files are read through the storage of the field they belong to, which for
+course files is kucms.storage.course_file_storage. Signed URLs carry the
+storage name and an expiry, so they can be served without touching the
+database; they are only issued for course files.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .storage import course_file_storage
+
+SIGNING_SALT = 'kucms.files'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def content_disposition(filename):
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) for a single satisfiable byte range, None when there
+    is no usable Range header, or False when the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def read_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def ranged_file_response(request, storage, name, filename):
+    """
+    Stream a stored file, honouring a single-range Range header
+    """
+    size = storage.size(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    requested = parse_range(request.headers.get('Range'), size)
+
+    if requested is False:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if requested is None:
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+    else:
+        start, end = requested
+        response = StreamingHttpResponse(
+            read_range(storage.open(name, 'rb'), start, end - start + 1),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition(filename)
+    return response
+
+
+def serve_file(request, name, filename=None, storage=course_file_storage):
+    """
+    Deliver a stored file by name, offloading to the front server if configured
+    """
+    if not name or not storage.exists(name):
+        raise Http404('File not found')
+    filename = filename or os.path.basename(name)
+    delivery = getattr(settings, 'FILE_DELIVERY', 'django')
+
+    if delivery == 'nginx':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = getattr(settings, 'FILE_ACCEL_PREFIX', '/protected-media/') + quote(name)
+    elif delivery == 'sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = storage.path(name)
+    else:
+        return ranged_file_response(request, storage, name, filename)
+
+    response['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response['Content-Disposition'] = content_disposition(filename)
+    return response
+
+
+def sign_file(name, filename=None):
+    return signing.dumps({'n': name, 'f': filename}, salt=SIGNING_SALT, compress=True)
+
+
+def signed_file_url(request, name, filename=None):
+    token = sign_file(name, filename)
+    return request.build_absolute_uri(reverse('signed_file', args=[token]))
+
+
+def signed_file(request, token):
+    """
+    Serve a file from a signed URL; the signature is the only check
+    """
+    try:
+        payload = signing.loads(
+            token, salt=SIGNING_SALT, max_age=getattr(settings, 'SIGNED_FILE_URL_MAX_AGE', 300)
+        )
+    except signing.BadSignature:
+        raise Http404('Link is invalid or has expired')
+    return serve_file(request, payload['n'], payload.get('f'))
+
+
+class FileDownloadMixin:
+    """
+    Viewset mixin adding `download` and `signed_url` actions for a FileField.
+
+    Both go through get_object(), so the caller's queryset scope decides who
+    may fetch the file.
+    """
+    file_field = 'file'
+
+    def get_stored_file(self):
+        fieldfile = getattr(self.get_object(), self.file_field)
+        if not fieldfile:
+            raise Http404('No file attached')
+        return fieldfile
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Download the attached file
+        """
+        fieldfile = self.get_stored_file()
+        return serve_file(request, fieldfile.name, storage=fieldfile.storage)
+
+    @action(detail=True, methods=['get'])
+    def signed_url(self, request, pk=None):
+        """
+        Get a short-lived link to the attached file that needs no login
+        """
+        fieldfile = self.get_stored_file()
+        return Response({
+            'url': signed_file_url(request, fieldfile.name),
+            'expires_in': getattr(settings, 'SIGNED_FILE_URL_MAX_AGE', 300),
+        })
@@ -0,0 +1,258 @@
+"""
+Bulk student import from CSV uploads.
+
+Rows are streamed from the uploaded file, validated and inserted in batches
+inside a single transaction, so an import either lands completely or not at
+all. Password hashing is the expensive part of each row, so it is spread
+across a process pool.
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .models import User, Student
+
+REQUIRED_COLUMNS = ('registration_number', 'email', 'password', 'name')
+
+# Model fields each column is stored in, whose lengths bound it
+COLUMN_FIELDS = {
+    'registration_number': ((Student, 'registration_number'), (User, 'username')),
+    'email': ((User, 'email'),),
+    'name': ((User, 'first_name'),),
+}
+
+
+def import_storage():
+    """
+    Where uploaded CSVs wait for the worker. They hold plaintext passwords,
+    so they live under PRIVATE_UPLOAD_ROOT, outside MEDIA_ROOT, readable by
+    this user only.
+    """
+    return FileSystemStorage(
+        location=getattr(settings, 'PRIVATE_UPLOAD_ROOT', os.path.join(settings.BASE_DIR, 'private')),
+        base_url=None, file_permissions_mode=0o600, directory_permissions_mode=0o700,
+    )
+
+
+class ImportAborted(Exception):
+    """
+    Raised inside the import transaction to roll it back when rows failed
+    """
+
+
+def _setup_worker():
+    # Spawned workers start without Django configured
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+
+def _hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+class PasswordHasherPool:
+    """
+    Hash passwords across a process pool, or inline when workers <= 1
+    """
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = getattr(settings, 'STUDENT_IMPORT_WORKERS', None) or os.cpu_count() or 1
+        self.workers = workers
+        self.executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_setup_worker)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def hash(self, passwords):
+        if self.executor is None or len(passwords) < 2:
+            return _hash_passwords(passwords)
+        size = -(-len(passwords) // self.workers)
+        chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        hashed = []
+        for result in self.executor.map(_hash_passwords, chunks):
+            hashed.extend(result)
+        return hashed
+
+
+def iter_csv_rows(file):
+    """
+    Stream (line_number, row) pairs from a binary CSV file without decoding it whole
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.DictReader(text)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValidationError(f'Missing columns: {", ".join(missing)}')
+        for row in reader:
+            yield reader.line_num, row
+    finally:
+        text.detach()
+
+
+def validate_row(row):
+    """
+    Return a dict of field errors for a single CSV row
+    """
+    errors = {}
+    for column in REQUIRED_COLUMNS:
+        row[column] = (row.get(column) or '').strip()
+        if not row[column]:
+            errors[column] = 'This field is required.'
+    if row['email'] and 'email' not in errors:
+        try:
+            validate_email(row['email'])
+        except ValidationError:
+            errors['email'] = 'Enter a valid email address.'
+        row['email'] = User.objects.normalize_email(row['email'])
+    for column, fields in COLUMN_FIELDS.items():
+        limit = min(model._meta.get_field(name).max_length for model, name in fields)
+        if column not in errors and len(row[column]) > limit:
+            errors[column] = f'Ensure this value has at most {limit} characters.'
+    return errors
+
+
+class StudentImporter:
+    """
+    Validate and import students for one program from a CSV file
+    """
+    def __init__(self, program_id, dry_run=False, batch_size=None, workers=None, progress=None):
+        self.program_id = program_id
+        self.dry_run = dry_run
+        self.progress = progress
+        self.batch_size = batch_size or getattr(settings, 'STUDENT_IMPORT_BATCH_SIZE', 500)
+        self.workers = workers
+        self.errors = []
+        self.rows = 0
+        self.created = 0
+        self.seen_emails = set()
+        self.seen_registrations = set()
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'dry_run': self.dry_run,
+            'errors': self.errors,
+        }
+
+    def run(self, file):
+        try:
+            rows = iter_csv_rows(file)
+            if self.dry_run:
+                for batch in self.batches(rows):
+                    self.validate_batch(batch)
+            else:
+                with transaction.atomic(), PasswordHasherPool(self.workers) as hasher:
+                    for batch in self.batches(rows):
+                        valid = self.validate_batch(batch)
+                        if not self.errors:
+                            self.insert_batch(valid, hasher)
+                    if self.errors:
+                        raise ImportAborted()
+        except ImportAborted:
+            self.created = 0
+        except (ValidationError, UnicodeDecodeError, csv.Error) as e:
+            message = e.messages[0] if isinstance(e, ValidationError) else str(e)
+            self.errors.append({'row': None, 'errors': {'file': message}})
+            self.created = 0
+        return self.report()
+
+    def batches(self, rows):
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            self.rows += len(batch)
+            yield batch
+            if self.progress:
+                self.progress(self.rows, self.errors)
+
+    def validate_batch(self, batch):
+        """
+        Validate a batch of rows, checking uniqueness against the file and database
+        """
+        checked = []
+        for line, row in batch:
+            errors = validate_row(row)
+            if row['email'] in self.seen_emails:
+                errors['email'] = 'Duplicate email in file.'
+            if row['registration_number'] in self.seen_registrations:
+                errors['registration_number'] = 'Duplicate registration number in file.'
+            self.seen_emails.add(row['email'])
+            self.seen_registrations.add(row['registration_number'])
+            checked.append((line, row, errors))
+
+        emails = [row['email'] for _, row, _ in checked if row['email']]
+        registrations = [row['registration_number'] for _, row, _ in checked if row['registration_number']]
+        taken_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        taken_registrations = set(
+            Student.objects.filter(registration_number__in=registrations)
+            .values_list('registration_number', flat=True)
+        ) | set(User.objects.filter(username__in=registrations).values_list('username', flat=True))
+
+        valid = []
+        for line, row, errors in checked:
+            if row['email'] in taken_emails:
+                errors['email'] = 'A user with this email already exists.'
+            if row['registration_number'] in taken_registrations:
+                errors['registration_number'] = 'A student with this registration number already exists.'
+            if errors:
+                self.errors.append({'row': line, 'errors': errors})
+            else:
+                valid.append(row)
+        return valid
+
+    def insert_batch(self, rows, hasher):
+        if not rows:
+            return
+        passwords = hasher.hash([row['password'] for row in rows])
+        User.objects.bulk_create([
+            User(
+                username=row['registration_number'],
+                email=row['email'],
+                password=password,
+                first_name=row['name'],
+                user_type='student',
+            )
+            for row, password in zip(rows, passwords)
+        ])
+        # MySQL does not return primary keys from bulk inserts
+        user_ids = dict(
+            User.objects.filter(email__in=[row['email'] for row in rows]).values_list('email', 'id')
+        )
+        Student.objects.bulk_create([
+            Student(
+                user_id=user_ids[row['email']],
+                registration_number=row['registration_number'],
+                program_id=self.program_id,
+                current_semester=1,
+            )
+            for row in rows
+        ])
+        self.created += len(rows)
+
+
+def import_students(file, program_id, dry_run=False, **kwargs):
+    """
+    Import students from a binary CSV file and return a per-row report
+    """
+    return StudentImporter(program_id, dry_run=dry_run, **kwargs).run(file)
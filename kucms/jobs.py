@@ -0,0 +1,258 @@
+"""
+Database-backed background jobs.
+
+Long admin operations enqueue a Job row and return immediately; the
+`run_worker` management command claims queued jobs and runs the handler
+registered for their kind, recording progress on the row as it goes.
+
+A claim is a lease: while the handler runs, a heartbeat thread renews
+`heartbeat_at` from its own connection, so even a handler inside one long
+transaction keeps it fresh. When a worker dies, its job's heartbeat goes
+stale and the next claim_next after JOB_LEASE_SECONDS runs it again. Each
+claim bumps `attempts`, and the outcome of a run is only recorded while
+the job still belongs to that attempt.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job, SessionRollover
+from .imports import import_storage, import_students
+from .rollover import current_academic_year, rollover_result, run_rollover, start_rollover
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+CLEANUPS = {}
+
+
+def job_handler(kind):
+    """
+    Register a function as the handler for jobs of the given kind
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def job_cleanup(kind):
+    """
+    Register a function releasing what a job of the given kind holds when
+    it is given up on without its handler finishing
+    """
+    def decorator(func):
+        CLEANUPS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None):
+    """
+    Queue a job for the worker and return it
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return Job.objects.create(
+        kind=kind, payload=payload or {}, created_by_id=user.id if user else None
+    )
+
+
+def progress_cache_key(job_id):
+    return f'kucms:job:{job_id}:progress'
+
+
+def cached_progress(job_id):
+    """
+    Latest progress a running job reported, if any
+    """
+    return cache.get(progress_cache_key(job_id))
+
+
+class JobProgress:
+    """
+    Handle given to job handlers for reporting progress.
+
+    Writes are throttled so a fast loop does not turn into an UPDATE per row.
+    Progress is always published to the cache; it is only written to the job
+    row outside a transaction, since a handler's uncommitted transaction
+    would hide it from the status endpoint anyway.
+    """
+    def __init__(self, job, interval=0.5):
+        self.job = job
+        self.interval = interval
+        self.last_write = 0
+
+    def update(self, processed=None, total=None, errors=None, force=False):
+        if processed is not None:
+            self.job.processed = processed
+        if total is not None:
+            self.job.total = total
+        if errors is not None:
+            self.job.errors = errors
+        now = time.monotonic()
+        if force or now - self.last_write >= self.interval:
+            values = {'processed': self.job.processed, 'total': self.job.total, 'errors': self.job.errors}
+            cache.set(progress_cache_key(self.job.pk), values, timeout=3600)
+            if not connection.in_atomic_block:
+                Job.objects.filter(pk=self.job.pk, attempts=self.job.attempts).update(**values)
+            self.last_write = now
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def lease_seconds():
+    return getattr(settings, 'JOB_LEASE_SECONDS', 300)
+
+
+def claim_next(worker=None):
+    """
+    Atomically claim the oldest queued or abandoned job, or return None when there is none.
+
+    A job abandoned JOB_MAX_ATTEMPTS times is failed instead of run again.
+    """
+    worker = worker or worker_name()
+    now = timezone.now()
+    abandoned = Q(status='running', heartbeat_at__lt=now - timedelta(seconds=lease_seconds()))
+    candidates = (
+        Job.objects.filter(Q(status='queued') | abandoned)
+        .order_by('created_at', 'id').values_list('pk', 'attempts')
+    )
+    for pk, attempts in candidates[:10]:
+        # Only wins if nobody claimed or renewed the job since it was read
+        claimed = Job.objects.filter(Q(status='queued') | abandoned, pk=pk, attempts=attempts).update(
+            status='running', worker=worker, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1
+        )
+        if not claimed:
+            continue
+        job = Job.objects.get(pk=pk)
+        if job.attempts > getattr(settings, 'JOB_MAX_ATTEMPTS', 3):
+            job.status = 'failed'
+            job.result = {'error': f'Abandoned by its worker {job.attempts - 1} times'}
+            job.finished_at = now
+            job.save(update_fields=['status', 'result', 'finished_at'])
+            if job.kind in CLEANUPS:
+                CLEANUPS[job.kind](job)
+            continue
+        return job
+    return None
+
+
+def fail_if_abandoned(job):
+    """
+    Fail a running job whose lease has expired, so its work can be queued
+    again; returns whether it was failed
+    """
+    now = timezone.now()
+    return bool(Job.objects.filter(
+        pk=job.pk, status='running', heartbeat_at__lt=now - timedelta(seconds=lease_seconds())
+    ).update(status='failed', result={'error': 'Abandoned by its worker'}, finished_at=now))
+
+
+def heartbeat(job, stop):
+    """
+    Renew a running job's lease until `stop` is set
+    """
+    try:
+        while not stop.wait(lease_seconds() / 3):
+            Job.objects.filter(pk=job.pk, attempts=job.attempts).update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """
+    Run a claimed job through its handler and record the outcome
+    """
+    progress = JobProgress(job)
+    stop = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(job, stop), daemon=True)
+    beat.start()
+    try:
+        result = HANDLERS[job.kind](job, progress)
+    except Exception as e:
+        logger.exception('Job %s failed', job.pk)
+        job.status = 'failed'
+        job.result = {'error': str(e), 'traceback': traceback.format_exc()}
+    else:
+        job.status = 'failed' if job.errors else 'succeeded'
+        job.result = result
+    finally:
+        stop.set()
+        beat.join()
+    job.finished_at = timezone.now()
+    recorded = Job.objects.filter(pk=job.pk, attempts=job.attempts, status='running').update(
+        status=job.status, result=job.result, errors=job.errors, total=job.total,
+        processed=job.processed, finished_at=job.finished_at,
+    )
+    if not recorded:
+        logger.warning('Job %s was given up on while attempt %s ran; its outcome is dropped', job.pk, job.attempts)
+    cache.delete(progress_cache_key(job.pk))
+    return job
+
+
+def run_next(worker=None):
+    """
+    Claim and run one job, returning it, or None when nothing was queued
+    """
+    job = claim_next(worker)
+    if job is None:
+        return None
+    return run_job(job)
+
+
+@job_handler('import_students')
+def import_students_job(job, progress):
+    """
+    Import a CSV of students previously saved to import_storage by upload_students
+    """
+    def report(rows, errors):
+        progress.update(processed=rows, errors=errors)
+
+    try:
+        with import_storage().open(job.payload['path'], 'rb') as file:
+            result = import_students(
+                file, job.payload['program_id'],
+                dry_run=job.payload.get('dry_run', False), progress=report
+            )
+    finally:
+        # The passwords in the file must not outlive the run, whatever its outcome
+        delete_import_file(job)
+    progress.update(processed=result['rows'], total=result['rows'], errors=result['errors'], force=True)
+    return result
+
+
+@job_cleanup('import_students')
+def delete_import_file(job):
+    import_storage().delete(job.payload['path'])
+
+
+@job_handler('start_new_session')
+def start_new_session_job(job, progress):
+    """
+    Run, or resume, the rollover into a new academic year
+    """
+    rollover_id = job.payload.get('rollover_id')
+    if rollover_id:
+        rollover = SessionRollover.objects.get(pk=rollover_id)
+    else:
+        rollover, _ = start_rollover(job.payload.get('academic_year') or current_academic_year())
+
+    def report(promoted, total):
+        progress.update(processed=promoted, total=total)
+
+    rollover = run_rollover(rollover, progress=report)
+    progress.update(processed=rollover.promoted, total=rollover.total, force=True)
+    return rollover_result(rollover)
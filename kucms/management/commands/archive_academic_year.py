@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kucms.archive import archive_academic_year
+from kucms.rollover import valid_academic_year
+
+
+class Command(BaseCommand):
+    help = 'Move attendance, grades and comments of a closed academic year into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year', help="Academic year to archive, e.g. '2023-2024'")
+        parser.add_argument('--batch-size', type=int, help='Rows per transaction (default ARCHIVE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        academic_year = options['academic_year']
+        if not valid_academic_year(academic_year):
+            raise CommandError('academic_year must look like 2024 or 2024-2025')
+
+        def progress(phase, kind, rows):
+            self.stdout.write(f'{phase:<5} {kind:<20} {rows}')
+
+        try:
+            archive = archive_academic_year(academic_year, options['batch_size'], progress=progress)
+        except ValueError as e:
+            raise CommandError(str(e))
+        copied = sum(archive.copied.values())
+        purged = sum(archive.purged.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {academic_year}: {copied} rows copied, {purged} removed from the hot tables'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kucms.attendance_bitmap import backfill_course, bitmap_storage_enabled
+from kucms.models import Attendance
+
+
+class Command(BaseCommand):
+    help = 'Build AttendanceMonth bitmaps from the row-per-day Attendance table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', help='Only backfill these course ids')
+        parser.add_argument('--delete-rows', action='store_true',
+                            help='Delete the Attendance rows once they are in the bitmaps')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if bitmap_storage_enabled():
+            # Marks recorded since the switch live only in the month rows
+            raise CommandError(
+                'ATTENDANCE_STORAGE is bitmap, so the month rows are the live attendance '
+                'and rebuilding them from the Attendance rows would lose newer marks. '
+                'Backfill before switching, with ATTENDANCE_STORAGE=rows.'
+            )
+        course_ids = options['course'] or list(
+            Attendance.objects.values_list('course_id', flat=True).distinct().order_by('course_id')
+        )
+        records = months = 0
+        for index, course_id in enumerate(course_ids, 1):
+            read, written = backfill_course(course_id, options['delete_rows'], options['batch_size'])
+            records += read
+            months += written
+            self.stdout.write(f'[{index}/{len(course_ids)}] course {course_id}: {read} records -> {written} months')
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {records} attendance records into {months} month rows'
+        ))
+        self.stdout.write('Set ATTENDANCE_STORAGE=bitmap to serve attendance from the bitmaps.')
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from kucms.benchmarks import benchmark_attendance_storage
+from kucms.models import Attendance, AttendanceMonth
+
+
+class Command(BaseCommand):
+    help = 'Compare table size and report latency of the row and bitmap attendance stores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=20, help='Student/course pairs to report on')
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if not Attendance.objects.exists() or not AttendanceMonth.objects.exists():
+            raise CommandError(
+                'Both stores need data: run backfill_attendance_months without --delete-rows first'
+            )
+        report = benchmark_attendance_storage(options['samples'], options['iterations'])
+
+        for table in report['storage']:
+            size = (
+                f"data={table['data_bytes']} index={table['index_bytes']}"
+                if table['data_bytes'] is not None else 'size unavailable on this database'
+            )
+            self.stdout.write(f"{table['table']:<24} rows={table['rows']:<10} {size}")
+        for result in report['latency']:
+            self.stdout.write(
+                f"{result['storage']:<7} {result['endpoint']:<16} p50={result['p50_ms']:.2f}ms "
+                f"p95={result['p95_ms']:.2f}ms queries={result['queries']} bytes={result['bytes']}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
@@ -0,0 +1,61 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from kucms.benchmarks import run_benchmarks, compare_results
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every kucms router endpoint as admin, faculty and student'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--role', action='append', choices=['admin', 'faculty', 'student'],
+                            help='Limit to a role (repeatable)')
+        parser.add_argument('--output', default='bench_output.json')
+        parser.add_argument('--compare', help='Previous output file to diff against')
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(options['iterations'], options['role'])
+        report = {
+            'meta': {
+                'commit': self.git_commit(),
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+
+        for result in results:
+            self.stdout.write(
+                f"{result['role']:<8} {result['endpoint']:<40} {result['status']} "
+                f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                f"queries={result['queries']} bytes={result['bytes']}"
+            )
+
+        if options['compare']:
+            with open(options['compare']) as handle:
+                previous = json.load(handle)['results']
+            self.stdout.write('\nChange against ' + options['compare'])
+            for row in compare_results(previous, results):
+                self.stdout.write(
+                    f"{row['role']:<8} {row['endpoint']:<40} "
+                    f"p95 {row['p95_ms'][0]:.2f} -> {row['p95_ms'][1]:.2f}ms "
+                    f"queries {row['queries'][0]} -> {row['queries'][1]} "
+                    f"bytes {row['bytes'][0]} -> {row['bytes'][1]}"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+    def git_commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from kucms.benchmarks import benchmark_serializers
+
+
+class Command(BaseCommand):
+    help = 'Compare the speed and output of the model and values serializers of large lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows serialized per list')
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        report = benchmark_serializers(options['rows'], options['iterations'])
+
+        for result in report['serializers']:
+            self.stdout.write(
+                f"{result['name']:<12} rows={result['rows']:<6} model={result['model_ms']:.2f}ms "
+                f"values={result['values_ms']:.2f}ms speedup={result['speedup']}x "
+                f"identical={result['identical']}"
+            )
+        for result in report['endpoints']:
+            self.stdout.write(
+                f"{result['url']:<24} p50 {result['p50_ms'][0]:.2f}ms -> {result['p50_ms'][1]:.2f}ms "
+                f"queries {result['queries'][0]} -> {result['queries'][1]} identical={result['identical']}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+        different = [r['name'] for r in report['serializers'] + report['endpoints'] if not r['identical']]
+        if different:
+            raise CommandError(f"Values serializers differ from the model serializers for: {', '.join(different)}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from kucms.models import Assignment, Note
+from kucms.storage import course_file_storage
+
+
+class Command(BaseCommand):
+    help = 'Move note and assignment files onto shared content blobs and drop unreferenced blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gc-only', action='store_true', help='Only remove unreferenced blobs')
+
+    def handle(self, *args, **options):
+        adopted = 0
+        if not options['gc_only']:
+            for model in (Note, Assignment):
+                names = model.objects.exclude(file='').exclude(file__isnull=True).values_list('file', flat=True)
+                for name in names.iterator():
+                    adopted += course_file_storage.adopt(name)
+        removed = course_file_storage.collect_garbage()
+        self.stdout.write(self.style.SUCCESS(f'{adopted} files adopted, {removed} blobs removed'))
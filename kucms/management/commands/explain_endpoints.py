@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from kucms.explain import advise
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries behind every kucms router endpoint and flag full scans and filesorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', action='append', choices=['admin', 'faculty', 'student'],
+                            help='Limit to a role (repeatable)')
+        parser.add_argument('--min-rows', type=int, default=0,
+                            help='Ignore full scans estimated below this many rows (MySQL)')
+        parser.add_argument('--ignore-table', action='append', default=[],
+                            help='Table whose findings are expected, e.g. a small lookup table')
+        parser.add_argument('--output', help='Also write the findings to this JSON file')
+        parser.add_argument('--fail', action='store_true', help='Exit with an error when anything is flagged')
+
+    def handle(self, *args, **options):
+        findings = advise(options['role'], options['min_rows'], set(options['ignore_table']))
+
+        for finding in findings:
+            self.stdout.write(self.style.WARNING(f"{finding['table'] or '-'}: {finding['issue']}"))
+            self.stdout.write(f"  {finding['detail']}")
+            self.stdout.write(f"  endpoints: {', '.join(finding['endpoints'])}")
+            self.stdout.write(f"  sql: {finding['sql'][:300]}")
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(findings, handle, indent=2)
+
+        if findings and options['fail']:
+            raise CommandError(f'{len(findings)} plan problems found')
+        self.stdout.write(self.style.SUCCESS(f'{len(findings)} plan problems found'))
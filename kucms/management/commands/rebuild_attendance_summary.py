@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from kucms.attendance import rebuild_summaries
+from kucms.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Reconcile AttendanceSummary totals with the raw attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', help='Only rebuild these course ids')
+        parser.add_argument('--batch-size', type=int, default=50, help='Courses per transaction')
+
+    def handle(self, *args, **options):
+        course_ids = options['course'] or list(Course.objects.order_by('pk').values_list('pk', flat=True))
+        totals = {'created': 0, 'corrected': 0, 'deleted': 0}
+        size = options['batch_size']
+        for start in range(0, len(course_ids), size):
+            result = rebuild_summaries(course_ids[start:start + size])
+            for key, value in result.items():
+                totals[key] += value
+        self.stdout.write(self.style.SUCCESS(
+            f"Summaries for {len(course_ids)} courses: {totals['created']} created, "
+            f"{totals['corrected']} corrected, {totals['deleted']} deleted"
+        ))
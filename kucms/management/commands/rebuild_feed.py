@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from kucms.feed import rebuild_feed
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the activity feed from announcements, assignments and notes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Objects per transaction')
+
+    def handle(self, *args, **options):
+        counts = rebuild_feed(batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(f'{kind}: {count} entries')
+        self.stdout.write(self.style.SUCCESS('Feed rebuilt'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from kucms.search import SOURCES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from announcements, assignments, notes and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(SOURCES), help='Only rebuild these kinds')
+        parser.add_argument('--batch-size', type=int, default=500, help='Objects per transaction')
+
+    def handle(self, *args, **options):
+        counts = rebuild_index(options['kind'], batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(f'{kind}: {count} documents')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kucms.rollover import (
+    current_academic_year, rollover_result, run_rollover, start_rollover, valid_academic_year
+)
+
+
+class Command(BaseCommand):
+    help = 'Start an academic year, or resume a rollover that stopped part way'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Year to start, e.g. 2026-2027 (default: current)')
+        parser.add_argument('--batch-size', type=int, help='Students promoted per transaction')
+
+    def handle(self, *args, **options):
+        academic_year = options['academic_year'] or current_academic_year()
+        if not valid_academic_year(academic_year):
+            raise CommandError('academic_year must look like 2026 or 2026-2027')
+        rollover, created = start_rollover(academic_year)
+        if rollover.status == 'complete':
+            raise CommandError(f'Academic year {academic_year} has already been started')
+        if not created:
+            self.stdout.write(f'Resuming after student #{rollover.last_student_id} ({rollover.promoted} promoted)')
+
+        def report(promoted, total):
+            self.stdout.write(f'{promoted}/{total} students promoted')
+
+        result = rollover_result(run_rollover(rollover, options['batch_size'], progress=report))
+        self.stdout.write(self.style.SUCCESS(
+            f"Started {result['academic_year']} from {result['from_year'] or '-'}: "
+            f"{result['classes']} classes, {result['promoted']} students promoted"
+        ))
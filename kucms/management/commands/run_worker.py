@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from kucms.jobs import run_next, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued kucms background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when idle')
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        self.stdout.write(f'Worker {worker} started')
+        while True:
+            job = run_next(worker)
+            if job is not None:
+                self.stdout.write(f'{job} processed={job.processed} errors={len(job.errors)}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,253 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from kucms.models import (
+    User, School, Department, Program, Class, Faculty,
+    Student, Course, Assignment, Attendance, Grade, Announcement
+)
+from kucms.attendance import rebuild_summaries
+from kucms.feed import rebuild_feed
+from kucms.search import rebuild_index
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic university dataset using bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=2)
+        parser.add_argument('--departments', type=int, default=3, help='Departments per school')
+        parser.add_argument('--programs', type=int, default=2, help='Programs per department')
+        parser.add_argument('--semesters', type=int, default=8)
+        parser.add_argument('--students', type=int, default=40, help='Students per program and semester')
+        parser.add_argument('--faculty', type=int, default=4, help='Faculty per department')
+        parser.add_argument('--courses', type=int, default=5, help='Courses per class')
+        parser.add_argument('--class-days', type=int, default=60, help='Attendance days per course')
+        parser.add_argument('--grades', type=int, default=4, help='Graded items per course')
+        parser.add_argument('--assignments', type=int, default=3, help='Assignments per course')
+        parser.add_argument('--announcements', type=int, default=3, help='Announcements per course')
+        parser.add_argument('--academic-year', default='2025-2026')
+        parser.add_argument('--password', default='password123')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        year = options['academic_year']
+
+        with transaction.atomic():
+            self.create_admin(options)
+            programs = self.create_structure(options)
+            departments = {program.department_id for program in programs}
+            faculty = self.create_faculty(departments, options)
+            classes = self.create_classes(programs, year, options['semesters'])
+            courses = self.create_courses(classes, faculty, options['courses'])
+            students = self.create_students(programs, options)
+
+        self.create_content(courses, options)
+        self.create_attendance(courses, students, options['class_days'])
+        self.create_grades(courses, students, options['grades'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(programs)} programs, {len(courses)} courses and '
+            f'{sum(len(group) for group in students.values())} students'
+        ))
+
+    def bulk_create(self, model, objects, **kwargs):
+        """
+        Insert objects in batches without relying on the backend returning ids
+        """
+        count = 0
+        for chunk in batched(objects, self.batch_size):
+            model.objects.bulk_create(chunk, batch_size=self.batch_size, **kwargs)
+            count += len(chunk)
+        return count
+
+    def create_structure(self, options):
+        schools = [School(name=f'School {i + 1}') for i in range(options['schools'])]
+        self.bulk_create(School, schools)
+        schools = list(School.objects.filter(name__in=[s.name for s in schools]))
+
+        departments = [
+            Department(name=f'{school.name} Department {i + 1}', school=school)
+            for school in schools for i in range(options['departments'])
+        ]
+        self.bulk_create(Department, departments)
+        departments = list(Department.objects.filter(school__in=schools))
+
+        programs = [
+            Program(name=f'{department.name} Program {i + 1}', department=department)
+            for department in departments for i in range(options['programs'])
+        ]
+        self.bulk_create(Program, programs)
+        return list(Program.objects.filter(department__in=departments))
+
+    def create_users(self, users):
+        self.bulk_create(User, users)
+        emails = [user.email for user in users]
+        found = {}
+        for chunk in batched(emails, self.batch_size):
+            found.update(User.objects.filter(email__in=chunk).in_bulk(field_name='email'))
+        return [found[email] for email in emails]
+
+    def create_admin(self, options):
+        """
+        A staff user, so there is an admin to sign in and benchmark as
+        """
+        User.objects.get_or_create(email='admin@seed.kucms', defaults={
+            'username': 'admin', 'first_name': 'Admin', 'user_type': 'admin',
+            'is_staff': True, 'password': make_password(options['password']),
+        })
+
+    def create_faculty(self, department_ids, options):
+        password = make_password(options['password'])
+        rows = [
+            (department_id, i)
+            for department_id in sorted(department_ids) for i in range(options['faculty'])
+        ]
+        users = self.create_users([
+            User(
+                username=f'faculty-{department_id}-{i}',
+                email=f'faculty-{department_id}-{i}@seed.kucms',
+                first_name='Faculty', last_name=f'{department_id}-{i}',
+                user_type='faculty', password=password
+            )
+            for department_id, i in rows
+        ])
+        types = [choice for choice, _ in Faculty.FACULTY_TYPES]
+        self.bulk_create(Faculty, [
+            Faculty(user=user, department_id=department_id, faculty_type=self.rng.choice(types))
+            for user, (department_id, _) in zip(users, rows)
+        ])
+        by_department = {}
+        for faculty in Faculty.objects.filter(user__in=users):
+            by_department.setdefault(faculty.department_id, []).append(faculty)
+        return by_department
+
+    def create_classes(self, programs, year, semesters):
+        self.bulk_create(Class, [
+            Class(program=program, semester=semester, academic_year=year)
+            for program in programs for semester in range(1, semesters + 1)
+        ], ignore_conflicts=True)
+        return list(Class.objects.filter(program__in=programs, academic_year=year).select_related('program'))
+
+    def create_courses(self, classes, faculty, per_class):
+        courses = []
+        for group in classes:
+            teachers = faculty[group.program.department_id]
+            for i in range(per_class):
+                courses.append(Course(
+                    name=f'{group.program.name} S{group.semester} Course {i + 1}',
+                    code=f'C{group.program_id}-{group.semester}{i + 1:02d}',
+                    class_group=group,
+                    faculty=self.rng.choice(teachers),
+                ))
+        self.bulk_create(Course, courses)
+        return list(Course.objects.filter(class_group__in=classes).select_related('class_group'))
+
+    def create_students(self, programs, options):
+        password = make_password(options['password'])
+        rows = [
+            (program.id, semester, i)
+            for program in programs
+            for semester in range(1, options['semesters'] + 1)
+            for i in range(options['students'])
+        ]
+        registration = lambda program_id, semester, i: f'{program_id:03d}{semester:02d}{i:05d}'
+        users = self.create_users([
+            User(
+                username=registration(*row),
+                email=f'student-{registration(*row)}@seed.kucms',
+                first_name='Student', last_name=registration(*row),
+                user_type='student', password=password
+            )
+            for row in rows
+        ])
+        self.bulk_create(Student, [
+            Student(
+                user=user, registration_number=registration(*row),
+                program_id=row[0], current_semester=row[1]
+            )
+            for user, row in zip(users, rows)
+        ])
+        by_class = {}
+        for student in Student.objects.filter(user__in=users).only('id', 'program_id', 'current_semester'):
+            by_class.setdefault((student.program_id, student.current_semester), []).append(student.id)
+        return by_class
+
+    def create_content(self, courses, options):
+        now = timezone.now()
+        self.bulk_create(Assignment, (
+            Assignment(
+                course=course, title=f'{course.code} Assignment {i + 1}',
+                description=f'Problem set {i + 1} for {course.name}',
+                due_date=now + timedelta(days=self.rng.randint(-30, 30))
+            )
+            for course in courses for i in range(options['assignments'])
+        ))
+        self.bulk_create(Announcement, (
+            Announcement(
+                course=course, title=f'{course.code} Announcement {i + 1}',
+                content=f'Update {i + 1} for {course.name}'
+            )
+            for course in courses for i in range(options['announcements'])
+        ))
+        # bulk_create skips the signals that maintain the search index and feed
+        rebuild_index(['assignment', 'announcement'], batch_size=self.batch_size)
+        rebuild_feed(batch_size=self.batch_size)
+
+    def class_days(self, count):
+        start = date.today() - timedelta(days=count * 7 // 5)
+        days = []
+        day = start
+        while len(days) < count:
+            if day.weekday() < 5:
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def create_attendance(self, courses, students, class_days):
+        days = self.class_days(class_days)
+        rng = self.rng
+        rows = (
+            Attendance(course_id=course.id, student_id=student_id, date=day, is_present=rng.random() < 0.85)
+            for course in courses
+            for student_id in students.get((course.class_group.program_id, course.class_group.semester), [])
+            for day in days
+        )
+        count = self.bulk_create(Attendance, rows)
+        # bulk_create skips the signals that maintain the attendance summaries
+        for chunk in batched((course.id for course in courses), 50):
+            rebuild_summaries(chunk)
+        self.stdout.write(f'Created {count} attendance records')
+
+    def create_grades(self, courses, students, per_course):
+        rng = self.rng
+        today = date.today()
+        rows = (
+            Grade(
+                course_id=course.id, student_id=student_id, title=f'Assessment {i + 1}',
+                marks_obtained=Decimal(rng.randint(0, 100)), total_marks=Decimal(100),
+                date=today - timedelta(days=7 * (per_course - i))
+            )
+            for course in courses
+            for student_id in students.get((course.class_group.program_id, course.class_group.semester), [])
+            for i in range(per_course)
+        )
+        count = self.bulk_create(Grade, rows)
+        self.stdout.write(f'Created {count} grade records')
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_summaries(apps, schema_editor):
+    Attendance = apps.get_model('kucms', 'Attendance')
+    AttendanceSummary = apps.get_model('kucms', 'AttendanceSummary')
+    rows = (
+        Attendance.objects
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('student_id', 'course_id', 'year', 'month')
+        .annotate(present=Count('id', filter=Q(is_present=True)), total=Count('id'))
+        .order_by()
+    )
+    totals = {}
+    for row in rows.iterator():
+        month = f"{row['year']:04d}-{row['month']:02d}"
+        for period in ('', month):
+            key = (row['student_id'], row['course_id'], period)
+            present, total = totals.get(key, (0, 0))
+            totals[key] = (present + row['present'], total + row['total'])
+    AttendanceSummary.objects.bulk_create([
+        AttendanceSummary(
+            student_id=student_id, course_id=course_id, period=period,
+            present_count=present, total_count=total,
+        )
+        for (student_id, course_id, period), (present, total) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0002_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(blank=True, default='', max_length=7)),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.student')),
+            ],
+            options={
+                'unique_together': {('student', 'course', 'period')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0003_attendancesummary'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:27
+
+import django.core.validators
+import django.db.models.deletion
+import kucms.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0005_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='assignment',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=kucms.storage.DedupStorage(), upload_to='assignments/', validators=[django.core.validators.FileExtensionValidator(['pdf', 'doc', 'docx'])]),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='file',
+            field=models.FileField(storage=kucms.storage.DedupStorage(), upload_to='notes/', validators=[django.core.validators.FileExtensionValidator(['pdf', 'doc', 'docx', 'ppt', 'pptx'])]),
+        ),
+        migrations.CreateModel(
+            name='FileReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='references', to='kucms.fileblob')),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0006_fileblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('announcement', 'Announcement'), ('assignment', 'Assignment'), ('note', 'Note'), ('announcement_comment', 'Announcement comment'), ('assignment_comment', 'Assignment comment')], max_length=30)),
+                ('object_id', models.IntegerField()),
+                ('parent_id', models.IntegerField(blank=True, null=True)),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.course')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('kind', models.CharField(max_length=30)),
+                ('weight', models.FloatField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.course')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='kucms.searchdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'course'], name='kucms_searc_term_11d992_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='announcementcomment',
+            index=models.Index(fields=['announcement', 'created_at'], name='kucms_annou_announc_0b9bc6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['course', 'due_date'], name='kucms_assig_course__d2f6bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentcomment',
+            index=models.Index(fields=['assignment', 'created_at'], name='kucms_assig_assignm_578ee1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'course', 'date'], name='kucms_atten_student_67d76e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['class_group', 'faculty'], name='kucms_cours_class_g_99a802_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['course', 'student'], name='kucms_grade_course__8de4a9_idx'),
+        ),
+    ]
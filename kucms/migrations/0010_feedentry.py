@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0009_sessionrollover'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.IntegerField()),
+                ('kind', models.CharField(choices=[('announcement', 'Announcement'), ('assignment', 'Assignment'), ('note', 'Note')], max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('summary', models.CharField(blank=True, max_length=300)),
+                ('created_at', models.DateTimeField()),
+                ('class_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.class')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.course')),
+                ('program', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='kucms.program')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['program', 'semester', 'created_at', 'id'], name='kucms_feede_program_f10537_idx')],
+                'unique_together': {('kind', 'object_id', 'class_group')},
+            },
+        ),
+    ]
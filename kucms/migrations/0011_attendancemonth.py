@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0010_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('marked', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kucms.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'month'], name='kucms_atten_course__6def4b_idx')],
+                'unique_together': {('student', 'course', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kucms', '0011_attendancemonth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcademicYearArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.CharField(max_length=20, unique=True)),
+                ('status', models.CharField(choices=[('copying', 'Copying'), ('complete', 'Complete'), ('failed', 'Failed')], default='copying', max_length=20)),
+                ('checkpoints', models.JSONField(blank=True, default=dict)),
+                ('copied', models.JSONField(blank=True, default=dict)),
+                ('purged', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAnnouncementComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('academic_year', models.CharField(db_index=True, max_length=20)),
+                ('comment', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kucms.announcement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['announcement', 'created_at'], name='kucms_archi_announc_777569_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAssignmentComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('academic_year', models.CharField(db_index=True, max_length=20)),
+                ('comment', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kucms.assignment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignment', 'created_at'], name='kucms_archi_assignm_88e483_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendance',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('academic_year', models.CharField(db_index=True, max_length=20)),
+                ('date', models.DateField()),
+                ('is_present', models.BooleanField(default=False)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kucms.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kucms.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'course', 'date'], name='kucms_archi_student_d54713_idx')],
+                'unique_together': {('course', 'student', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedGrade',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('academic_year', models.CharField(db_index=True, max_length=20)),
+                ('title', models.CharField(max_length=100)),
+                ('marks_obtained', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('total_marks', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('remarks', models.TextField(blank=True)),
+                ('date', models.DateField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kucms.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='kucms.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'academic_year'], name='kucms_archi_student_9a9e52_idx'), models.Index(fields=['course', 'student'], name='kucms_archi_course__eff4ed_idx')],
+            },
+        ),
+    ]
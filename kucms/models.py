@@ -1,8 +1,12 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import FileExtensionValidator
 from django.contrib.auth.models import BaseUserManager
 
+from .storage import course_file_storage
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         """
@@ -21,6 +25,8 @@ class CustomUserManager(BaseUserManager):
         Create and return a superuser with an email and password.
         """
         extra_fields.setdefault('is_active', True)
+        extra_fields.setdefault('is_staff', True)
+        extra_fields.setdefault('is_superuser', True)
         return self.create_user(email, password, **extra_fields)
 
     def authenticate(self, request, email=None, password=None):
@@ -48,6 +54,8 @@ class User(AbstractUser):
     user_type = models.CharField(max_length=10, choices=USER_TYPES)
     is_active = models.BooleanField(default=True)
     email = models.EmailField(unique=True)  # Ensure email is unique
+
+    objects = CustomUserManager()
     
     # Set the email as the USERNAME_FIELD for authentication
     USERNAME_FIELD = 'email'
@@ -140,6 +148,9 @@ class Course(models.Model):
     code = models.CharField(max_length=20)
     class_group = models.ForeignKey(Class, on_delete=models.CASCADE)
     faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [models.Index(fields=['class_group', 'faculty'])]
     
     def __str__(self):
         return f"{self.code} - {self.name}"
@@ -153,11 +164,15 @@ class Assignment(models.Model):
     description = models.TextField()
     file = models.FileField(
         upload_to='assignments/',
+        storage=course_file_storage,
         validators=[FileExtensionValidator(['pdf', 'doc', 'docx'])],
         null=True, blank=True
     )
     due_date = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['course', 'due_date'])]
     
     def __str__(self):
         return f"{self.title} - {self.course.code}"
@@ -170,6 +185,9 @@ class AssignmentComment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['assignment', 'created_at'])]
     
     def __str__(self):
         return f"Comment by {self.user.username} on {self.assignment.title}"
@@ -185,10 +203,59 @@ class Attendance(models.Model):
     
     class Meta:
         unique_together = ('course', 'student', 'date')
+        # Per-student reports lead with the student rather than the course
+        indexes = [models.Index(fields=['student', 'course', 'date'])]
     
     def __str__(self):
         return f"{self.student.registration_number} - {self.date}"
 
+class AttendanceSummary(models.Model):
+    """
+    Running attendance totals for a student in a course.
+
+    The row with an empty period holds the all-time totals; the others hold
+    the totals for one month ('YYYY-MM').
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    period = models.CharField(max_length=7, blank=True, default='')
+    present_count = models.PositiveIntegerField(default=0)
+    total_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('student', 'course', 'period')
+
+    @property
+    def percentage(self):
+        if not self.total_count:
+            return None
+        return round(100 * self.present_count / self.total_count, 2)
+
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id} - {self.period or 'all'}"
+
+class AttendanceMonth(models.Model):
+    """
+    A month of one student's attendance in a course, as day bitmaps.
+
+    Bit d - 1 of `marked` is set when attendance was taken on day d and the
+    same bit of `present` when the student attended. Used instead of
+    Attendance rows when ATTENDANCE_STORAGE is 'bitmap'.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    month = models.DateField(help_text='First day of the month')
+    marked = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('student', 'course', 'month')
+        # Course registers read every student of a course for a date range
+        indexes = [models.Index(fields=['course', 'month'])]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id} - {self.month:%Y-%m}"
+
 class Grade(models.Model):
     """
     Student grades
@@ -200,6 +267,9 @@ class Grade(models.Model):
     total_marks = models.DecimalField(max_digits=5, decimal_places=2)
     remarks = models.TextField(blank=True)
     date = models.DateField()
+
+    class Meta:
+        indexes = [models.Index(fields=['course', 'student'])]
     
     def __str__(self):
         return f"{self.student.registration_number} - {self.title}"
@@ -212,6 +282,7 @@ class Note(models.Model):
     title = models.CharField(max_length=200)
     file = models.FileField(
         upload_to='notes/',
+        storage=course_file_storage,
         validators=[FileExtensionValidator(['pdf', 'doc', 'docx', 'ppt', 'pptx'])]
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -239,6 +310,310 @@ class AnnouncementComment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['announcement', 'created_at'])]
     
     def __str__(self):
-        return f"Comment by {self.user.username} on {self.announcement.title}"
\ No newline at end of file
+        return f"Comment by {self.user.username} on {self.announcement.title}"
+
+class Job(models.Model):
+    """
+    Background job picked up by the `run_worker` management command.
+
+    A running job's worker renews `heartbeat_at`; a job whose heartbeat is
+    older than JOB_LEASE_SECONDS is assumed abandoned and claimed again.
+    """
+    STATUSES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued')
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    errors = models.JSONField(default=list, blank=True)
+    total = models.IntegerField(null=True, blank=True)
+    processed = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} - {self.status}"
+
+
+class SessionRollover(models.Model):
+    """
+    Start of an academic year: next-year classes plus one semester promotion.
+
+    Keyed on the academic year being started so it can only happen once;
+    `last_student_id` is the checkpoint a resumed run continues from.
+    """
+    STATUSES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    )
+
+    academic_year = models.CharField(max_length=20, unique=True)
+    from_year = models.CharField(max_length=20, blank=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued')
+    classes_created = models.IntegerField(default=0)
+    last_student_id = models.IntegerField(default=0)
+    promoted = models.IntegerField(default=0)
+    total = models.IntegerField(null=True, blank=True)
+    job = models.ForeignKey(Job, null=True, blank=True, on_delete=models.SET_NULL)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Rollover to {self.academic_year} - {self.status}"
+
+
+
+class UploadSession(models.Model):
+    """
+    Resumable upload of a course file sent in numbered chunks
+    """
+    TARGETS = (
+        ('note', 'Note'),
+        ('assignment', 'Assignment'),
+    )
+    STATUSES = (
+        ('open', 'Open'),
+        ('complete', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    target = models.CharField(max_length=20, choices=TARGETS)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUSES, default='open')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        if index == self.total_chunks - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
+
+    def __str__(self):
+        return f"{self.filename} ({self.target}) - {self.status}"
+
+
+class UploadChunk(models.Model):
+    """
+    A chunk of an UploadSession confirmed on disk
+    """
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    checksum = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ('session', 'index')
+
+    def __str__(self):
+        return f"{self.session_id} #{self.index}"
+
+
+class FileBlob(models.Model):
+    """
+    One physical copy of course file content, shared by identical uploads
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.ref_count} refs)"
+
+
+class FileReference(models.Model):
+    """
+    A stored file name and the blob holding its bytes
+    """
+    name = models.CharField(max_length=255, unique=True)
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, related_name='references')
+
+    def __str__(self):
+        return self.name
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable copy of an announcement, assignment, note or comment
+    """
+    KINDS = (
+        ('announcement', 'Announcement'),
+        ('assignment', 'Assignment'),
+        ('note', 'Note'),
+        ('announcement_comment', 'Announcement comment'),
+        ('assignment_comment', 'Assignment comment'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KINDS)
+    object_id = models.IntegerField()
+    parent_id = models.IntegerField(null=True, blank=True)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} - {self.title}"
+
+
+class SearchPosting(models.Model):
+    """
+    Inverted index entry: a term, a document containing it and its BM25 term weight
+    """
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=30)
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=['term', 'course'])]
+
+    def __str__(self):
+        return f"{self.term} -> {self.document_id}"
+
+
+class FeedEntry(models.Model):
+    """
+    Activity feed row written once per class when course content is published.
+
+    Program and semester are copied from the class so a student's feed is a
+    single range scan on (program, semester, created_at, id).
+    """
+    KINDS = (
+        ('announcement', 'Announcement'),
+        ('assignment', 'Assignment'),
+        ('note', 'Note'),
+    )
+
+    class_group = models.ForeignKey(Class, on_delete=models.CASCADE)
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, db_index=False)
+    semester = models.IntegerField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.IntegerField()
+    title = models.CharField(max_length=200)
+    summary = models.CharField(max_length=300, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('kind', 'object_id', 'class_group')
+        indexes = [models.Index(fields=['program', 'semester', 'created_at', 'id'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} - {self.title}"
+
+
+class AcademicYearArchive(models.Model):
+    """
+    Progress of moving a closed academic year out of the hot tables.
+
+    Rows are copied into the Archived* tables first; once every table is
+    copied the year is 'complete' and reads switch to the archive, then the
+    copied rows are deleted from the hot tables. `checkpoints` holds the last
+    copied primary key per table, and under '<table>:purged' the last one
+    purged, so an interrupted run resumes.
+    """
+    STATUSES = (
+        ('copying', 'Copying'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    )
+
+    academic_year = models.CharField(max_length=20, unique=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='copying')
+    checkpoints = models.JSONField(default=dict, blank=True)
+    copied = models.JSONField(default=dict, blank=True)
+    purged = models.JSONField(default=dict, blank=True)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Archive of {self.academic_year} - {self.status}"
+
+
+# Archive tables mirror their hot counterparts, keep the original ids and
+# record the academic year the row was archived under.
+
+class ArchivedAttendance(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    academic_year = models.CharField(max_length=20, db_index=True)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    is_present = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('course', 'student', 'date')
+        indexes = [models.Index(fields=['student', 'course', 'date'])]
+
+
+class ArchivedGrade(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    academic_year = models.CharField(max_length=20, db_index=True)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=100)
+    marks_obtained = models.DecimalField(max_digits=5, decimal_places=2)
+    total_marks = models.DecimalField(max_digits=5, decimal_places=2)
+    remarks = models.TextField(blank=True)
+    date = models.DateField()
+
+    class Meta:
+        indexes = [models.Index(fields=['student', 'academic_year']), models.Index(fields=['course', 'student'])]
+
+
+class ArchivedAssignmentComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    academic_year = models.CharField(max_length=20, db_index=True)
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    comment = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['assignment', 'created_at'])]
+
+
+class ArchivedAnnouncementComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    academic_year = models.CharField(max_length=20, db_index=True)
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    comment = models.TextField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['announcement', 'created_at'])]
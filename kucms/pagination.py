@@ -0,0 +1,114 @@
+"""
+Keyset (seek) pagination.
+
+The cursor carries the ordering values of the last row served, and the next
+page starts strictly after them. Each page is therefore one range scan on
+an index matching the ordering, however deep the client reads. Rows
+inserted at the head also never shift later pages the way OFFSET pages do.
+"""
+import base64
+import json
+
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on `ordering`, which must end in a unique field such as id
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, values):
+        raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def after(self, position):
+        """
+        Q selecting rows that sort strictly after `position`
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {previous.lstrip('-'): value for previous, value in zip(self.ordering[:index], position)}
+            condition |= Q(**equal, **{f'{name}__{lookup}': position[index]})
+        return condition
+
+    def field_value(self, row, field):
+        name = field.lstrip('-')
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        rows = list(queryset[:size + 1])
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self.encode_cursor([self.field_value(rows[-1], field) for field in self.ordering])
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
+class CommentPagination(KeysetPagination):
+    """
+    Comment threads, oldest first
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    max_page_size = 200
+
+
+def comment_count(comment_model, parent_field):
+    """
+    Correlated count of a parent's comments, for annotating list querysets
+    """
+    counts = (
+        comment_model.objects.filter(**{parent_field: OuterRef('pk')})
+        .order_by().values(parent_field).annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
@@ -6,4 +6,12 @@ class IsFacultyUser(permissions.BasePermission):
 
 class IsStudentUser(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.user_type == 'student'
\ No newline at end of file
+        return request.user.is_authenticated and request.user.user_type == 'student'
+
+class IsAdminOrReadOnly(permissions.BasePermission):
+    """
+    Anyone may read; only staff may write
+    """
+    def has_permission(self, request, view):
+        return request.method in permissions.SAFE_METHODS or bool(request.user and request.user.is_staff)
+
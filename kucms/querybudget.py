@@ -0,0 +1,97 @@
+"""
+SQL query budget guard for API endpoints.
+
+Views declare how many queries an action is allowed to run. When an action
+goes over its budget we log a warning, or raise when QUERY_BUDGET_STRICT is
+enabled (config.test_settings turns it on so N+1 regressions fail the
+tests).
+"""
+import functools
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised in strict mode when a view runs more queries than it declared
+    """
+
+
+# Transaction control statements; only some backends send them through the cursor
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that counts the queries it sees, leaving out
+    transaction control so budgets mean the same on every backend
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def check_budget(label, count, budget):
+    """
+    Compare a query count against a budget and log or raise if it is over
+    """
+    if budget is None or count <= budget:
+        return
+    message = f'{label} ran {count} queries (budget {budget})'
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def query_budget(limit):
+    """
+    Decorator enforcing a query budget on a single view function or method
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                result = func(*args, **kwargs)
+            check_budget(func.__qualname__, counter.count, limit)
+            return result
+        return wrapper
+    return decorator
+
+
+class QueryBudgetMixin:
+    """
+    Viewset mixin enforcing `query_budget` on every dispatched request.
+
+    `query_budget` is either an int applied to every action, or a dict mapping
+    action names to budgets with an optional '*' fallback. Budgets count the
+    view's own queries: those kucms.scope spent loading the caller's scope
+    on a cache miss are checked against its budget and added on top.
+    """
+    query_budget = None
+
+    def get_query_budget(self):
+        budget = self.query_budget
+        if isinstance(budget, dict):
+            action = getattr(self, 'action', None)
+            return budget.get(action, budget.get('*'))
+        return budget
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+        label = f'{self.__class__.__name__}.{getattr(self, "action", None) or request.method.lower()}'
+        budget = self.get_query_budget()
+        if budget is not None:
+            budget += getattr(getattr(self, 'request', request), '_scope_queries', 0)
+        check_budget(label, counter.count, budget)
+        return response
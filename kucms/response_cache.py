@@ -0,0 +1,114 @@
+"""
+Versioned response cache for course-scoped list endpoints.
+
+Every course has a content version in the cache that signal handlers bump
+whenever its announcements, notes, assignments or comments change. A cached
+response is keyed on the endpoint, the caller's visible courses, the query
+parameters and the versions of those courses, so any write to one of them
+moves readers onto a fresh key. The key doubles as a strong ETag: it
+changes with every write, so a matching If-None-Match is answered with 304
+from the versions alone, without reading the cached body.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .scope import get_scope
+
+
+def version_key(course_id, namespace='content'):
+    return f'kucms:{namespace}:{course_id}'
+
+
+def course_versions(course_ids, namespace='content'):
+    """
+    Current version of each course in a namespace, seeding missing ones.
+
+    'content' covers announcements, notes, assignments and comments;
+    'records' covers attendance and grades.
+    """
+    keys = {version_key(course_id, namespace): course_id for course_id in course_ids}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # Seed with a timestamp rather than 0 so an evicted version can never
+        # come back as a value an old cached response was stored under
+        cache.add(key, time.time_ns(), timeout=None)
+        found[key] = cache.get(key)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def bump_course_version(course_id, namespace='content'):
+    try:
+        cache.incr(version_key(course_id, namespace))
+    except ValueError:
+        cache.set(version_key(course_id, namespace), time.time_ns(), timeout=None)
+
+
+def response_cache_key(request, endpoint, scope):
+    """
+    Cache key for a request, or None when the caller is not course-scoped
+    """
+    if not scope.is_restricted:
+        return None
+    versions = course_versions(sorted(scope.course_ids))
+    params = sorted(request.query_params.lists())
+    raw = '|'.join([
+        endpoint,
+        request.get_host(),
+        request.path,
+        repr(params),
+        scope.user_type,
+        ','.join(f'{course_id}:{versions[course_id]}' for course_id in sorted(versions)),
+    ])
+    return 'kucms:response:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+
+def cached_response(request, key, build, timeout=None):
+    """
+    Serve the data of `build()` from the cache under `key`, answering a
+    matching If-None-Match with 304. Only 200 responses are cached.
+    """
+    etag = f'"{key.rsplit(":", 1)[1][:40]}"'
+    if etag_matches(request, etag):
+        # The key moves on with every write, so a match is current
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['X-Cache'] = 'HIT'
+    else:
+        entry = cache.get(key)
+        if entry is not None:
+            response = Response(entry)
+            response['X-Cache'] = 'HIT'
+        else:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            if timeout is None:
+                timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+            cache.set(key, response.data, timeout=timeout)
+            response['X-Cache'] = 'MISS'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization, Cookie'
+    return response
+
+
+class ResponseCacheMixin:
+    """
+    Viewset mixin caching list responses per course scope with ETag support
+    """
+    def list(self, request, *args, **kwargs):
+        key = response_cache_key(request, f'{self.basename}-list', get_scope(request))
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        return cached_response(
+            request, key, lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs)
+        )
@@ -0,0 +1,140 @@
+"""
+Resumable start-of-year rollover.
+
+Starting an academic year copies the previous year's classes and promotes
+every active student by one semester. A SessionRollover row keyed on the
+new academic year makes the operation happen once. Students are promoted
+in primary-key batches, each in its own short transaction together with
+the checkpoint, so a crashed run resumes after the last committed batch
+and no student is ever promoted twice.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import Class, SessionRollover, Student
+from .scope import invalidate_all_scopes
+
+ACADEMIC_YEAR_RE = re.compile(r'^\d{4}(-\d{4})?$')
+
+
+def current_academic_year(today=None):
+    """
+    The academic year in progress, e.g. '2025-2026'
+    """
+    today = today or timezone.localdate()
+    first = today.year if today.month >= getattr(settings, 'ACADEMIC_YEAR_START_MONTH', 8) else today.year - 1
+    return f'{first}-{first + 1}'
+
+
+def valid_academic_year(value):
+    return bool(ACADEMIC_YEAR_RE.match(value or ''))
+
+
+def start_year(academic_year):
+    """
+    The calendar year an academic year starts in, for '2025' and '2025-2026' alike
+    """
+    return int(academic_year[:4])
+
+
+def start_rollover(academic_year, user=None):
+    """
+    Get or create the rollover into academic_year; returns (rollover, created)
+    """
+    from_year = (
+        Class.objects.filter(academic_year__lt=academic_year)
+        .aggregate(year=Max('academic_year'))['year'] or ''
+    )
+    return SessionRollover.objects.get_or_create(
+        academic_year=academic_year,
+        defaults={'from_year': from_year, 'created_by_id': user.id if user else None},
+    )
+
+
+def create_classes(rollover):
+    """
+    Copy the previous year's classes into the new year; safe to repeat
+    """
+    if rollover.from_year:
+        Class.objects.bulk_create(
+            [
+                Class(program_id=program_id, semester=semester, academic_year=rollover.academic_year)
+                for program_id, semester in Class.objects.filter(academic_year=rollover.from_year)
+                .values_list('program_id', 'semester')
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+    return Class.objects.filter(academic_year=rollover.academic_year).count()
+
+
+def active_students():
+    return Student.objects.filter(user__is_active=True)
+
+
+def promote_batch(rollover_id, batch_size):
+    """
+    Promote the next batch after the checkpoint; returns (rollover, promoted)
+    """
+    with transaction.atomic():
+        rollover = SessionRollover.objects.select_for_update().get(pk=rollover_id)
+        ids = list(
+            active_students().filter(pk__gt=rollover.last_student_id)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if ids:
+            Student.objects.filter(pk__in=ids).update(current_semester=F('current_semester') + 1)
+            rollover.last_student_id = ids[-1]
+            rollover.promoted += len(ids)
+            rollover.save(update_fields=['last_student_id', 'promoted'])
+    return rollover, len(ids)
+
+
+def run_rollover(rollover, batch_size=None, progress=None):
+    """
+    Run a rollover to completion, resuming from its checkpoint.
+
+    progress, if given, is called with (promoted, total) after each batch.
+    """
+    if rollover.status == 'complete':
+        return rollover
+    batch_size = batch_size or getattr(settings, 'ROLLOVER_BATCH_SIZE', 1000)
+
+    rollover.status = 'running'
+    rollover.started_at = rollover.started_at or timezone.now()
+    rollover.save(update_fields=['status', 'started_at'])
+    try:
+        rollover.classes_created = create_classes(rollover)
+        rollover.total = rollover.promoted + active_students().filter(pk__gt=rollover.last_student_id).count()
+        rollover.save(update_fields=['classes_created', 'total'])
+
+        while True:
+            rollover, count = promote_batch(rollover.pk, batch_size)
+            if progress:
+                progress(rollover.promoted, rollover.total)
+            if count < batch_size:
+                break
+        # Completing the rollover moves student scopes to the new year's classes
+        rollover.status = 'complete'
+        rollover.finished_at = timezone.now()
+        rollover.save(update_fields=['status', 'finished_at'])
+    except Exception:
+        SessionRollover.objects.filter(pk=rollover.pk).update(status='failed')
+        raise
+    finally:
+        # Promoted students must not keep serving last semester's courses
+        invalidate_all_scopes()
+    return rollover
+
+
+def rollover_result(rollover):
+    return {
+        'academic_year': rollover.academic_year,
+        'from_year': rollover.from_year,
+        'classes': rollover.classes_created,
+        'promoted': rollover.promoted,
+    }
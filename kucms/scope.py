@@ -0,0 +1,178 @@
+"""
+Resolution of the courses a user can see.
+
+A student sees the courses of their program's current semester in the
+current academic year, and a faculty member sees the courses they teach. Working that out needs the
+profile plus a join through Course -> Class -> Program, so the result is
+memoized on the request and cached per user. Signal handlers drop a user's
+entry when their profile changes and bump a global generation when courses
+or classes change. Loading a scope on a cache miss is held to its own
+query budget and recorded on the request, so QueryBudgetMixin charges it
+separately from the view's.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Exists, Q, Subquery
+
+from .models import Course, Faculty, SessionRollover, Student
+from .querybudget import QueryCounter, check_budget
+
+GENERATION_KEY = 'kucms:scope:generation'
+
+# Profile plus course ids
+SCOPE_QUERY_BUDGET = 2
+
+
+class AcademicScope:
+    """
+    The profile ids and visible course ids of one user
+    """
+    def __init__(self, user_id, user_type, student_id=None, faculty_id=None,
+                 program_id=None, semester=None, course_ids=()):
+        self.user_id = user_id
+        self.user_type = user_type
+        self.student_id = student_id
+        self.faculty_id = faculty_id
+        self.program_id = program_id
+        self.semester = semester
+        self.course_ids = frozenset(course_ids)
+
+    @property
+    def is_restricted(self):
+        """
+        Whether the user only sees their own courses (admins see everything)
+        """
+        return self.user_type in ('student', 'faculty')
+
+    def can_view_course(self, course_id):
+        if not self.is_restricted:
+            return True
+        try:
+            return int(course_id) in self.course_ids
+        except (TypeError, ValueError):
+            return False
+
+
+def generation():
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        value = cache.get(GENERATION_KEY, 1)
+    return value
+
+
+def scope_cache_key(user_id):
+    return f'kucms:scope:{generation()}:{user_id}'
+
+
+def current_year_courses():
+    """
+    Filter on Course for the classes of the academic year in progress.
+
+    That is the year most recently started by a complete rollover; once one
+    has run, every class of a program and semester exists once per year.
+    Before the first rollover there is only one year, so nothing is filtered.
+    """
+    started = SessionRollover.objects.filter(status='complete')
+    return (
+        Q(class_group__academic_year=Subquery(started.order_by('-finished_at', '-pk').values('academic_year')[:1]))
+        | ~Exists(started)
+    )
+
+
+def student_courses(program_id, semester):
+    return Course.objects.filter(
+        current_year_courses(), class_group__program_id=program_id, class_group__semester=semester,
+    ).values_list('id', flat=True)
+
+
+def scope_from_claims(user, claims):
+    """
+    Build a scope from token claims, which saves looking up the profile
+    """
+    if user.user_type == 'student' and claims.get('student_id'):
+        course_ids = student_courses(claims['program_id'], claims['semester'])
+        return AcademicScope(
+            user.id, user.user_type, student_id=claims['student_id'],
+            program_id=claims['program_id'], semester=claims['semester'],
+            course_ids=course_ids,
+        )
+    if user.user_type == 'faculty' and claims.get('faculty_id'):
+        course_ids = Course.objects.filter(faculty_id=claims['faculty_id']).values_list('id', flat=True)
+        return AcademicScope(user.id, user.user_type, faculty_id=claims['faculty_id'], course_ids=course_ids)
+    return None
+
+
+def load_scope(user):
+    """
+    Build a user's scope from the database
+    """
+    claims = getattr(user, 'profile_claims', None)
+    if claims and claims.get('scope_gen') == generation():
+        scope = scope_from_claims(user, claims)
+        if scope is not None:
+            return scope
+    if user.user_type == 'student':
+        profile = (
+            Student.objects.filter(user_id=user.id)
+            .values('id', 'program_id', 'current_semester')
+            .first()
+        )
+        if profile is None:
+            return AcademicScope(user.id, user.user_type)
+        course_ids = student_courses(profile['program_id'], profile['current_semester'])
+        return AcademicScope(
+            user.id, user.user_type, student_id=profile['id'],
+            program_id=profile['program_id'], semester=profile['current_semester'],
+            course_ids=course_ids,
+        )
+    if user.user_type == 'faculty':
+        faculty_id = Faculty.objects.filter(user_id=user.id).values_list('id', flat=True).first()
+        course_ids = Course.objects.filter(faculty_id=faculty_id).values_list('id', flat=True)
+        return AcademicScope(user.id, user.user_type, faculty_id=faculty_id, course_ids=course_ids)
+    return AcademicScope(user.id, user.user_type)
+
+
+def get_scope(request):
+    """
+    The scope of request.user, memoized on the request and cached per user
+    """
+    scope = getattr(request, '_academic_scope', None)
+    if scope is not None:
+        return scope
+    user = request.user
+    key = scope_cache_key(user.id)
+    scope = cache.get(key)
+    if scope is None:
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            scope = load_scope(user)
+        check_budget('load_scope', counter.count, SCOPE_QUERY_BUDGET)
+        request._scope_queries = counter.count
+        cache.set(key, scope, timeout=getattr(settings, 'ACADEMIC_SCOPE_CACHE_TIMEOUT', 600))
+    request._academic_scope = scope
+    return scope
+
+
+def invalidate_user_scope(user_id):
+    cache.delete(scope_cache_key(user_id))
+
+
+def invalidate_all_scopes():
+    """
+    Drop every cached scope, e.g. after courses move or students are promoted in bulk
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, timeout=None)
+
+
+class AcademicScopeMixin:
+    """
+    Viewset mixin exposing the caller's AcademicScope as `self.scope`
+    """
+    @property
+    def scope(self):
+        return get_scope(self.request)
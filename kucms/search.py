@@ -0,0 +1,279 @@
+"""
+Full-text search over course content.
+
+Announcements, assignments, notes and comments are tokenized into an
+in-app inverted index (SearchDocument/SearchPosting) kept current by signal
+handlers, so the same code runs on MySQL and on SQLite. Each posting
+carries a precomputed BM25 term weight plus the course and kind of its
+document, which lets a query be answered from the (term, course) index:
+one grouped query ranks the documents in the caller's scope, and term
+document frequencies for the IDF factor come from the cache.
+"""
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.utils.html import escape
+
+from .models import (
+    Announcement, AnnouncementComment, Assignment, AssignmentComment, Note,
+    SearchDocument, SearchPosting
+)
+
+TOKEN_RE = re.compile(r'\w+')
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have i if in into is it its of on or '
+    'so that the their there this to was we were will with you your'.split()
+)
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+TITLE_BOOST = 3
+# BM25 parameters; lengths are normalized against a fixed reference length
+# so stored weights stay valid as the corpus grows
+K1 = 1.2
+B = 0.75
+REFERENCE_LENGTH = 120
+SNIPPET_LENGTH = 200
+TOTAL_KEY = 'kucms:search:documents'
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def note_body(note):
+    name = os.path.splitext(os.path.basename(note.file.name or ''))[0]
+    return re.sub(r'[_\-.]+', ' ', name)
+
+
+# kind -> (model, select_related, extractor returning (course_id, parent_id, title, body))
+SOURCES = {
+    'announcement': (Announcement, (), lambda obj: (obj.course_id, None, obj.title, obj.content)),
+    'assignment': (Assignment, (), lambda obj: (obj.course_id, None, obj.title, obj.description)),
+    'note': (Note, (), lambda obj: (obj.course_id, None, obj.title, note_body(obj))),
+    'announcement_comment': (AnnouncementComment, ('announcement',), lambda obj: (
+        obj.announcement.course_id, obj.announcement_id, obj.announcement.title, obj.comment
+    )),
+    'assignment_comment': (AssignmentComment, ('assignment',), lambda obj: (
+        obj.assignment.course_id, obj.assignment_id, obj.assignment.title, obj.comment
+    )),
+}
+# Comments show their parent's title but are only matched on their own text
+COMMENT_KINDS = {'announcement_comment': 'announcement', 'assignment_comment': 'assignment'}
+
+
+def kind_for(model):
+    for kind, (source_model, _, _) in SOURCES.items():
+        if source_model is model:
+            return kind
+    return None
+
+
+def term_weights(kind, title, body):
+    counts = Counter(tokenize(body))
+    if kind not in COMMENT_KINDS:
+        for term in tokenize(title):
+            counts[term] += TITLE_BOOST
+    length = sum(counts.values())
+    norm = K1 * (1 - B + B * length / REFERENCE_LENGTH)
+    return {term: tf * (K1 + 1) / (tf + norm) for term, tf in counts.items()}
+
+
+def postings_for(document, weights):
+    return [
+        SearchPosting(term=term, document=document, course_id=document.course_id,
+                      kind=document.kind, weight=weight)
+        for term, weight in weights.items()
+    ]
+
+
+def index_object(kind, obj, created=False):
+    """
+    Add or refresh one object's document and postings
+    """
+    course_id, parent_id, title, body = SOURCES[kind][2](obj)
+    values = {'course_id': course_id, 'parent_id': parent_id, 'title': title[:200], 'body': body or ''}
+    with transaction.atomic():
+        if created:
+            document = SearchDocument.objects.create(kind=kind, object_id=obj.pk, **values)
+        else:
+            document, _ = SearchDocument.objects.update_or_create(kind=kind, object_id=obj.pk, defaults=values)
+            SearchPosting.objects.filter(document=document).delete()
+        SearchPosting.objects.bulk_create(postings_for(document, term_weights(kind, title, body)))
+        if kind in COMMENT_KINDS.values() and not created:
+            comment_kind = next(k for k, parent in COMMENT_KINDS.items() if parent == kind)
+            SearchDocument.objects.filter(kind=comment_kind, parent_id=obj.pk).update(title=title[:200])
+
+
+def remove_object(kind, object_id):
+    """
+    Drop one object's document, and those of its comments along with it
+    """
+    documents = Q(kind=kind, object_id=object_id)
+    for comment_kind, parent_kind in COMMENT_KINDS.items():
+        if parent_kind == kind:
+            documents |= Q(kind=comment_kind, parent_id=object_id)
+    SearchDocument.objects.filter(documents).delete()
+
+
+def rebuild_index(kinds=None, batch_size=500, progress=None):
+    """
+    Re-index every object of the given kinds; returns documents indexed per kind
+    """
+    counts = {}
+    for kind in kinds or SOURCES:
+        model, related, extract = SOURCES[kind]
+        SearchDocument.objects.filter(kind=kind).delete()
+        counts[kind] = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.select_related(*related).filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            sources = {obj.pk: extract(obj) for obj in batch}
+            with transaction.atomic():
+                SearchDocument.objects.bulk_create([
+                    SearchDocument(kind=kind, object_id=pk, course_id=course_id, parent_id=parent_id,
+                                   title=title[:200], body=body or '')
+                    for pk, (course_id, parent_id, title, body) in sources.items()
+                ])
+                # Re-fetch so primary keys are known on backends that do not return them
+                documents = SearchDocument.objects.filter(kind=kind, object_id__in=sources)
+                postings = []
+                for document in documents:
+                    _, _, title, body = sources[document.object_id]
+                    postings.extend(postings_for(document, term_weights(kind, title, body)))
+                SearchPosting.objects.bulk_create(postings, batch_size=2000)
+            counts[kind] += len(batch)
+            if progress:
+                progress(kind, counts[kind])
+    cache.delete(TOTAL_KEY)
+    return counts
+
+
+def term_key(term):
+    return 'kucms:search:df:' + hashlib.md5(term.encode()).hexdigest()
+
+
+def inverse_document_frequencies(terms):
+    """
+    BM25 IDF of each term, with document frequencies cached briefly
+    """
+    keys = {term_key(term): term for term in terms}
+    cached = cache.get_many([TOTAL_KEY, *keys])
+    timeout = getattr(settings, 'SEARCH_STATS_TIMEOUT', 600)
+
+    total = cached.pop(TOTAL_KEY, None)
+    if total is None:
+        total = SearchDocument.objects.count()
+        cache.set(TOTAL_KEY, total, timeout)
+    frequencies = {keys[key]: value for key, value in cached.items()}
+    missing = [term for term in terms if term not in frequencies]
+    if missing:
+        counted = dict(
+            SearchPosting.objects.filter(term__in=missing)
+            .values('term').annotate(n=Count('id')).values_list('term', 'n')
+        )
+        fresh = {term: counted.get(term, 0) for term in missing}
+        cache.set_many({term_key(term): n for term, n in fresh.items()}, timeout)
+        frequencies.update(fresh)
+    return {
+        term: math.log(1 + (total - n + 0.5) / (n + 0.5))
+        for term, n in frequencies.items()
+    }
+
+
+def highlight(text, terms, length=None):
+    """
+    HTML-escaped excerpt of `text` around the first match, with matches in <mark>
+    """
+    text = text or ''
+    pattern = re.compile(
+        r'(?<!\w)(' + '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r')(?!\w)',
+        re.IGNORECASE,
+    )
+    prefix = suffix = ''
+    if length is not None and len(text) > length:
+        match = pattern.search(text)
+        start = 0
+        if match and match.start() > length // 3:
+            start = text.rfind(' ', 0, match.start() - length // 3) + 1
+            prefix = '…'
+        end = start + length
+        if end < len(text):
+            space = text.rfind(' ', start, end)
+            if space > start:
+                end = space
+            suffix = '…'
+        text = text[start:end]
+
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group(0))}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return prefix + ''.join(parts) + suffix
+
+
+def search(query, scope, kinds=None, course_id=None, limit=20, offset=0):
+    """
+    Ranked, highlighted hits for `query` within the caller's scope.
+
+    Documents matching more of the query terms rank first, then by BM25 score.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    postings = SearchPosting.objects.filter(term__in=terms)
+    if scope.is_restricted:
+        postings = postings.filter(course_id__in=scope.course_ids)
+    if course_id is not None:
+        postings = postings.filter(course_id=course_id)
+    if kinds:
+        postings = postings.filter(kind__in=kinds)
+
+    idf = inverse_document_frequencies(terms)
+    ranked = list(
+        postings.values('document_id')
+        .annotate(
+            matched=Count('id'),
+            score=Sum(Case(
+                *[When(term=term, then=F('weight') * idf[term]) for term in terms],
+                default=0.0, output_field=FloatField(),
+            )),
+        )
+        .order_by('-matched', '-score', '-document_id')[offset:offset + limit]
+    )
+    documents = SearchDocument.objects.in_bulk([row['document_id'] for row in ranked])
+
+    hits = []
+    for row in ranked:
+        document = documents.get(row['document_id'])
+        if document is None:
+            continue
+        hits.append({
+            'type': document.kind,
+            'id': document.object_id,
+            'parent_id': document.parent_id,
+            'course': document.course_id,
+            'title': document.title,
+            'highlighted_title': highlight(document.title, terms),
+            'snippet': highlight(document.body, terms, SNIPPET_LENGTH),
+            'score': round(row['score'], 4),
+        })
+    return hits
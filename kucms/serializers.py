@@ -1,26 +1,60 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.db import models as db_models
 from .models import *
+from .jobs import cached_progress
+from . import bitsets
+from .values_serializers import Nested, Value, ValuesSerializer, decimal_string, full_name, iso_date
+from .fieldsets import SparseFieldsMixin
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    ModelSerializer honouring ?fields= and ?expand= (see kucms.fieldsets)
+    """
+
+class DownloadFileField(serializers.FileField):
+    """
+    Upload field rendered as the permission-checked download action of its
+    object, since course files are not served under MEDIA_URL
+    """
+    def to_representation(self, value):
+        if not value:
+            return None
+        instance = value.instance
+        return reverse(
+            f'{instance._meta.model_name}-download', args=[instance.pk], request=self.context.get('request')
+        )
+
+
+# Model serializer mapping for course files, which are only reachable through downloads
+DOWNLOAD_FIELD_MAPPING = {**serializers.ModelSerializer.serializer_field_mapping, db_models.FileField: DownloadFileField}
+
+# Course content writes load what the response, the feed and the search index read
+CONTENT_COURSE_KWARGS = {'queryset': Course.objects.select_related('class_group', 'faculty__user')}
+
+class UserSerializer(SparseModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 
                  'user_type', 'is_active')
         extra_kwargs = {'password': {'write_only': True}}
 
-class SchoolSerializer(serializers.ModelSerializer):
+class SchoolSerializer(SparseModelSerializer):
     class Meta:
         model = School
         fields = '__all__'
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(SparseModelSerializer):
     school_name = serializers.CharField(source='school.name', read_only=True)
     
     class Meta:
         model = Department
         fields = '__all__'
 
-class ProgramSerializer(serializers.ModelSerializer):
+class ProgramSerializer(SparseModelSerializer):
     department_name = serializers.CharField(source='department.name', read_only=True)
     school_name = serializers.CharField(source='department.school.name', read_only=True)
     
@@ -28,14 +62,23 @@ class ProgramSerializer(serializers.ModelSerializer):
         model = Program
         fields = '__all__'
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassSerializer(SparseModelSerializer):
     program_name = serializers.CharField(source='program.name', read_only=True)
     
     class Meta:
         model = Class
         fields = '__all__'
 
-class FacultySerializer(serializers.ModelSerializer):
+class ClassValuesSerializer(ValuesSerializer):
+    fields = [
+        ('id', Value('id')),
+        ('program_name', Value('program__name')),
+        ('semester', Value('semester')),
+        ('academic_year', Value('academic_year')),
+        ('program', Value('program')),
+    ]
+
+class FacultySerializer(SparseModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     department_name = serializers.CharField(source='department.name', read_only=True)
     
@@ -43,7 +86,7 @@ class FacultySerializer(serializers.ModelSerializer):
         model = Faculty
         fields = '__all__'
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     program_name = serializers.CharField(source='program.name', read_only=True)
     
@@ -51,7 +94,7 @@ class StudentSerializer(serializers.ModelSerializer):
         model = Student
         fields = '__all__'
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseModelSerializer):
     faculty_name = serializers.CharField(source='faculty.user.get_full_name', read_only=True)
     class_details = ClassSerializer(source='class_group', read_only=True)
     
@@ -59,59 +102,225 @@ class CourseSerializer(serializers.ModelSerializer):
         model = Course
         fields = '__all__'
 
-class AssignmentSerializer(serializers.ModelSerializer):
+class CourseValuesSerializer(ValuesSerializer):
+    fields = [
+        ('id', Value('id')),
+        ('faculty_name', Value('faculty__user__first_name', 'faculty__user__last_name', convert=full_name)),
+        ('class_details', Nested(ClassValuesSerializer, 'class_group')),
+        ('name', Value('name')),
+        ('code', Value('code')),
+        ('class_group', Value('class_group')),
+        ('faculty', Value('faculty')),
+    ]
+
+class AssignmentSerializer(SparseModelSerializer):
     course_name = serializers.CharField(source='course.name', read_only=True)
     faculty_name = serializers.CharField(source='course.faculty.user.get_full_name', read_only=True)
-    file_url = serializers.SerializerMethodField()
+    # Annotated by the viewset; absent from create responses
+    comment_count = serializers.IntegerField(read_only=True)
+    serializer_field_mapping = DOWNLOAD_FIELD_MAPPING
 
     class Meta:
         model = Assignment
         fields = '__all__'
+        extra_kwargs = {'course': CONTENT_COURSE_KWARGS}
 
-    def get_file_url(self, obj):
-        if obj.file:
-            return self.context['request'].build_absolute_uri(obj.file.url)
-        return None
 
-
-class AssignmentCommentSerializer(serializers.ModelSerializer):
+class AssignmentCommentSerializer(SparseModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
     class Meta:
         model = AssignmentComment
         fields = '__all__'
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(SparseModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     
     class Meta:
         model = Attendance
         fields = '__all__'
+        extra_kwargs = {
+            # Writes check the course's class roster and render the student's name
+            'course': {'queryset': Course.objects.select_related('class_group')},
+            'student': {'queryset': Student.objects.select_related('user')},
+        }
+
+class AttendanceValuesSerializer(ValuesSerializer):
+    fields = [
+        ('id', Value('id')),
+        ('student_name', Value('student__user__first_name', 'student__user__last_name', convert=full_name)),
+        ('date', Value('date', convert=iso_date)),
+        ('is_present', Value('is_present')),
+        ('course', Value('course')),
+        ('student', Value('student')),
+    ]
 
-class GradeSerializer(serializers.ModelSerializer):
+class AttendanceSummarySerializer(SparseModelSerializer):
+    student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
+    registration_number = serializers.CharField(source='student.registration_number', read_only=True)
+    percentage = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = AttendanceSummary
+        fields = ('student', 'student_name', 'registration_number', 'course', 'period',
+                  'present_count', 'total_count', 'percentage')
+
+class AttendanceMarkSerializer(serializers.Serializer):
+    student_id = serializers.IntegerField()
+    is_present = serializers.BooleanField()
+
+class AttendanceBulkSerializer(serializers.Serializer):
+    course_id = serializers.IntegerField()
+    date = serializers.DateField()
+    attendance = AttendanceMarkSerializer(many=True, allow_empty=False)
+
+class AttendanceMatrixRowSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    present = serializers.CharField()
+    marked = serializers.CharField(required=False)
+
+class AttendanceMatrixSerializer(serializers.Serializer):
+    """
+    A register in the bitset encoding of the attendance matrix (kucms.bitsets).
+
+    Each student's marks cover the days set in `marked` (every date when it
+    is omitted); validated_data['marks'] maps (student id, date) to is_present.
+    """
+    course_id = serializers.IntegerField()
+    dates = serializers.ListField(child=serializers.DateField(), allow_empty=False)
+    students = AttendanceMatrixRowSerializer(many=True, allow_empty=False)
+
+    def validate(self, data):
+        dates = data['dates']
+        if len(set(dates)) != len(dates):
+            raise serializers.ValidationError({'dates': ['Dates must be unique.']})
+        student_ids = [row['id'] for row in data['students']]
+        if len(set(student_ids)) != len(student_ids):
+            raise serializers.ValidationError({'students': ['Each student may appear only once.']})
+
+        marks = {}
+        for row in data['students']:
+            try:
+                present = set(bitsets.decode(row['present'], len(dates)))
+                marked = set(bitsets.decode(row['marked'], len(dates))) if 'marked' in row else set(range(len(dates)))
+            except ValueError as e:
+                raise serializers.ValidationError({'students': [f"Student {row['id']}: {e}"]})
+            if present - marked:
+                raise serializers.ValidationError({'students': [f"Student {row['id']}: present days must be marked"]})
+            for index in marked:
+                marks[(row['id'], dates[index])] = index in present
+        data['marks'] = marks
+        return data
+
+class GradeSerializer(SparseModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     
     class Meta:
         model = Grade
         fields = '__all__'
 
-class NoteSerializer(serializers.ModelSerializer):
+class GradeValuesSerializer(ValuesSerializer):
+    fields = [
+        ('id', Value('id')),
+        ('student_name', Value('student__user__first_name', 'student__user__last_name', convert=full_name)),
+        ('title', Value('title')),
+        ('marks_obtained', Value('marks_obtained', convert=decimal_string(5, 2))),
+        ('total_marks', Value('total_marks', convert=decimal_string(5, 2))),
+        ('remarks', Value('remarks')),
+        ('date', Value('date', convert=iso_date)),
+        ('course', Value('course')),
+        ('student', Value('student')),
+    ]
+
+class NoteSerializer(SparseModelSerializer):
     course_name = serializers.CharField(source='course.name', read_only=True)
+    serializer_field_mapping = DOWNLOAD_FIELD_MAPPING
     
     class Meta:
         model = Note
         fields = '__all__'
+        extra_kwargs = {'course': CONTENT_COURSE_KWARGS}
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class AnnouncementSerializer(SparseModelSerializer):
     faculty_name = serializers.CharField(source='course.faculty.user.get_full_name', read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Announcement
         fields = '__all__'
+        extra_kwargs = {'course': CONTENT_COURSE_KWARGS}
 
-class AnnouncementCommentSerializer(serializers.ModelSerializer):
+class AnnouncementCommentSerializer(SparseModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
     class Meta:
         model = AnnouncementComment
         fields = '__all__'
+
+class JobSerializer(SparseModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        exclude = ('payload',)
+
+    def to_representation(self, instance):
+        if instance.status == 'running':
+            reported = cached_progress(instance.pk)
+            if reported:
+                for field, value in reported.items():
+                    setattr(instance, field, value)
+        return super().to_representation(instance)
+
+    def get_progress(self, obj):
+        if obj.status == 'succeeded':
+            return 100
+        if obj.total:
+            return round(100 * obj.processed / obj.total, 1)
+        return None
+
+class UploadSessionSerializer(SparseModelSerializer):
+    TARGET_MODELS = {'note': Note, 'assignment': Assignment}
+
+    chunk_size = serializers.IntegerField(required=False, min_value=64 * 1024)
+    total_chunks = serializers.IntegerField(read_only=True)
+    missing_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'target', 'filename', 'size', 'chunk_size', 'total_chunks',
+                  'missing_chunks', 'status', 'created_at', 'updated_at')
+        read_only_fields = ('status',)
+
+    def get_missing_chunks(self, obj):
+        received = {chunk.index for chunk in obj.chunks.all()}
+        return [index for index in range(obj.total_chunks) if index not in received]
+
+    def validate_size(self, value):
+        limit = getattr(settings, 'UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+        if value < 0 or value > limit:
+            raise serializers.ValidationError(f'Size must be between 0 and {limit} bytes.')
+        return value
+
+    def validate_chunk_size(self, value):
+        limit = getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', 32 * 1024 ** 2)
+        if value > limit:
+            raise serializers.ValidationError(f'Chunk size may not exceed {limit} bytes.')
+        return value
+
+    def validate(self, attrs):
+        attrs.setdefault('chunk_size', getattr(settings, 'UPLOAD_CHUNK_SIZE', 5 * 1024 ** 2))
+        # Reject disallowed file types up front rather than after the upload
+        field = self.TARGET_MODELS[attrs['target']]._meta.get_field('file')
+        for validator in field.validators:
+            try:
+                validator(File(None, name=attrs['filename']))
+            except DjangoValidationError as e:
+                raise serializers.ValidationError({'filename': e.messages})
+        return attrs
+
+
+class FeedEntrySerializer(SparseModelSerializer):
+    class Meta:
+        model = FeedEntry
+        fields = ['id', 'kind', 'object_id', 'course', 'title', 'summary', 'created_at']
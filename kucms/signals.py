@@ -0,0 +1,298 @@
+"""
+Signal handlers keeping denormalized tables in step with their sources
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete, post_init
+from django.dispatch import receiver
+
+from .models import (
+    User, Attendance, Class, Course, Faculty, Student,
+    Assignment, AssignmentComment, Note, Announcement, AnnouncementComment, Grade
+)
+from .attendance import summaries_enabled, add_contribution, apply_summary_deltas
+from .scope import invalidate_user_scope, invalidate_all_scopes
+from .authentication import revoke_user_tokens
+from .response_cache import bump_course_version
+from .storage import course_file_storage
+from .search import index_object, remove_object, kind_for
+from .feed import publish, unpublish, move_course, retarget_class, kind_for as feed_kind_for
+from .events import publish_instance
+from .archive import purge_in_progress
+
+
+MARK_FIELDS = ('student_id', 'course_id', 'date', 'is_present')
+
+
+@receiver(post_init, sender=Attendance)
+def remember_loaded_mark(sender, instance, **kwargs):
+    values = instance.__dict__
+    instance._loaded_mark = (
+        tuple(values[field] for field in MARK_FIELDS) if all(field in values for field in MARK_FIELDS) else None
+    )
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_previous_attendance(sender, instance, **kwargs):
+    instance._previous_mark = None
+    if instance.pk and summaries_enabled():
+        loaded = getattr(instance, '_loaded_mark', None)
+        if not instance._state.adding and loaded is not None:
+            # What the row held when this instance was loaded or last saved
+            instance._previous_mark = loaded
+        else:
+            instance._previous_mark = (
+                Attendance.objects.filter(pk=instance.pk).values_list(*MARK_FIELDS).first()
+            )
+
+
+@receiver(post_save, sender=Attendance)
+def update_attendance_summary(sender, instance, raw=False, **kwargs):
+    if raw or not summaries_enabled():
+        return
+    deltas = defaultdict(lambda: (0, 0))
+    previous = getattr(instance, '_previous_mark', None)
+    if previous:
+        add_contribution(deltas, *previous, sign=-1)
+    add_contribution(
+        deltas, instance.student_id, instance.course_id, instance.date, instance.is_present
+    )
+    apply_summary_deltas(deltas)
+
+
+@receiver(post_save, sender=Attendance)
+def remember_saved_mark(sender, instance, **kwargs):
+    instance._loaded_mark = tuple(getattr(instance, field) for field in MARK_FIELDS)
+
+
+@receiver(post_delete, sender=Attendance)
+def remove_from_attendance_summary(sender, instance, **kwargs):
+    if not summaries_enabled():
+        return
+    deltas = defaultdict(lambda: (0, 0))
+    add_contribution(
+        deltas, instance.student_id, instance.course_id, instance.date, instance.is_present, sign=-1
+    )
+    apply_summary_deltas(deltas)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Faculty)
+@receiver(post_delete, sender=Faculty)
+def invalidate_profile_scope(sender, instance, **kwargs):
+    invalidate_user_scope(instance.user_id)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+def invalidate_course_scopes(sender, instance, **kwargs):
+    invalidate_all_scopes()
+    if sender is Course:
+        bump_course_version(instance.pk)
+
+
+# Token claims copied from these fields (kucms.tokens.profile_claims); tokens
+# are revoked when they change so stale roles and profiles stop being trusted
+USER_CLAIM_FIELDS = ('user_type', 'is_staff', 'is_superuser')
+PROFILE_CLAIM_FIELDS = {Student: ('user_id', 'program_id', 'current_semester'), Faculty: ('user_id',)}
+
+
+@receiver(post_init, sender=User)
+def remember_user_credentials(sender, instance, **kwargs):
+    if {'password', 'is_active', *USER_CLAIM_FIELDS} & instance.get_deferred_fields():
+        # Partially loaded (e.g. a sparse fieldset); reading them would query
+        return
+    instance._loaded_credentials = (instance.password, instance.is_active)
+    instance._loaded_claims = tuple(getattr(instance, field) for field in USER_CLAIM_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_credential_change(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    password, was_active = getattr(instance, '_loaded_credentials', (instance.password, instance.is_active))
+    claims = tuple(getattr(instance, field) for field in USER_CLAIM_FIELDS)
+    if (instance.password != password or (was_active and not instance.is_active)
+            or getattr(instance, '_loaded_claims', claims) != claims):
+        revoke_user_tokens(instance.id)
+    instance._loaded_credentials = (instance.password, instance.is_active)
+    instance._loaded_claims = claims
+
+
+@receiver(post_init, sender=Student)
+@receiver(post_init, sender=Faculty)
+def remember_profile_claims(sender, instance, **kwargs):
+    fields = PROFILE_CLAIM_FIELDS[sender]
+    if instance.pk is None or set(fields) & instance.get_deferred_fields():
+        instance._loaded_profile = None
+        return
+    instance._loaded_profile = tuple(getattr(instance, field) for field in fields)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Faculty)
+def revoke_tokens_on_profile_change(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    previous = getattr(instance, '_loaded_profile', None)
+    current = tuple(getattr(instance, field) for field in PROFILE_CLAIM_FIELDS[sender])
+    if previous != current:
+        revoke_user_tokens(instance.user_id)
+        if previous and previous[0] != instance.user_id:
+            revoke_user_tokens(previous[0])
+    instance._loaded_profile = current
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Faculty)
+def revoke_tokens_on_profile_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.user_id)
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def bump_content_version(sender, instance, **kwargs):
+    bump_course_version(instance.course_id)
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def bump_records_version(sender, instance, **kwargs):
+    bump_course_version(instance.course_id, 'records')
+
+
+def deleted_with_parent(sender, origin):
+    """
+    Whether a comment is deleted in the cascade of its assignment or
+    announcement, whose own handlers then cover it
+    """
+    parent = {AssignmentComment: Assignment, AnnouncementComment: Announcement}.get(sender)
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return parent is not None and origin_model is parent
+
+
+@receiver(post_save, sender=AssignmentComment)
+@receiver(post_delete, sender=AssignmentComment)
+def bump_assignment_comment_version(sender, instance, origin=None, **kwargs):
+    if deleted_with_parent(sender, origin):
+        return
+    course_id = Assignment.objects.filter(pk=instance.assignment_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        bump_course_version(course_id)
+
+
+@receiver(post_save, sender=AnnouncementComment)
+@receiver(post_delete, sender=AnnouncementComment)
+def bump_announcement_comment_version(sender, instance, origin=None, **kwargs):
+    if deleted_with_parent(sender, origin):
+        return
+    course_id = Announcement.objects.filter(pk=instance.announcement_id).values_list('course_id', flat=True).first()
+    if course_id is not None:
+        bump_course_version(course_id)
+
+
+def release_course_file(name):
+    """
+    Delete a stored course file once the transaction commits, unless
+    another row still points at the same name
+    """
+    def release():
+        still_used = Note.objects.filter(file=name).values('file').union(
+            Assignment.objects.filter(file=name).values('file')
+        )
+        if still_used.exists():
+            return
+        course_file_storage.delete(name)
+    transaction.on_commit(release)
+
+
+@receiver(post_init, sender=Assignment)
+@receiver(post_init, sender=Note)
+def remember_stored_file(sender, instance, **kwargs):
+    # Only rows loaded from the database carry the stored name as a string
+    value = instance.__dict__.get('file')
+    instance._stored_file = value if isinstance(value, str) else None
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=Note)
+def release_replaced_file(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_stored_file', None)
+    current = instance.file.name
+    if previous and previous != current and not raw:
+        release_course_file(previous)
+    instance._stored_file = current
+
+
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=Note)
+def release_deleted_file(sender, instance, **kwargs):
+    if instance.file:
+        release_course_file(instance.file.name)
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=AnnouncementComment)
+@receiver(post_save, sender=AssignmentComment)
+def index_search_document(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        index_object(kind_for(sender), instance, created=created)
+
+
+@receiver(post_delete, sender=Announcement)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=AnnouncementComment)
+@receiver(post_delete, sender=AssignmentComment)
+def remove_search_document(sender, instance, origin=None, **kwargs):
+    # Comments moved to the archive stay searchable; remove_object takes
+    # the documents of a deleted parent's comments with it
+    if not purge_in_progress() and not deleted_with_parent(sender, origin):
+        remove_object(kind_for(sender), instance.pk)
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=Note)
+def publish_feed_entry(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        publish(feed_kind_for(sender), instance, created=created)
+
+
+@receiver(post_delete, sender=Announcement)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=Note)
+def unpublish_feed_entry(sender, instance, **kwargs):
+    unpublish(feed_kind_for(sender), instance.pk)
+
+
+@receiver(post_save, sender=Course)
+def move_course_feed(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        move_course(instance)
+
+
+@receiver(post_save, sender=Class)
+def retarget_class_feed(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        retarget_class(instance)
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_save, sender=AnnouncementComment)
+@receiver(post_save, sender=AssignmentComment)
+def publish_live_event(sender, instance, created=False, raw=False, **kwargs):
+    # Subscribers must never hear about a row that was rolled back
+    if created and not raw:
+        transaction.on_commit(lambda: publish_instance(instance), robust=True)
@@ -0,0 +1,163 @@
+"""
+Content-addressed storage for course files.
+
+The same handouts are uploaded for every section and every year, so
+DedupStorage keeps one physical blob per SHA-256 digest under blobs/ and
+stores each upload as a hard link to it. Names stay ordinary paths under
+MEDIA_ROOT (downloads, X-Accel-Redirect and X-Sendfile are unaffected),
+while FileBlob counts the FileReference rows pointing at each blob so the
+last delete removes the bytes. A re-upload of known content only hashes
+the upload and adds a link; the blob itself is never rewritten.
+"""
+import hashlib
+import os
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+BLOB_DIR = 'blobs'
+# Orphaned blob files younger than this may belong to an upload still in flight
+ORPHAN_GRACE_SECONDS = 3600
+
+
+def content_digest(content):
+    """
+    SHA-256 and size of a File, read in chunks
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest(), size
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupStorage(FileSystemStorage):
+    """
+    FileSystemStorage storing each distinct content once, as a shared blob
+    """
+    def blob_name(self, digest):
+        return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def _save(self, name, content):
+        from .models import FileBlob, FileReference
+
+        digest, size = content_digest(content)
+        with transaction.atomic():
+            # A new blob starts out counting the reference created below
+            blob, created = FileBlob.objects.select_for_update().get_or_create(
+                digest=digest, defaults={'size': size, 'ref_count': 1}
+            )
+            blob_name = self.blob_name(digest)
+            if not self.exists(blob_name):
+                super()._save(blob_name, content)
+            name = self.link(blob_name, name)
+            FileReference.objects.create(name=name, blob=blob)
+            if not created:
+                FileBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return name
+
+    def link(self, blob_name, name):
+        """
+        Point `name` at a blob, picking a free name if it is taken meanwhile
+        """
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(self.path(blob_name), full_path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+                continue
+            except OSError:
+                # Filesystems without hard links still share the blob
+                os.symlink(os.path.relpath(self.path(blob_name), os.path.dirname(full_path)), full_path)
+            return name
+
+    def delete(self, name):
+        from .models import FileBlob, FileReference
+
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        with transaction.atomic():
+            # Locks the blob row as well, the same lock _save takes, so the
+            # count read here cannot miss a new link
+            reference = FileReference.objects.select_for_update().select_related('blob').filter(name=name).first()
+            super().delete(name)
+            if reference is None:
+                return
+            blob = reference.blob
+            reference.delete()
+            if blob.ref_count <= 1:
+                blob.delete()
+                super().delete(self.blob_name(blob.digest))
+            else:
+                FileBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+
+    def adopt(self, name):
+        """
+        Move a file stored before deduplication onto its blob.
+
+        Returns True when the file was not tracked yet.
+        """
+        from .models import FileBlob, FileReference
+
+        if FileReference.objects.filter(name=name).exists() or not self.exists(name):
+            return False
+        path = self.path(name)
+        digest = file_digest(path)
+        with transaction.atomic():
+            blob, _ = FileBlob.objects.select_for_update().get_or_create(
+                digest=digest, defaults={'size': os.path.getsize(path)}
+            )
+            blob_path = self.path(self.blob_name(digest))
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            if not os.path.exists(blob_path):
+                os.link(path, blob_path)
+            elif not os.path.samefile(path, blob_path):
+                staged = f'{path}.dedup'
+                os.link(blob_path, staged)
+                os.replace(staged, path)
+            FileReference.objects.create(name=name, blob=blob)
+            FileBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return True
+
+    def collect_garbage(self):
+        """
+        Drop unreferenced blob rows and blob files that have no row.
+
+        Returns the number of blobs removed.
+        """
+        from .models import FileBlob
+
+        removed = 0
+        for blob in FileBlob.objects.filter(ref_count__lte=0).iterator():
+            with transaction.atomic():
+                if FileBlob.objects.select_for_update().filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+                    super().delete(self.blob_name(blob.digest))
+                    removed += 1
+
+        root = self.path(BLOB_DIR)
+        for directory, _, filenames in os.walk(root):
+            known = set(FileBlob.objects.filter(digest__in=filenames).values_list('digest', flat=True))
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if filename not in known and time.time() - os.path.getmtime(path) > ORPHAN_GRACE_SECONDS:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+course_file_storage = DedupStorage()
@@ -1,3 +1,991 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    AcademicYearArchive, Announcement, AnnouncementComment, ArchivedAttendance, ArchivedGrade, Assignment,
+    AssignmentComment, Attendance, AttendanceMonth, AttendanceSummary, Class, Course, Department, Faculty,
+    FeedEntry, FileBlob, Grade, Job, Note, Program, School, SessionRollover, Student, User,
+)
+from . import bitsets
+from .archive import archive_academic_year, closed_year
+from .async_views import check_password, event_messages
+from .attendance import rebuild_summaries
+from .attendance_bitmap import backfill_course
+from .authentication import StatelessJWTAuthentication, revoke_user_tokens
+from .checks import revocation_cache_check
+from .events import MemoryBackend
+from .imports import import_storage, import_students
+from .jobs import HANDLERS, claim_next, run_job, run_next
+from .querybudget import QueryBudgetExceeded
+from .rollover import run_rollover, start_rollover
+from .scope import load_scope, scope_cache_key
+from .serializers import SparseModelSerializer
+from .storage import course_file_storage
+from .tokens import KucmsRefreshToken
+from .views import AnnouncementViewSet, UploadSessionViewSet
+
+
+class APITestCase(TestCase):
+    """
+    A class of twelve students taking one course, with a few rows of every
+    kind of course content.
+
+    Query budgets are strict under config.test_settings, so any request
+    below that runs more queries than its view declares raises
+    QueryBudgetExceeded. Loading a user's scope on their first request is
+    charged to its own budget; client_for warms it anyway, and
+    test_cold_scope_cache covers the first request.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        school = School.objects.create(name='Engineering')
+        department = Department.objects.create(name='Computer Science', school=school)
+        cls.program = Program.objects.create(name='BSc CS', department=department)
+        cls.class_group = Class.objects.create(program=cls.program, semester=1, academic_year='2025')
+        cls.faculty_user = User.objects.create_user(
+            email='faculty@example.com', username='faculty', password='pw', user_type='faculty',
+        )
+        faculty = Faculty.objects.create(user=cls.faculty_user, department=department, faculty_type='lecturer')
+        cls.course = Course.objects.create(name='Algorithms', code='CS101', class_group=cls.class_group, faculty=faculty)
+        cls.students = []
+        for i in range(12):
+            user = User.objects.create_user(
+                email=f'student{i}@example.com', username=f'student{i}', password='pw',
+                user_type='student', first_name=f'Student{i}',
+            )
+            cls.students.append(Student.objects.create(user=user, registration_number=f'R{i}', program=cls.program))
+        cls.student_user = cls.students[0].user
+        for i, student in enumerate(cls.students):
+            Assignment.objects.create(
+                course=cls.course, title=f'Assignment {i}', description='Sorting algorithms',
+                due_date=timezone.now() + timedelta(days=i),
+            )
+            Announcement.objects.create(course=cls.course, title=f'Announcement {i}', content='Lecture moved')
+            Attendance.objects.create(course=cls.course, student=student, date=date(2025, 1, 6), is_present=True)
+            Grade.objects.create(
+                course=cls.course, student=student, title='Quiz', marks_obtained=5,
+                total_marks=10, date=date(2025, 1, 6),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        cache.set(scope_cache_key(user.id), load_scope(user))
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class QueryBudgetTests(APITestCase):
+    def test_over_budget_raises(self):
+        client = self.client_for(self.faculty_user)
+        with mock.patch.object(AnnouncementViewSet, 'query_budget', {'list': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                client.get('/kucms/announcements/')
+
+    def test_lists(self):
+        for user in (self.faculty_user, self.student_user):
+            client = self.client_for(user)
+            for url in ('/kucms/assignments/', '/kucms/announcements/', '/kucms/notes/',
+                        '/kucms/grades/', '/kucms/attendance/'):
+                with self.subTest(user=user.user_type, url=url):
+                    self.assertEqual(client.get(url).status_code, 200)
+
+    def test_cold_scope_cache(self):
+        lists = ('/kucms/assignments/', '/kucms/announcements/', '/kucms/notes/', '/kucms/grades/', '/kucms/attendance/')
+        for user, urls in ((self.faculty_user, lists), (self.student_user, lists + ('/kucms/dashboard/', '/kucms/feed/'))):
+            client = APIClient()
+            client.force_authenticate(user)
+            for url in urls:
+                with self.subTest(user=user.user_type, url=url):
+                    cache.clear()
+                    self.assertEqual(client.get(url).status_code, 200)
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(self.faculty_user)
+        # The session insert and its chunk list; the scope's two queries are charged on top
+        with mock.patch.object(UploadSessionViewSet, 'query_budget', {'create': 2}):
+            response = client.post('/kucms/uploads/', {'target': 'note', 'filename': 'notes.pdf', 'size': 10})
+        self.assertEqual(response.status_code, 201)
+
+    def test_lists_by_academic_year(self):
+        client = self.client_for(self.faculty_user)
+        for url in ('/kucms/grades/', '/kucms/attendance/'):
+            with self.subTest(url=url):
+                response = client.get(url, {'academic_year': '2025'})
+                self.assertEqual(response.status_code, 200)
+
+    def test_student_pages(self):
+        client = self.client_for(self.student_user)
+        self.assertEqual(client.get('/kucms/dashboard/').status_code, 200)
+        self.assertEqual(client.get('/kucms/feed/').status_code, 200)
+        response = client.get('/kucms/search/', {'q': 'sorting'})
+        self.assertEqual(response.status_code, 200)
+
+
+class FeedTests(APITestCase):
+    def test_moved_content_follows_its_course(self):
+        other_class = Class.objects.create(program=self.program, semester=2, academic_year='2025')
+        other_course = Course.objects.create(
+            name='Compilers', code='CS201', class_group=other_class, faculty=self.course.faculty,
+        )
+        announcement = Announcement.objects.filter(course=self.course).first()
+        announcement.course = other_course
+        announcement.save()
+        entry = FeedEntry.objects.get(kind='announcement', object_id=announcement.pk)
+        self.assertEqual(
+            (entry.course_id, entry.class_group_id, entry.semester),
+            (other_course.id, other_class.id, 2),
+        )
+
+
+class DirectoryTests(APITestCase):
+    def test_routes_and_visibility(self):
+        client = self.client_for(self.student_user)
+        response = client.get('/kucms/students/')
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.students[0].id])
+        faculty = self.course.faculty
+        self.assertEqual(client.get('/kucms/faculty/').json()['count'], 1)
+        courses = client.get(f'/kucms/students/{self.students[0].id}/courses/').json()
+        self.assertEqual([course['id'] for course in courses], [self.course.id])
+
+        client = self.client_for(self.faculty_user)
+        courses = client.get(f'/kucms/faculty/{faculty.id}/courses/').json()
+        self.assertEqual([course['code'] for course in courses], ['CS101'])
+        self.assertEqual(client.get('/kucms/students/').json()['count'], 12)
+
+    def test_only_staff_write(self):
+        client = self.client_for(self.faculty_user)
+        response = client.patch(f'/kucms/students/{self.students[1].id}/', {'registration_number': 'X'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = client.delete(f'/kucms/faculty/{self.course.faculty.id}/')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Faculty.objects.exists())
+
+
+class ValuesSerializerTests(APITestCase):
+    def test_values_output_matches_model_serializers(self):
+        Grade.objects.create(
+            course=self.course, student=self.students[1], title='Midterm', marks_obtained='7.25',
+            total_marks='12.50', remarks='Resit', date=date(2025, 2, 1),
+        )
+        Attendance.objects.create(course=self.course, student=self.students[1], date=date(2025, 1, 7), is_present=False)
+        urls = [
+            '/kucms/grades/', '/kucms/grades/?page=2', '/kucms/attendance/', '/kucms/attendance/?page=2',
+            f'/kucms/faculty/{self.course.faculty.id}/courses/',
+            f'/kucms/students/{self.students[1].id}/courses/',
+        ]
+        client = self.client_for(self.faculty_user)
+        for url in urls:
+            with self.subTest(url=url):
+                with override_settings(VALUES_SERIALIZERS=False):
+                    expected = client.get(url)
+                with mock.patch.object(SparseModelSerializer, 'to_representation', side_effect=AssertionError):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                # Byte for byte: same keys, same order, same formatting
+                self.assertEqual(response.content, expected.content)
+
+
+class SparseFieldsTests(APITestCase):
+    def keys(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        rows = data['results'] if isinstance(data, dict) and 'results' in data else data
+        return list((rows[0] if isinstance(rows, list) else rows).keys())
+
+    def test_fields_and_expand_shape_responses(self):
+        client = self.client_for(self.student_user)
+        url = f'/kucms/students/{self.students[0].id}/'
+        full = self.keys(client, url)
+        self.assertIn('user_details', full)
+        self.assertEqual(self.keys(client, f'{url}?fields=program_name,id'), ['id', 'program_name'])
+        self.assertEqual(self.keys(client, f'{url}?expand=user_details'), full)
+        self.assertEqual(self.keys(client, f'{url}?fields=id&expand=user_details'), ['id', 'user_details'])
+        # Naming any field drops the nested representations not asked for
+        self.assertNotIn('user_details', self.keys(client, f'{url}?fields=id,registration_number,program'))
+
+        courses = f'/kucms/students/{self.students[0].id}/courses/'
+        self.assertIn('class_details', self.keys(client, courses))
+        self.assertEqual(self.keys(client, f'{courses}?fields=code,id'), ['id', 'code'])
+
+        client = self.client_for(self.faculty_user)
+        for values in (True, False):
+            with self.subTest(values=values), override_settings(VALUES_SERIALIZERS=values):
+                self.assertEqual(self.keys(client, '/kucms/grades/?fields=marks_obtained,id'), ['id', 'marks_obtained'])
+                self.assertEqual(self.keys(client, '/kucms/attendance/?fields=is_present'), ['is_present'])
+
+    def test_narrowed_queryset(self):
+        client = self.client_for(self.student_user)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(f'/kucms/students/{self.students[0].id}/?fields=id,registration_number')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries if 'kucms_student' in query['sql'])
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('current_semester', sql)
+
+    def test_unknown_names_are_rejected(self):
+        client = self.client_for(self.faculty_user)
+        for values in (True, False):
+            with self.subTest(values=values), override_settings(VALUES_SERIALIZERS=values):
+                response = client.get('/kucms/grades/?fields=id,bogus')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'fields': ['Unknown fields: bogus']})
+                response = client.get(f'/kucms/faculty/{self.course.faculty.id}/courses/?expand=code')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'expand': ['Cannot expand: code']})
+        response = client.get(f'/kucms/students/{self.students[0].id}/?expand=nothing')
+        self.assertEqual(response.status_code, 400)
+
+
+class AssignmentTests(APITestCase):
+    def test_file_lifecycle(self):
+        client = self.client_for(self.faculty_user)
+        response = client.post('/kucms/assignments/', {
+            'course': self.course.id, 'title': 'Homework', 'description': 'Heaps',
+            'due_date': '2026-01-01T00:00:00Z', 'file': SimpleUploadedFile('a.pdf', b'%PDF-1'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        url = f"/kucms/assignments/{response.json()['id']}/"
+        self.assertEqual(client.patch(url, {'title': 'Homework 1'}, format='multipart').status_code, 200)
+        response = client.patch(url, {'file': SimpleUploadedFile('b.pdf', b'%PDF-2')}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.post(f'{url}comment/', {'comment': 'When is it due?'}).status_code, 201)
+        self.assertEqual(client.get(f'{url}comments/').status_code, 200)
+        self.assertEqual(client.delete(url).status_code, 204)
+
+    def test_file_is_rendered_as_download_url(self):
+        client = self.client_for(self.faculty_user)
+        response = client.post('/kucms/assignments/', {
+            'course': self.course.id, 'title': 'Homework', 'description': 'Heaps',
+            'due_date': '2026-01-01T00:00:00Z', 'file': SimpleUploadedFile('a.pdf', b'%PDF-1'),
+        }, format='multipart')
+        self.assertTrue(response.json()['file'].endswith(f"/assignments/{response.json()['id']}/download/"))
+        self.assertNotIn('file_url', response.json())
+
+
+class CommentTests(APITestCase):
+    def test_cursor_walks_a_thread_once_while_it_grows(self):
+        announcement = Announcement.objects.filter(course=self.course).first()
+        AnnouncementComment.objects.bulk_create(
+            AnnouncementComment(announcement=announcement, user=self.student_user, comment=f'Comment {i}')
+            for i in range(5)
+        )
+        # Ties on created_at are broken by id
+        AnnouncementComment.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        expected = list(AnnouncementComment.objects.order_by('id').values_list('id', flat=True))
+
+        client = self.client_for(self.student_user)
+        url = f'/kucms/announcements/{announcement.id}/comments/?limit=2'
+        seen = []
+        while url:
+            page = client.get(url).json()
+            seen += [comment['id'] for comment in page['results']]
+            if len(seen) == 2:
+                late = AnnouncementComment.objects.create(announcement=announcement, user=self.faculty_user, comment='Late')
+            url = page['next']
+        self.assertEqual(seen, expected + [late.id])
+
+        response = client.get(f'/kucms/announcements/{announcement.id}/comments/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_lists_carry_comment_counts(self):
+        expected = {}
+        for count, announcement in enumerate(Announcement.objects.filter(course=self.course)):
+            AnnouncementComment.objects.bulk_create(
+                AnnouncementComment(announcement=announcement, user=self.student_user, comment='Noted')
+                for _ in range(count)
+            )
+            expected[announcement.id] = count
+        client = self.client_for(self.student_user)
+        page = client.get('/kucms/announcements/').json()
+        results = page['results'] + client.get(page['next']).json()['results']
+        self.assertEqual({row['id']: row['comment_count'] for row in results}, expected)
+
+        assignment = Assignment.objects.filter(course=self.course).first()
+        AssignmentComment.objects.create(assignment=assignment, user=self.student_user, comment='When is it due?')
+        page = client.get('/kucms/assignments/').json()
+        results = page['results'] + client.get(page['next']).json()['results']
+        counts = {row['id']: row['comment_count'] for row in results}
+        self.assertEqual(counts.pop(assignment.id), 1)
+        self.assertEqual(set(counts.values()), {0})
+
+        results = client.get('/kucms/announcements/?fields=id,title').json()['results']
+        self.assertNotIn('comment_count', results[0])
+
+
+class NoteTests(APITestCase):
+    def test_file_lifecycle(self):
+        client = self.client_for(self.faculty_user)
+        response = client.post('/kucms/notes/', {
+            'course': self.course.id, 'title': 'Week 1', 'file': SimpleUploadedFile('n.pdf', b'%PDF-1'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        url = f"/kucms/notes/{response.json()['id']}/"
+        self.assertEqual(client.patch(url, {'title': 'Week 1 slides'}, format='multipart').status_code, 200)
+        response = client.patch(url, {'file': SimpleUploadedFile('m.pdf', b'%PDF-2')}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.delete(url).status_code, 204)
+
+    def test_download_reads_the_field_storage(self):
+        storage = FileSystemStorage(location=tempfile.mkdtemp(prefix='kucms-test-notes-'))
+        with mock.patch.object(Note._meta.get_field('file'), 'storage', storage):
+            note = Note.objects.create(course=self.course, title='Week 1', file=SimpleUploadedFile('n.pdf', b'%PDF-1'))
+            client = self.client_for(self.student_user)
+            response = client.get(f'/kucms/notes/{note.id}/')
+            self.assertTrue(response.json()['file'].endswith(f'/notes/{note.id}/download/'))
+            response = client.get(f'/kucms/notes/{note.id}/download/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'%PDF-1')
+
+
+class FileDedupTests(APITestCase):
+    def test_shared_blob_is_removed_with_its_last_reference(self):
+        client = self.client_for(self.faculty_user)
+        notes = []
+        for title in ('Week 1', 'Week 1 again'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/kucms/notes/', {
+                    'course': self.course.id, 'title': title, 'file': SimpleUploadedFile('n.pdf', b'%PDF-same'),
+                }, format='multipart')
+            notes.append(Note.objects.get(pk=response.json()['id']))
+        blob = FileBlob.objects.get()
+        blob_path = course_file_storage.path(course_file_storage.blob_name(blob.digest))
+        self.assertEqual(blob.ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.delete(f'/kucms/notes/{notes[0].id}/').status_code, 204)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertFalse(course_file_storage.exists(notes[0].file.name))
+        with notes[1].file.open('rb') as file:
+            self.assertEqual(file.read(), b'%PDF-same')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.delete(f'/kucms/notes/{notes[1].id}/').status_code, 204)
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(os.path.exists(blob_path))
+
+
+class SearchTests(APITestCase):
+    def test_ranking_and_scope(self):
+        other_class = Class.objects.create(program=self.program, semester=2, academic_year='2025')
+        other_course = Course.objects.create(
+            name='Compilers', code='CS201', class_group=other_class, faculty=self.course.faculty,
+        )
+        both = Announcement.objects.create(course=self.course, title='Heapsort', content='heap sort walkthrough')
+        title = Announcement.objects.create(course=self.course, title='Heap quiz', content='Bring a pencil')
+        body = Announcement.objects.create(course=self.course, title='Reading', content='Chapter on the heap')
+        hidden = Announcement.objects.create(course=other_course, title='Heap sort', content='heap sort again')
+
+        response = self.client_for(self.student_user).get('/kucms/search/', {'q': 'heap sort', 'type': 'announcement'})
+        ids = [hit['id'] for hit in response.json()['results']]
+        # More matched terms first, then a title match over a body match
+        self.assertEqual(ids, [both.id, title.id, body.id])
+        self.assertNotIn(hidden.id, ids)
+
+        response = self.client_for(self.faculty_user).get('/kucms/search/', {'q': 'heap sort', 'course': other_course.id})
+        self.assertEqual([hit['id'] for hit in response.json()['results']], [hidden.id])
+
+
+class EventStreamTests(APITestCase):
+    def messages(self, backend, user, last_id, count):
+        scope = load_scope(user)
+
+        async def take():
+            stream = event_messages(scope, last_id)
+            messages = []
+            async for message in stream:
+                messages.append(message)
+                if len(messages) == count:
+                    break
+            await stream.aclose()
+            return messages
+
+        with mock.patch('kucms.async_views.get_backend', return_value=backend):
+            return async_to_sync(take)()
+
+    def test_events_are_scoped_to_the_subscriber(self):
+        other_class = Class.objects.create(program=self.program, semester=2, academic_year='2025')
+        other_course = Course.objects.create(
+            name='Compilers', code='CS201', class_group=other_class, faculty=self.course.faculty,
+        )
+        backend = MemoryBackend()
+        start = backend.last_id
+        first = backend.publish('announcement', self.course.id, {'title': 'Exam'})
+        backend.publish('announcement', other_course.id, {'title': 'Other class'})
+        last = backend.publish('announcement', self.course.id, {'title': 'Exam moved'})
+
+        messages = self.messages(backend, self.student_user, start, 3)
+        self.assertEqual(messages[1:], [
+            f'id: {first.id}\nevent: announcement\ndata: {{"title": "Exam"}}\n\n',
+            f'id: {last.id}\nevent: announcement\ndata: {{"title": "Exam moved"}}\n\n',
+        ])
+        # The faculty member teaches both courses
+        self.assertEqual(len(self.messages(backend, self.faculty_user, start, 4)), 4)
+
+    def test_stale_last_event_id_resyncs(self):
+        backend = MemoryBackend(history=2)
+        start = backend.last_id
+        for title in ('One', 'Two', 'Three'):
+            latest = backend.publish('announcement', self.course.id, {'title': title})
+
+        messages = self.messages(backend, self.student_user, start, 2)
+        self.assertEqual(messages[1], f'id: {latest.id}\nevent: resync\ndata: {{}}\n\n')
+        # Resuming from an id still in the buffer replays what followed it
+        messages = self.messages(backend, self.student_user, latest.id - 1, 2)
+        self.assertEqual(messages[1], f'id: {latest.id}\nevent: announcement\ndata: {{"title": "Three"}}\n\n')
+
+
+class LoginQueueTests(TestCase):
+    @override_settings(LOGIN_HASH_QUEUE_DEPTH=1)
+    def test_logins_beyond_the_queue_are_refused(self):
+        release = threading.Event()
+
+        def slow_hash(password):
+            release.wait(5)
+            return False
+
+        async def attempts():
+            first = asyncio.ensure_future(check_password(None, 'pw'))
+            await asyncio.sleep(0)
+            second = await check_password(None, 'pw')
+            release.set()
+            return await first, second, await check_password(None, 'pw')
+
+        with mock.patch('kucms.async_views.hash_and_fail', slow_hash), \
+                mock.patch('kucms.async_views.hash_slots', weakref.WeakKeyDictionary()):
+            self.assertEqual(async_to_sync(attempts)(), (False, None, False))
+
+
+class UploadTests(APITestCase):
+    def test_resumed_upload_is_finalized_after_checksum(self):
+        data = os.urandom(2 * 64 * 1024 + 10)
+        chunks = [data[i:i + 64 * 1024] for i in range(0, len(data), 64 * 1024)]
+        client = self.client_for(self.faculty_user)
+        session = client.post('/kucms/uploads/', {
+            'target': 'note', 'filename': 'week1.pdf', 'size': len(data), 'chunk_size': 64 * 1024,
+        }).json()
+        url = f"/kucms/uploads/{session['id']}/"
+
+        def put(index, body, checksum=None):
+            return client.put(
+                f'{url}chunks/{index}/', body, content_type='application/octet-stream',
+                HTTP_X_CHUNK_CHECKSUM=checksum or hashlib.sha256(body).hexdigest(),
+            )
+
+        self.assertEqual(put(0, chunks[0]).json()['missing_chunks'], [1, 2])
+        self.assertEqual(put(2, chunks[2]).json()['missing_chunks'], [1])
+        # A corrupted chunk is not confirmed, so the session still asks for it
+        self.assertEqual(put(1, chunks[1][::-1], hashlib.sha256(chunks[1]).hexdigest()).status_code, 400)
+        self.assertEqual(client.get(url).json()['missing_chunks'], [1])
+        self.assertEqual(put(1, chunks[1]).json()['missing_chunks'], [])
+
+        fields = {'course': self.course.id, 'title': 'Week 1'}
+        response = client.post(f'{url}finalize/', {**fields, 'checksum': hashlib.sha256(b'other').hexdigest()})
+        self.assertEqual(response.status_code, 400)
+        response = client.post(f'{url}finalize/', {**fields, 'checksum': hashlib.sha256(data).hexdigest()})
+        self.assertEqual(response.status_code, 201)
+        with Note.objects.get(pk=response.json()['id']).file.open('rb') as file:
+            self.assertEqual(file.read(), data)
+
+
+class AnnouncementTests(APITestCase):
+    def test_lifecycle(self):
+        client = self.client_for(self.faculty_user)
+        response = client.post('/kucms/announcements/', {
+            'course': self.course.id, 'title': 'Exam', 'content': 'Room 4',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/kucms/announcements/{response.json()['id']}/"
+        self.assertEqual(client.patch(url, {'title': 'Final exam'}, format='json').status_code, 200)
+        self.assertEqual(client.post(f'{url}comment/', {'comment': 'Which room?'}).status_code, 201)
+        self.assertEqual(client.get(f'{url}comments/').status_code, 200)
+        self.assertEqual(client.delete(url).status_code, 204)
+
+    def test_cached_list_etag(self):
+        client = self.client_for(self.student_user)
+        response = client.get('/kucms/announcements/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        etag = response['ETag']
+        self.assertEqual(client.get('/kucms/announcements/')['X-Cache'], 'HIT')
+
+        with mock.patch('kucms.response_cache.cache.get', wraps=cache.get) as cache_get:
+            response = client.get('/kucms/announcements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # Answered from the versions, without reading the cached body
+        self.assertFalse([call for call in cache_get.call_args_list if call.args[0].startswith('kucms:response:')])
+
+    def test_write_invalidates_cached_list(self):
+        client = self.client_for(self.student_user)
+        etag = client.get('/kucms/announcements/')['ETag']
+        self.client_for(self.faculty_user).post('/kucms/announcements/', {
+            'course': self.course.id, 'title': 'Exam', 'content': 'Room 4',
+        }, format='json')
+        response = client.get('/kucms/announcements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['count'], 13)
+
+
+class AttendanceTests(APITestCase):
+    def sheet(self, is_present=True):
+        return {
+            'course_id': self.course.id, 'date': '2025-01-07',
+            'attendance': [{'student_id': student.id, 'is_present': is_present} for student in self.students],
+        }
+
+    def test_bulk_create_and_resubmit(self):
+        client = self.client_for(self.faculty_user)
+        self.assertEqual(client.post('/kucms/attendance/bulk_create/', self.sheet(), format='json').status_code, 200)
+        response = client.post('/kucms/attendance/bulk_create/', self.sheet(False), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Attendance.objects.filter(date=date(2025, 1, 7), is_present=False).count(), 12)
+
+    def test_single_marks(self):
+        client = self.client_for(self.faculty_user)
+        student = self.students[0]
+        response = client.post('/kucms/attendance/', {
+            'course': self.course.id, 'student': student.id, 'date': '2025-01-08', 'is_present': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/kucms/attendance/{response.json()['id']}/"
+        self.assertEqual(client.patch(url, {'is_present': False}, format='json').status_code, 200)
+        response = client.put(url, {
+            'course': self.course.id, 'student': student.id, 'date': '2025-01-09', 'is_present': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.delete(url).status_code, 204)
+
+    @override_settings(ATTENDANCE_STORAGE='bitmap')
+    def test_single_marks_in_bitmap_storage(self):
+        client = self.client_for(self.faculty_user)
+        student = self.students[0]
+        response = client.post('/kucms/attendance/', {
+            'course': self.course.id, 'student': student.id, 'date': '2025-03-05', 'is_present': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/kucms/attendance/{response.json()['id']}/"
+        response = client.patch(url, {'is_present': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        url = f"/kucms/attendance/{response.json()['id']}/"
+        self.assertEqual(client.delete(url).status_code, 204)
+
+    def test_backfill_refuses_to_overwrite_bitmap_marks(self):
+        call_command('backfill_attendance_months', stdout=StringIO())
+        student = self.students[0]
+        with override_settings(ATTENDANCE_STORAGE='bitmap'):
+            client = self.client_for(self.faculty_user)
+            response = client.post('/kucms/attendance/', {
+                'course': self.course.id, 'student': student.id, 'date': '2025-01-07', 'is_present': True,
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+            with self.assertRaises(CommandError):
+                call_command('backfill_attendance_months', stdout=StringIO())
+            response = self.client_for(student.user).get('/kucms/attendance/')
+            self.assertEqual(
+                [record['date'] for record in response.json()['results']], ['2025-01-06', '2025-01-07'],
+            )
+        summary = AttendanceSummary.objects.get(student=student, course=self.course, period='')
+        self.assertEqual(summary.total_count, 2)
+
+    def test_bitmap_list_matches_rows(self):
+        client = self.client_for(self.faculty_user)
+        for day in ('2025-01-07', '2025-02-03'):
+            sheet = {**self.sheet(), 'date': day}
+            sheet['attendance'][3]['is_present'] = False
+            client.post('/kucms/attendance/bulk_create/', sheet, format='json')
+        call_command('backfill_attendance_months', stdout=StringIO())
+
+        def pages(client):
+            responses = [client.get('/kucms/attendance/', {'page': page}).json() for page in (1, 2, 4)]
+            for response in responses:
+                for record in response.get('results', []):
+                    # Bitmap record ids are derived from the month row
+                    record.pop('id')
+            return responses
+
+        for user in (self.faculty_user, self.students[3].user):
+            with self.subTest(user=user.user_type):
+                rows = pages(self.client_for(user))
+                with override_settings(ATTENDANCE_STORAGE='bitmap'):
+                    self.assertEqual(pages(self.client_for(user)), rows)
+        self.assertEqual(rows[0]['count'], 3)
+        self.assertEqual([record['is_present'] for record in rows[0]['results']], [True, False, False])
+
+    def test_reports(self):
+        client = self.client_for(self.faculty_user)
+        response = client.get('/kucms/attendance/matrix/', {'course_id': self.course.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['students']), 12)
+        response = client.get('/kucms/attendance/course_summary/', {'course_id': self.course.id})
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/kucms/attendance/student_report/', {
+            'student_id': self.students[0].id, 'course_id': self.course.id,
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_bitsets_are_msb_first(self):
+        self.assertEqual(bitsets.encode([0, 9], 10), base64.b64encode(b'\x80\x40').decode())
+        self.assertEqual(bitsets.decode('gEA=', 10), [0, 9])
+        self.assertEqual(bitsets.encode([], 0), '')
+        for value in ('gEE=', 'gA==', 'not base64'):
+            with self.assertRaises(ValueError):
+                bitsets.decode(value, 10)
+
+    def test_matrix_round_trip(self):
+        # Ten days straddle a byte boundary; every student gets a different
+        # pattern, some with days left unmarked
+        dates = [date(2025, 2, 3) + timedelta(days=day) for day in range(10)]
+        marked = {student.id: [day for day in range(10) if (day + index) % 4] for index, student in enumerate(self.students)}
+        present = {student_id: [day for day in days if day % 3] for student_id, days in marked.items()}
+        sheet = {
+            'course_id': self.course.id,
+            'dates': [day.isoformat() for day in dates],
+            'students': [
+                {'id': student_id, 'marked': bitsets.encode(days, 10), 'present': bitsets.encode(present[student_id], 10)}
+                for student_id, days in marked.items()
+            ],
+        }
+        for storage in ('rows', 'bitmap'):
+            with self.subTest(storage=storage), override_settings(ATTENDANCE_STORAGE=storage):
+                client = self.client_for(self.faculty_user)
+                self.assertEqual(client.post('/kucms/attendance/matrix/', sheet, format='json').status_code, 200)
+                matrix = client.get('/kucms/attendance/matrix/', {
+                    'course_id': self.course.id, 'from': '2025-02-01',
+                }).json()
+                self.assertEqual(matrix['dates'], sheet['dates'])
+                self.assertEqual(
+                    {row['id']: (row['marked'], row['present']) for row in matrix['students']},
+                    {row['id']: (row['marked'], row['present']) for row in sheet['students']},
+                )
+                if storage == 'rows':
+                    stored = set(Attendance.objects.filter(date__in=dates).values_list('student_id', 'date', 'is_present'))
+                    self.assertEqual(stored, {
+                        (student_id, dates[day], day in present[student_id])
+                        for student_id, days in marked.items() for day in days
+                    })
+
+                # A slice is re-indexed from its first day
+                matrix = client.get('/kucms/attendance/matrix/', {
+                    'course_id': self.course.id, 'from': '2025-02-05', 'to': '2025-02-08',
+                }).json()
+                self.assertEqual(matrix['dates'], sheet['dates'][2:6])
+                self.assertEqual(
+                    {row['id']: bitsets.decode(row['present'], 4) for row in matrix['students']},
+                    {student_id: [day - 2 for day in days if 2 <= day < 6] for student_id, days in present.items()},
+                )
+
+    def test_report_ids_must_be_integers(self):
+        client = self.client_for(self.faculty_user)
+        response = client.get('/kucms/attendance/student_report/', {'student_id': 'x', 'course_id': self.course.id})
+        self.assertEqual(response.status_code, 400)
+        response = client.get('/kucms/attendance/matrix/', {'course_id': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class GradeTests(APITestCase):
+    def grades(self):
+        return {
+            'course_id': self.course.id,
+            'grades': [
+                {'student_id': student.id, 'title': 'Midterm', 'marks_obtained': 30, 'total_marks': 50}
+                for student in self.students
+            ],
+        }
+
+    def test_bulk_create(self):
+        client = self.client_for(self.faculty_user)
+        response = client.post('/kucms/grades/bulk_create/', self.grades(), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Grade.objects.filter(title='Midterm').count(), 12)
+
+    def test_bulk_create_expires_cached_dashboards(self):
+        student_client = self.client_for(self.student_user)
+        student_client.get('/kucms/dashboard/', {'sections': 'grades', 'days': 60})
+        self.client_for(self.faculty_user).post('/kucms/grades/bulk_create/', self.grades(), format='json')
+        response = student_client.get('/kucms/dashboard/', {'sections': 'grades', 'days': 60})
+        self.assertIn('Midterm', [grade['title'] for grade in response.json()['grades']])
+
+
+class ClosedYearTests(TestCase):
+    @mock.patch('kucms.archive.current_academic_year', return_value='2026-2027')
+    def test_years_compare_by_start_year(self, current_academic_year):
+        for year, closed in (('2025', True), ('2025-2026', True), ('2026', False),
+                             ('2026-2027', False), ('2027', False), ('next', False)):
+            with self.subTest(year=year):
+                self.assertEqual(closed_year(year), closed)
+
+
+class ImportTests(APITestCase):
+    def test_over_long_values_are_row_errors(self):
+        csv = (
+            'registration_number,email,password,name\n'
+            'N1,new1@example.com,pw,New Student\n'
+            f'N2,new2@example.com,pw,{"x" * 151}\n'
+            f'{"9" * 21},new3@example.com,pw,Third\n'
+        ).encode()
+        for dry_run in (True, False):
+            with self.subTest(dry_run=dry_run):
+                report = import_students(BytesIO(csv), self.program.id, dry_run=dry_run, workers=1)
+                self.assertEqual(report['errors'], [
+                    {'row': 3, 'errors': {'name': 'Ensure this value has at most 150 characters.'}},
+                    {'row': 4, 'errors': {'registration_number': 'Ensure this value has at most 20 characters.'}},
+                ])
+                self.assertEqual(report['created'], 0)
+        self.assertFalse(User.objects.filter(email__startswith='new').exists())
+
+
+class StudentUploadTests(APITestCase):
+    csv = b'registration_number,email,password,name\nN1,new1@example.com,secret,New Student\n'
+
+    def upload(self):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', user_type='admin', is_staff=True,
+        )
+        response = self.client_for(admin).post('/kucms/users/upload_students/', {
+            'file': SimpleUploadedFile('students.csv', self.csv), 'program_id': self.program.id,
+        })
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()['job_id'])
+        path = import_storage().path(job.payload['path'])
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.abspath(path).startswith(os.path.abspath(settings.MEDIA_ROOT)))
+        return path
+
+    def test_file_is_deleted_after_import(self):
+        path = self.upload()
+        self.assertEqual(run_next().status, 'succeeded')
+        self.assertTrue(User.objects.filter(email='new1@example.com').exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_file_is_deleted_when_import_fails(self):
+        path = self.upload()
+        with mock.patch('kucms.jobs.import_students', side_effect=RuntimeError('worker crashed')):
+            self.assertEqual(run_next().status, 'failed')
+        self.assertFalse(os.path.exists(path))
+
+
+class ArchiveTests(APITestCase):
+    def lists(self):
+        lists = {}
+        for values in (False, True):
+            with override_settings(VALUES_SERIALIZERS=values):
+                for user in (self.faculty_user, self.student_user):
+                    client = self.client_for(user)
+                    for url in ('/kucms/grades/', '/kucms/attendance/'):
+                        lists[(values, user.user_type, url)] = [
+                            client.get(url, {'page': page}).json() for page in (1, 2)
+                        ]
+        return lists
+
+    def test_default_lists_include_archived_years(self):
+        before = self.lists()
+        archive_academic_year('2025')
+        self.assertFalse(Grade.objects.exists())
+        self.assertEqual(self.lists(), before)
+
+    def test_writes_to_archived_year_are_refused(self):
+        AcademicYearArchive.objects.create(academic_year='2025', status='complete')
+        client = self.client_for(self.faculty_user)
+        response = client.post('/kucms/grades/bulk_create/', {
+            'course_id': self.course.id,
+            'grades': [{'student_id': self.students[0].id, 'title': 'Late', 'marks_obtained': 1, 'total_marks': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.post('/kucms/attendance/bulk_create/', {
+            'course_id': self.course.id, 'date': '2025-01-07',
+            'attendance': [{'student_id': self.students[0].id, 'is_present': True}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Grade.objects.filter(title='Late').exists())
+
+    def test_purge_recopies_rows_changed_after_copy(self):
+        edited, deleted = Grade.objects.order_by('pk')[:2]
+
+        def progress(phase, kind, rows):
+            # Edits that land after the first pass has copied the grades
+            if (phase, kind) == ('copy', 'grade') and Grade.objects.filter(pk=deleted.pk).exists():
+                Grade.objects.filter(pk=edited.pk).update(marks_obtained=9)
+                Grade.objects.filter(pk=deleted.pk).delete()
+
+        archive = archive_academic_year('2025', batch_size=5, progress=progress)
+        self.assertFalse(Grade.objects.exists())
+        self.assertEqual(ArchivedGrade.objects.get(pk=edited.pk).marks_obtained, 9)
+        self.assertFalse(ArchivedGrade.objects.filter(pk=deleted.pk).exists())
+        self.assertEqual(ArchivedGrade.objects.count(), 11)
+        self.assertEqual(archive.purged['grade'], 11)
+
+    @override_settings(ATTENDANCE_STORAGE='bitmap')
+    def test_archives_bitmap_attendance(self):
+        with override_settings(ATTENDANCE_STORAGE='rows'):
+            backfill_course(self.course.id, delete_rows=True)
+        client = self.client_for(self.faculty_user)
+        sheet = {
+            'course_id': self.course.id, 'date': '2025-01-07',
+            'attendance': [{'student_id': student.id, 'is_present': False} for student in self.students],
+        }
+        self.assertEqual(client.post('/kucms/attendance/bulk_create/', sheet, format='json').status_code, 200)
+        matrix = client.get('/kucms/attendance/matrix/', {'course_id': self.course.id}).json()
+
+        def records():
+            response = client.get('/kucms/attendance/', {'page': 1}).json()
+            return response['count'], [
+                (record['student'], record['date'], record['is_present']) for record in response['results']
+            ]
+
+        before = records()
+        archive_academic_year('2025')
+        self.assertFalse(AttendanceMonth.objects.exists())
+        self.assertEqual(ArchivedAttendance.objects.count(), 24)
+        self.assertEqual(records(), before)
+        self.assertEqual(client.get('/kucms/attendance/matrix/', {'course_id': self.course.id}).json(), matrix)
+        self.assertEqual(rebuild_summaries([self.course.id]), {'created': 0, 'corrected': 0, 'deleted': 0})
+
+
+@mock.patch.dict(HANDLERS, {'noop': lambda job, progress: {'ran': job.attempts}})
+class JobTests(TestCase):
+    def test_abandoned_job_is_claimed_again(self):
+        stale = timezone.now() - timedelta(hours=1)
+        abandoned = Job.objects.create(kind='noop', status='running', worker='gone:1', heartbeat_at=stale, attempts=1)
+        Job.objects.create(kind='noop', status='running', worker='alive:1', heartbeat_at=timezone.now(), attempts=1)
+        job = claim_next('next:1')
+        self.assertEqual((job.pk, job.worker, job.attempts), (abandoned.pk, 'next:1', 2))
+        self.assertIsNone(claim_next('next:1'))
+
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ('succeeded', {'ran': 2}))
+
+    def test_late_outcome_of_a_reclaimed_run_is_dropped(self):
+        job = Job.objects.create(kind='noop')
+        first = claim_next('slow:1')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        second = claim_next('next:1')
+        run_job(first)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), ('running', 'next:1', 2))
+        run_job(second)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+
+    @override_settings(JOB_MAX_ATTEMPTS=2)
+    def test_job_abandoned_too_often_fails(self):
+        stale = timezone.now() - timedelta(hours=1)
+        job = Job.objects.create(kind='noop', status='running', heartbeat_at=stale, attempts=2)
+        self.assertIsNone(claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+
+class RolloverTests(APITestCase):
+    def test_abandoned_rollover_job_is_queued_again(self):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', user_type='admin', is_staff=True,
+        )
+        rollover, _ = start_rollover('2026-2027', admin)
+        stuck = Job.objects.create(
+            kind='start_new_session', status='running', attempts=1,
+            heartbeat_at=timezone.now() - timedelta(hours=1), payload={'rollover_id': rollover.id},
+        )
+        SessionRollover.objects.filter(pk=rollover.pk).update(job=stuck)
+        client = self.client_for(admin)
+
+        response = client.post('/kucms/users/start_new_session/', {'academic_year': '2026-2027'})
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.json()['job_id'], stuck.id)
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, 'failed')
+        # A live run is returned as is
+        response_again = client.post('/kucms/users/start_new_session/', {'academic_year': '2026-2027'})
+        self.assertEqual(response_again.json()['job_id'], response.json()['job_id'])
+
+    def test_student_scope_follows_the_started_year(self):
+        old_class = Class.objects.create(program=self.program, semester=2, academic_year='2025')
+        old_course = Course.objects.create(
+            name='Data Structures', code='CS102', class_group=old_class, faculty=self.course.faculty,
+        )
+        run_rollover(start_rollover('2026')[0])
+        new_class = Class.objects.get(program=self.program, semester=2, academic_year='2026')
+        new_course = Course.objects.create(
+            name='Data Structures', code='CS102', class_group=new_class, faculty=self.course.faculty,
+        )
+        self.student_user.refresh_from_db()
+        scope = load_scope(self.student_user)
+        self.assertEqual(scope.course_ids, {new_course.id})
+        self.assertNotIn(old_course.id, scope.course_ids)
+
+
+@mock.patch('rest_framework.views.APIView.authentication_classes', [StatelessJWTAuthentication])
+class StatelessAuthTests(APITestCase):
+    def token_client(self, user):
+        client = self.client_for(user)
+        client.force_authenticate(None)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {KucmsRefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_revoked_tokens_are_refused(self):
+        student = self.students[1]
+
+        def change_password():
+            student.user.set_password('changed')
+            student.user.save()
+
+        def deactivate():
+            student.user.is_active = False
+            student.user.save()
+
+        def change_semester():
+            student.current_semester = 2
+            student.save()
+
+        for change in (change_password, change_semester, deactivate):
+            with self.subTest(change=change.__name__):
+                client = self.token_client(student.user)
+                self.assertEqual(client.get('/kucms/assignments/').status_code, 200)
+                change()
+                response = client.get('/kucms/assignments/')
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response.json()['code'], 'token_revoked')
+
+    def test_tokens_after_revocation_are_accepted(self):
+        revoke_user_tokens(self.student_user.id)
+        client = self.token_client(self.student_user)
+        self.assertEqual(client.get('/kucms/assignments/').status_code, 200)
+
+
+class RevocationCacheCheckTests(TestCase):
+    stateless = {'DEFAULT_AUTHENTICATION_CLASSES': ['kucms.authentication.StatelessJWTAuthentication']}
+
+    def test_per_process_cache_is_refused(self):
+        with override_settings(REST_FRAMEWORK=self.stateless):
+            self.assertEqual([error.id for error in revocation_cache_check(None)], ['kucms.E001'])
+        self.assertEqual(revocation_cache_check(None), [])
+
+    def test_shared_cache_is_accepted(self):
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(REST_FRAMEWORK=self.stateless, CACHES=caches):
+            self.assertEqual(revocation_cache_check(None), [])
@@ -0,0 +1,44 @@
+"""
+JWTs carrying the claims needed to authenticate without a database hit
+"""
+import time
+
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .scope import generation, load_scope
+
+
+def profile_claims(user):
+    """
+    Claims describing a user's role and academic profile
+    """
+    scope = load_scope(user)
+    return {
+        'user_type': user.user_type,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'student_id': scope.student_id,
+        'faculty_id': scope.faculty_id,
+        'program_id': scope.program_id,
+        'semester': scope.semester,
+        # Scope generation the profile claims were read under; once it moves
+        # on (e.g. after a semester rollover) they are no longer trusted
+        'scope_gen': generation(),
+        # Custom claims are copied into refreshed access tokens, unlike iat,
+        # so this dates the original login for revocation checks
+        'auth_time': time.time(),
+    }
+
+
+class KucmsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in profile_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class KucmsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = KucmsRefreshToken
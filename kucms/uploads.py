@@ -0,0 +1,142 @@
+"""
+Chunked, resumable uploads of note and assignment files.
+
+A client opens an UploadSession, PUTs numbered chunks (in any order, each
+with a SHA-256 checksum) and finalizes the session into a Note or an
+Assignment file. Each chunk is streamed straight into its slot of a
+partial file on disk, so nothing is assembled in memory, and a confirmed
+chunk is recorded as an UploadChunk row so an interrupted upload can resume
+from whatever the session reports as received.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+
+from .models import UploadChunk
+
+READ_SIZE = 64 * 1024
+
+
+def upload_dir():
+    return getattr(settings, 'UPLOAD_SESSION_DIR', os.path.join(settings.MEDIA_ROOT, 'partial-uploads'))
+
+
+def partial_path(session):
+    return os.path.join(upload_dir(), f'{session.pk}.part')
+
+
+def open_partial(session):
+    """
+    Create the partial file for a new session
+    """
+    os.makedirs(upload_dir(), exist_ok=True)
+    with open(partial_path(session), 'wb'):
+        pass
+
+
+def write_chunk(session, index, stream, checksum):
+    """
+    Stream one chunk from `stream` into its slot of the partial file.
+
+    The chunk is only recorded as received when its length and SHA-256
+    checksum match; a bad chunk is simply overwritten by the retry. Any
+    earlier confirmation of the slot is withdrawn before it is overwritten,
+    so a failed rewrite leaves the chunk missing rather than corrupt.
+    """
+    if session.status != 'open':
+        raise ValidationError('Upload session is already finalized.')
+    if not 0 <= index < session.total_chunks:
+        raise ValidationError(f'Chunk index must be between 0 and {session.total_chunks - 1}.')
+    if not checksum:
+        raise ValidationError('X-Chunk-Checksum header (SHA-256 hex digest) is required.')
+
+    UploadChunk.objects.filter(session=session, index=index).delete()
+    expected = session.chunk_length(index)
+    offset = index * session.chunk_size
+    digest = hashlib.sha256()
+    written = 0
+    fd = os.open(partial_path(session), os.O_WRONLY)
+    try:
+        while written <= expected:
+            data = stream.read(min(READ_SIZE, expected + 1 - written))
+            if not data:
+                break
+            if written + len(data) > expected:
+                raise ValidationError(f'Chunk {index} is longer than {expected} bytes.')
+            os.pwrite(fd, data, offset + written)
+            digest.update(data)
+            written += len(data)
+    finally:
+        os.close(fd)
+
+    if written != expected:
+        raise ValidationError(f'Chunk {index} should be {expected} bytes, received {written}.')
+    if digest.hexdigest() != checksum.lower():
+        raise ValidationError(f'Checksum mismatch for chunk {index}.')
+
+    UploadChunk.objects.create(session=session, index=index, checksum=digest.hexdigest())
+
+
+def missing_chunks(session):
+    received = set(session.chunks.values_list('index', flat=True))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def file_digests(session):
+    """
+    SHA-256 of each chunk as it is on disk, and of the whole file
+    """
+    whole = hashlib.sha256()
+    chunks = []
+    with open(partial_path(session), 'rb') as handle:
+        for index in range(session.total_chunks):
+            digest = hashlib.sha256()
+            remaining = session.chunk_length(index)
+            while remaining:
+                data = handle.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                digest.update(data)
+                whole.update(data)
+                remaining -= len(data)
+            chunks.append(digest.hexdigest())
+    return chunks, whole.hexdigest()
+
+
+def assembled_file(session, checksum=None):
+    """
+    The completed upload as a File ready to assign to a FileField.
+
+    Every chunk on disk must still match the checksum it was confirmed
+    with, and the whole file must match `checksum` (SHA-256 hex) if given.
+    """
+    confirmed = dict(session.chunks.values_list('index', 'checksum'))
+    missing = [index for index in range(session.total_chunks) if index not in confirmed]
+    if missing:
+        raise ValidationError(f'Chunks still missing: {missing[:20]}')
+    path = partial_path(session)
+    if os.path.getsize(path) != session.size:
+        raise ValidationError('Assembled file size does not match the session size.')
+    chunks, whole = file_digests(session)
+    corrupt = [index for index, digest in enumerate(chunks) if confirmed.get(index) != digest]
+    if corrupt:
+        # Withdraw them so the session reports them as missing again
+        session.chunks.filter(index__in=corrupt).delete()
+        raise ValidationError(f'Chunks do not match their checksums, upload them again: {corrupt[:20]}')
+    if checksum and whole != checksum.lower():
+        raise ValidationError('Checksum mismatch for the assembled file.')
+    return File(open(path, 'rb'), name=session.filename)
+
+
+def discard(session):
+    """
+    Remove a session's partial file and chunk records
+    """
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
+    session.chunks.all().delete()
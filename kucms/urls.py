@@ -2,16 +2,22 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 from .views import LoginView
+from .async_views import async_login, event_stream
+from .files import signed_file
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView 
 
 router = DefaultRouter()
 router.register(r'users', views.UserViewSet)
+router.register(r'faculty', views.FacultyViewSet)
+router.register(r'students', views.StudentViewSet)
 
 router.register(r'assignments', views.AssignmentViewSet)
 router.register(r'grades', views.GradeViewSet)
 router.register(r'attendance', views.AttendanceViewSet)
 router.register(r'notes', views.NoteViewSet)
 router.register(r'announcements', views.AnnouncementViewSet)
+router.register(r'jobs', views.JobViewSet)
+router.register(r'uploads', views.UploadSessionViewSet)
 
 urlpatterns = [
      # Token obtain and refresh views
@@ -20,4 +26,21 @@ urlpatterns = [
 
     # Your custom login view if you have any custom logic
     path('api/login/', LoginView.as_view(), name='login'),
-]
\ No newline at end of file
+    # Async login for ASGI deployments
+    path('api/login/async/', async_login, name='login_async'),
+
+    # Expiring signed links to course files
+    path('files/<str:token>/', signed_file, name='signed_file'),
+
+    # Full-text search over announcements, assignments, notes and comments
+    path('search/', views.SearchView.as_view(), name='search'),
+
+    # Student home page in a single request
+    path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('feed/', views.FeedView.as_view(), name='feed'),
+
+    # Server-Sent Events of new announcements and comments (ASGI only)
+    path('events/', event_stream, name='events'),
+
+    path('', include(router.urls)),
+]
@@ -0,0 +1,185 @@
+"""
+Read-only serializers over .values_list() rows.
+
+A ModelSerializer builds a model instance per row and walks a field object
+per attribute, which dominates large list responses. A ValuesSerializer
+reads only the columns it needs as tuples and turns each row into the same
+dict the model serializer would produce: same keys, same order, same
+formatting of dates and decimals. Each one is paired with its model
+serializer and must be kept in step with it; the benchmark_serializers
+command checks that both render identical JSON.
+
+List actions of viewsets using ValuesListMixin switch to the values
+serializer automatically while VALUES_SERIALIZERS is enabled. ?fields= and
+?expand= (see kucms.fieldsets) narrow the columns read as well.
+"""
+from decimal import Context, Decimal
+from operator import itemgetter
+
+from django.conf import settings
+from rest_framework.response import Response
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from .fieldsets import select_fields, sparse_fieldset
+
+
+def iso_date(value):
+    return value.isoformat()
+
+
+def decimal_string(max_digits, decimal_places):
+    """
+    Format like DRF's DecimalField with COERCE_DECIMAL_TO_STRING
+    """
+    exponent = Decimal(1).scaleb(-decimal_places)
+    context = Context(prec=max_digits)
+    return lambda value: '{:f}'.format(Decimal(value).quantize(exponent, context=context))
+
+
+def full_name(first_name, last_name):
+    # Same as AbstractUser.get_full_name
+    return f'{first_name} {last_name}'.strip()
+
+
+class Value:
+    """
+    An output value computed from one or more values() lookups.
+
+    Without convert the single lookup is passed through as is. None is never
+    converted, as DRF serializers leave None attributes alone.
+    """
+    def __init__(self, *lookups, convert=None):
+        self.lookups = lookups
+        self.convert = convert
+
+
+class Nested:
+    """
+    The representation of a related row, e.g. a nested read-only serializer
+    """
+    def __init__(self, serializer_class, prefix):
+        self.serializer_class = serializer_class
+        self.prefix = prefix
+
+
+_variants = {}
+
+
+class ValuesSerializer:
+    """
+    Subclasses set fields to a list of (output key, Value or Nested), in output order
+    """
+    fields = []
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.columns = []
+        cls.getters = cls.compile('', cls.columns)
+
+    @classmethod
+    def compile(cls, prefix, columns):
+        """
+        (key, getter of a row tuple) pairs, appending the lookups read to columns
+        """
+        def index(lookup):
+            lookup = prefix + lookup
+            if lookup not in columns:
+                columns.append(lookup)
+            return columns.index(lookup)
+
+        getters = []
+        for key, spec in cls.fields:
+            if isinstance(spec, Nested):
+                nested = spec.serializer_class.compile(prefix + spec.prefix + '__', columns)
+                getter = lambda row, nested=nested: {name: get(row) for name, get in nested}
+            elif spec.convert is None:
+                getter = itemgetter(index(spec.lookups[0]))
+            else:
+                positions = [index(lookup) for lookup in spec.lookups]
+                convert = spec.convert
+                if len(positions) == 1:
+                    getter = lambda row, i=positions[0], convert=convert: (
+                        None if row[i] is None else convert(row[i])
+                    )
+                else:
+                    getter = lambda row, positions=positions, convert=convert: convert(
+                        *[row[i] for i in positions]
+                    )
+            getters.append((key, getter))
+        return getters
+
+    @classmethod
+    def for_fields(cls, names):
+        """
+        A variant rendering only the named fields, and reading only their columns
+        """
+        names = tuple(names)
+        key = (cls, names)
+        if key not in _variants:
+            fields = [(name, spec) for name, spec in cls.fields if name in names]
+            _variants[key] = type(cls.__name__, (cls,), {'fields': fields})
+        return _variants[key]
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        The variant for the request's ?fields= and ?expand=
+        """
+        sparse = sparse_fieldset(request)
+        if sparse is None:
+            return cls
+        names = [name for name, _ in cls.fields]
+        expandable = {name for name, spec in cls.fields if isinstance(spec, Nested)}
+        return cls.for_fields(select_fields(names, expandable, *sparse))
+
+    @classmethod
+    def rows(cls, queryset):
+        """
+        The queryset as the row tuples this serializer reads
+        """
+        return queryset.values_list(*cls.columns)
+
+    def to_representation(self, row):
+        return {key: get(row) for key, get in self.getters}
+
+    @property
+    def data(self):
+        if self.many:
+            return ReturnList([self.to_representation(row) for row in self.instance], serializer=self)
+        return self.to_representation(self.instance)
+
+
+def values_serializers_enabled():
+    return getattr(settings, 'VALUES_SERIALIZERS', True)
+
+
+def serialize_list(queryset, serializer_class, values_serializer_class, request=None):
+    """
+    Data of a whole queryset, through the values serializer when enabled
+    """
+    if values_serializers_enabled():
+        values_serializer_class = values_serializer_class.for_request(request)
+        return values_serializer_class(values_serializer_class.rows(queryset), many=True).data
+    return serializer_class(queryset, many=True, context={'request': request}).data
+
+
+class ValuesListMixin:
+    """
+    Serve GET list actions through values_serializer_class
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None or not values_serializers_enabled():
+            return super().list(request, *args, **kwargs)
+        serializer_class = self.values_serializer_class.for_request(request)
+        queryset = serializer_class.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer_class(page, many=True).data)
+        return Response(serializer_class(queryset, many=True).data)
@@ -1,14 +1,24 @@
-from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, status, permissions
+import io
+import uuid
+
+from django.conf import settings
+from django.http import Http404
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework import mixins, viewsets, status, permissions, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from datetime import datetime, timedelta
 from .models import (
     User, School, Department, Program, Class, Faculty, 
     Student, Course, Assignment, AssignmentComment,
-    Attendance, Grade, Note, Announcement, AnnouncementComment
+    Attendance, AttendanceSummary, Grade, Note, Announcement, AnnouncementComment, Job,
+    UploadSession, SessionRollover, AttendanceMonth
 )
 from .serializers import (
     UserSerializer, SchoolSerializer, DepartmentSerializer,
@@ -16,15 +26,38 @@ from .serializers import (
     StudentSerializer, CourseSerializer, AssignmentSerializer,
     AssignmentCommentSerializer, AttendanceSerializer,
     GradeSerializer, NoteSerializer, AnnouncementSerializer,
-    AnnouncementCommentSerializer
+    AnnouncementCommentSerializer, JobSerializer, AttendanceBulkSerializer,
+    AttendanceSummarySerializer, AttendanceMatrixSerializer, UploadSessionSerializer, FeedEntrySerializer,
+    AttendanceValuesSerializer, CourseValuesSerializer, GradeValuesSerializer
 )
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework import status
+from .permissions import IsAdminOrReadOnly
+from .querybudget import QueryBudgetMixin
+from .tokens import KucmsRefreshToken
+from .scope import AcademicScopeMixin, current_year_courses
+from .response_cache import ResponseCacheMixin, bump_course_version, cached_response
+from .dashboard import SECTIONS as DASHBOARD_SECTIONS, build_dashboard, dashboard_cache_key
+from .files import FileDownloadMixin
+from .uploads import open_partial, write_chunk, missing_chunks, assembled_file, discard
+from .jobs import enqueue, fail_if_abandoned
+from .imports import import_storage
+from .rollover import current_academic_year, valid_academic_year, start_rollover
+from .attendance import record_attendance, record_marks, remove_mark, attendance_matrix
+from .attendance_bitmap import MonthRecords, bitmap_storage_enabled, expand, get_record, month_of
+from .search import search, SOURCES as SEARCH_SOURCES
+from .feed import FeedPagination, SOURCES as FEED_SOURCES, student_feed
+from .pagination import CommentPagination
+from .archive import (
+    ARCHIVES, ArchiveChain, comment_count_expression, complete_years, course_source, ensure_not_archived,
+    year_queryset,
+)
+from .values_serializers import ValuesListMixin, serialize_list
+from .fieldsets import SparseFieldsViewMixin
 
 class LoginView(APIView):
+    permission_classes = [AllowAny]
+
     def post(self, request):
         email = request.data.get("email")
         password = request.data.get("password")
@@ -48,7 +81,7 @@ class LoginView(APIView):
             return Response({"detail": "Invalid user type."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Create JWT tokens for the authenticated user
-        refresh = RefreshToken.for_user(user)
+        refresh = KucmsRefreshToken.for_user(user)
 
         return Response({
             'access': str(refresh.access_token),
@@ -58,15 +91,82 @@ class LoginView(APIView):
 
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def check_course_writable(course_id):
+    """
+    ensure_not_archived for serializer saves, where DRF expects its own ValidationError
+    """
+    try:
+        ensure_not_archived(course_id)
+    except ValidationError as e:
+        raise serializers.ValidationError(e.message_dict)
+
+
+class ArchiveListMixin:
+    """
+    Lists of records that archive_academic_year moves out of the hot table.
+
+    ?academic_year= lists read whichever table holds that year. Default
+    lists page through the caller's archived rows of closed years, then the
+    hot rows, both in list_ordering, so archiving a year hides nothing.
+    """
+    archive_kind = None
+    list_ordering = ()
+
+    def scope_records(self, queryset):
+        if self.scope.user_type == 'student':
+            return queryset.filter(student_id=self.scope.student_id)
+        elif self.scope.user_type == 'faculty':
+            return queryset.filter(course_id__in=self.scope.course_ids)
+        return queryset
+
+    def list_queryset(self):
+        """
+        The hot or archive rows a list reads, unscoped and in list_ordering
+        """
+        academic_year = self.request.query_params.get('academic_year')
+        if academic_year:
+            queryset = year_queryset(self.archive_kind, academic_year)
+        else:
+            hot, _, year_lookup = ARCHIVES[self.archive_kind]
+            # Rows of an archived year not purged yet are read from the archive
+            queryset = hot.objects.exclude(**{f'{year_lookup}__in': complete_years()})
+        return queryset.select_related('student__user').order_by(*self.list_ordering)
+
+    def paginate_queryset(self, queryset):
+        if self.action != 'list' or self.request.query_params.get('academic_year'):
+            return super().paginate_queryset(queryset)
+        archived = ARCHIVES[self.archive_kind][1].objects.filter(academic_year__in=complete_years())
+        archived = self.scope_records(archived.select_related('student__user'))
+        archived = self.filter_queryset(archived).order_by(*self.list_ordering)
+        if isinstance(queryset, QuerySet) and queryset.query.values_select:
+            # Rows for a values serializer; read the same columns from the archive
+            archived = archived.values_list(*queryset.query.values_select)
+        return super().paginate_queryset(ArchiveChain(archived, queryset))
+
+    def get_query_budget(self):
+        budget = super().get_query_budget()
+        if budget is not None and self.action == 'list':
+            if self.request.query_params.get('academic_year'):
+                # Whether the year is archived
+                return budget + 1
+            # Counting the archived rows, and reading those on the page
+            return budget + 2
+        return budget
+
+
+class UserViewSet(QueryBudgetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    query_budget = {'list': 4, 'retrieve': 3}
     
     @action(detail=False, methods=['post'])
     def upload_students(self, request):
         """
         Upload students via CSV file
+
+        The import runs on the background worker; pass dry_run=true to
+        validate the file without creating anyone.
         """
         if 'file' not in request.FILES:
             return Response({'error': 'No file provided'}, 
@@ -76,64 +176,74 @@ class UserViewSet(viewsets.ModelViewSet):
         if not program_id:
             return Response({'error': 'Program ID is required'}, 
                           status=status.HTTP_400_BAD_REQUEST)
-            
-        csv_file = request.FILES['file']
-        decoded_file = csv_file.read().decode('utf-8')
-        csv_data = csv.DictReader(io.StringIO(decoded_file))
-        
-        created_students = []
-        for row in csv_data:
-            try:
-                # Create user
-                user = User.objects.create_user(
-                    username=row['registration_number'],
-                    email=row['email'],
-                    password=row['password'],
-                    first_name=row['name'],
-                    user_type='student'
-                )
-                
-                # Create student profile
-                student = Student.objects.create(
-                    user=user,
-                    registration_number=row['registration_number'],
-                    program_id=program_id,
-                    current_semester=1
-                )
-                
-                created_students.append(student)
-                
-            except Exception as e:
-                return Response({'error': f'Error creating student: {str(e)}'}, 
-                              status=status.HTTP_400_BAD_REQUEST)
-        
-        return Response({
-            'message': f'Successfully created {len(created_students)} students'
-        }, status=status.HTTP_201_CREATED)
+        if not Program.objects.filter(id=program_id).exists():
+            return Response({'error': 'Program not found'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        storage = import_storage()
+        path = storage.save(f'imports/{uuid.uuid4().hex}.csv', request.FILES['file'])
+        try:
+            job = enqueue('import_students', {
+                'path': path,
+                'program_id': int(program_id),
+                'dry_run': dry_run,
+            }, user=request.user)
+        except Exception:
+            storage.delete(path)
+            raise
+        return self.job_accepted(request, job)
     
     @action(detail=False, methods=['post'])
     def start_new_session(self, request):
         """
-        Increment semester for all active students
+        Start an academic year: create its classes and promote active students
+
+        academic_year (e.g. 2026-2027) defaults to the current one. A year
+        can only be started once; repeating the request returns the run
+        already in progress instead of promoting everyone again, unless its
+        worker has stopped renewing the job's lease, in which case the run
+        is queued again and resumes from its checkpoint.
         """
-        try:
-            Student.objects.filter(user__is_active=True).update(
-                current_semester=models.F('current_semester') + 1
-            )
-            return Response({'message': 'Successfully started new academic session'})
-        except Exception as e:
-            return Response({'error': str(e)}, 
-                          status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        academic_year = request.data.get('academic_year') or current_academic_year()
+        if not valid_academic_year(academic_year):
+            return Response({'error': 'academic_year must look like 2026 or 2026-2027'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
 
-class FacultyViewSet(viewsets.ModelViewSet):
+        with transaction.atomic():
+            rollover, _ = start_rollover(academic_year, request.user)
+            rollover = SessionRollover.objects.select_for_update().select_related('job').get(pk=rollover.pk)
+            if rollover.status == 'complete':
+                return Response({'error': f'Academic year {academic_year} has already been started'}, 
+                              status=status.HTTP_409_CONFLICT)
+            if rollover.job and rollover.job.status in ('queued', 'running') and not fail_if_abandoned(rollover.job):
+                return self.job_accepted(request, rollover.job)
+            job = enqueue('start_new_session', {
+                'rollover_id': rollover.id,
+                'academic_year': academic_year,
+            }, user=request.user)
+            rollover.job = job
+            rollover.save(update_fields=['job'])
+        return self.job_accepted(request, job)
+
+    def job_accepted(self, request, job):
+        return Response({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': request.build_absolute_uri(reverse('job-detail', args=[job.id])),
+        }, status=status.HTTP_202_ACCEPTED)
+
+class FacultyViewSet(QueryBudgetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Faculty.objects.all()
     serializer_class = FacultySerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    query_budget = {'list': 4, 'retrieve': 3, 'courses': 4}
     
     def get_queryset(self):
+        queryset = Faculty.objects.select_related('user', 'department')
         if self.request.user.user_type == 'faculty':
-            return Faculty.objects.filter(user=self.request.user)
-        return super().get_queryset()
+            return queryset.filter(user_id=self.request.user.id)
+        return queryset
     
     @action(detail=True, methods=['get'])
     def courses(self, request, pk=None):
@@ -141,19 +251,22 @@ class FacultyViewSet(viewsets.ModelViewSet):
         Get courses taught by faculty
         """
         faculty = self.get_object()
-        courses = Course.objects.filter(faculty=faculty)
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data)
+        courses = Course.objects.filter(faculty=faculty).select_related(
+            'faculty__user', 'class_group__program'
+        )
+        return Response(serialize_list(courses, CourseSerializer, CourseValuesSerializer, request))
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(QueryBudgetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    query_budget = {'list': 4, 'retrieve': 3, 'courses': 4}
     
     def get_queryset(self):
+        queryset = Student.objects.select_related('user', 'program')
         if self.request.user.user_type == 'student':
-            return Student.objects.filter(user=self.request.user)
-        return super().get_queryset()
+            return queryset.filter(user_id=self.request.user.id)
+        return queryset
     
     @action(detail=True, methods=['get'])
     def courses(self, request, pk=None):
@@ -162,34 +275,41 @@ class StudentViewSet(viewsets.ModelViewSet):
         """
         student = self.get_object()
         courses = Course.objects.filter(
+            current_year_courses(),
             class_group__program=student.program,
             class_group__semester=student.current_semester
-        )
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data)
+        ).select_related('faculty__user', 'class_group__program')
+        return Response(serialize_list(courses, CourseSerializer, CourseValuesSerializer, request))
 
-class AssignmentViewSet(viewsets.ModelViewSet):
+class AssignmentViewSet(QueryBudgetMixin, AcademicScopeMixin, ResponseCacheMixin, FileDownloadMixin,
+                        SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [IsAuthenticated]
+    query_budget = {
+        'list': 5, 'retrieve': 4, 'comments': 5,
+        # Replacing or deleting the file releases its blob (5 queries), and a
+        # delete takes the comments and their search documents with it
+        'update': 15, 'partial_update': 15, 'destroy': 14, '*': 8,
+    }
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'student':
-            student = Student.objects.get(user=user)
-            return Assignment.objects.filter(
-                course__class_group__program=student.program,
-                course__class_group__semester=student.current_semester
-            )
-        elif user.user_type == 'faculty':
-            faculty = Faculty.objects.get(user=user)
-            return Assignment.objects.filter(course__faculty=faculty)
-        return super().get_queryset()
+        queryset = Assignment.objects.select_related('course__faculty__user')
+        if self.action not in ('comment', 'comments') and self.field_requested('comment_count'):
+            queryset = queryset.annotate(comment_count=comment_count_expression('assignment_comment', 'assignment'))
+        if self.scope.is_restricted:
+            return queryset.filter(course_id__in=self.scope.course_ids)
+        return queryset
 
     @action(detail=True, methods=['post'])
     def comment(self, request, pk=None):
         assignment = self.get_object()
+        try:
+            ensure_not_archived(assignment.course_id)
+        except ValidationError as e:
+            return Response({'error': e.message_dict}, 
+                          status=status.HTTP_400_BAD_REQUEST)
         serializer = AssignmentCommentSerializer(data={
             'assignment': assignment.id,
             'user': request.user.id,
@@ -202,95 +322,333 @@ class AssignmentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
+        """
+        The assignment's comments, oldest first, paged with a cursor (follow `next`)
+        """
         assignment = self.get_object()
-        comments = AssignmentComment.objects.filter(assignment=assignment)
-        serializer = AssignmentCommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        comments = course_source('assignment_comment', assignment.course_id).objects.filter(assignment=assignment).select_related('user')
+        paginator = CommentPagination()
+        page = paginator.paginate_queryset(comments, request, view=self)
+        return paginator.get_paginated_response(AssignmentCommentSerializer(page, many=True).data)
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ArchiveListMixin, QueryBudgetMixin, AcademicScopeMixin, SparseFieldsViewMixin,
+                        ValuesListMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    values_serializer_class = AttendanceValuesSerializer
     permission_classes = [IsAuthenticated]
+    archive_kind = 'attendance'
+    # The order bitmap storage expands records in
+    list_ordering = ('student_id', 'course_id', 'date')
+    query_budget = {
+        'list': 4, 'retrieve': 3, 'student_report': 5, 'course_summary': 3,
+        'matrix': 11, 'bulk_create': 11,
+        # Single marks also check the archive and update their summary rows
+        'create': 7, 'update': 8, 'partial_update': 8, '*': 6,
+    }
+    # In bitmap storage they lock and rewrite a month row, two when a mark moves
+    bitmap_query_budget = {'create': 11, 'update': 18, 'partial_update': 18}
+
+    def get_query_budget(self):
+        if bitmap_storage_enabled() and self.action in self.bitmap_query_budget:
+            return self.bitmap_query_budget[self.action]
+        return super().get_query_budget()
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'student':
-            return Attendance.objects.filter(student__user=user)
-        elif user.user_type == 'faculty':
-            faculty = Faculty.objects.get(user=user)
-            return Attendance.objects.filter(course__faculty=faculty)
-        return super().get_queryset()
+        if self.action == 'list':
+            return self.scope_records(self.list_queryset())
+        queryset = Attendance.objects.select_related('student__user')
+        if self.action in ('update', 'partial_update'):
+            # Validating course, student and date reads the current course
+            queryset = queryset.select_related('course__class_group')
+        return self.scope_records(queryset)
+
+    # With ATTENDANCE_STORAGE = 'bitmap' the records below are expanded from
+    # AttendanceMonth rows (see kucms.attendance_bitmap) and writes go through
+    # record_marks / remove_mark instead of saving Attendance rows.
+
+    def get_month_queryset(self):
+        queryset = AttendanceMonth.objects.select_related('student__user').order_by('student_id', 'course_id', 'month')
+        if self.action == 'list':
+            # Months of an archived year not purged yet are read from the archive
+            queryset = queryset.exclude(course__class_group__academic_year__in=complete_years())
+        elif self.action in ('update', 'partial_update'):
+            # Rewriting a mark checks the course's class roster
+            queryset = queryset.select_related('course__class_group')
+        return self.scope_records(queryset)
+
+    def list(self, request, *args, **kwargs):
+        if not bitmap_storage_enabled():
+            return super().list(request, *args, **kwargs)
+        # Same pages, in the same order, as the Attendance rows would give;
+        # a page expands only the month rows it serves
+        records = MonthRecords(self.get_month_queryset())
+        page = self.paginate_queryset(records)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(records[:], many=True).data)
+
+    def get_object(self):
+        if not bitmap_storage_enabled():
+            return super().get_object()
+        record = get_record(self.get_month_queryset(), self.kwargs['pk'])
+        if record is None:
+            raise Http404
+        self.check_object_permissions(self.request, record)
+        return record
+
+    def store_mark(self, course, student, date, is_present):
+        try:
+            record_marks(course, {(student.id, date): is_present})
+        except ValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        months = AttendanceMonth.objects.select_related('student__user').filter(
+            course=course, student=student, month=month_of(date)
+        )
+        return next(record for record in expand(months) if record.date == date)
+
+    def perform_create(self, serializer):
+        if not bitmap_storage_enabled():
+            check_course_writable(serializer.validated_data['course'].id)
+            return super().perform_create(serializer)
+        data = serializer.validated_data
+        serializer.instance = self.store_mark(data['course'], data['student'], data['date'], data['is_present'])
+
+    def perform_update(self, serializer):
+        if not bitmap_storage_enabled():
+            check_course_writable(getattr(serializer.validated_data.get('course'), 'id', serializer.instance.course_id))
+            return super().perform_update(serializer)
+        record = serializer.instance
+        data = {
+            'course': record.course, 'student': record.student, 'date': record.date,
+            'is_present': record.is_present, **serializer.validated_data,
+        }
+        with transaction.atomic():
+            if (data['course'].id, data['student'].id, data['date']) != (record.course_id, record.student_id, record.date):
+                remove_mark(record)
+            serializer.instance = self.store_mark(data['course'], data['student'], data['date'], data['is_present'])
+
+    def perform_destroy(self, instance):
+        if not bitmap_storage_enabled():
+            return super().perform_destroy(instance)
+        remove_mark(instance)
 
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """
-        Bulk create attendance records for a class
+        Bulk create or update attendance records for a class
+
+        Resubmitting a day's sheet updates the existing marks in place.
         """
-        course_id = request.data.get('course_id')
-        date = request.data.get('date')
-        attendance_data = request.data.get('attendance', [])
+        payload = AttendanceBulkSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        data = payload.validated_data
+
+        course = Course.objects.select_related('faculty', 'class_group').filter(
+            id=data['course_id']
+        ).first()
+        if course is None:
+            return Response({'error': 'Course not found'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if request.user.id != course.faculty.user_id:
+            return Response(
+                {'error': 'Not authorized'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
 
+        marks = {mark['student_id']: mark['is_present'] for mark in data['attendance']}
         try:
-            course = Course.objects.get(id=course_id)
-            if request.user != course.faculty.user:
-                return Response(
-                    {'error': 'Not authorized'}, 
-                    status=status.HTTP_403_FORBIDDEN
-                )
+            counts = record_attendance(course, data['date'], marks)
+        except ValidationError as e:
+            return Response(
+                {'error': e.message_dict}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'message': 'Attendance recorded successfully', **counts})
 
-            attendance_records = []
-            for record in attendance_data:
-                attendance_records.append(
-                    Attendance(
-                        course_id=course_id,
-                        student_id=record['student_id'],
-                        date=date,
-                        is_present=record['is_present']
-                    )
-                )
+    @action(detail=False, methods=['get', 'post'])
+    def matrix(self, request):
+        """
+        A course's attendance register as packed bitsets
 
-            Attendance.objects.bulk_create(attendance_records)
-            return Response({'message': 'Attendance recorded successfully'})
-        except Exception as e:
+        GET takes course_id and optional from / to dates (YYYY-MM-DD) and
+        returns the class days, the roster and, per student, base64 bitsets
+        of the days marked and the days present (see kucms.bitsets). POST
+        accepts the same encoding ({course_id, dates, students: [{id,
+        present, marked}]}) and records it like bulk_create.
+        """
+        if request.method == 'POST':
+            return self.record_matrix(request)
+
+        course_id = request.query_params.get('course_id')
+        if not course_id:
+            return Response({'error': 'course_id is required'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if not course_id.isdigit():
+            return Response({'error': 'course_id must be an integer'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if self.scope.user_type == 'student' or not self.scope.can_view_course(course_id):
+            return Response({'error': 'Not authorized'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        try:
+            start, end = (
+                datetime.strptime(value, '%Y-%m-%d').date() if value else None
+                for value in (request.query_params.get('from'), request.query_params.get('to'))
+            )
+        except ValueError:
+            return Response({'error': 'from and to must be YYYY-MM-DD dates'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        course = Course.objects.select_related('class_group').filter(id=course_id).first()
+        if course is None:
+            return Response({'error': 'Course not found'}, 
+                          status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'from': start, 'to': end,
+            **attendance_matrix(course, start, end, source=course_source('attendance', course.id)),
+        })
+
+    def record_matrix(self, request):
+        payload = AttendanceMatrixSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        data = payload.validated_data
+
+        course = Course.objects.select_related('faculty', 'class_group').filter(
+            id=data['course_id']
+        ).first()
+        if course is None:
+            return Response({'error': 'Course not found'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if request.user.id != course.faculty.user_id:
             return Response(
-                {'error': str(e)}, 
+                {'error': 'Not authorized'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            counts = record_marks(course, data['marks'])
+        except ValidationError as e:
+            return Response(
+                {'error': e.message_dict}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        return Response({'message': 'Attendance recorded successfully', **counts})
 
-    @action(detail=False, methods=['get'])
-    def student_report(self, request):
+    def summary_period(self, request):
         """
-        Get attendance report for a student
+        Map the `period` query param to an AttendanceSummary period
         """
-        student_id = request.query_params.get('student_id')
-        course_id = request.query_params.get('course_id')
-        time_period = request.query_params.get('period', 'all')  # 'month' or 'all'
+        period = request.query_params.get('period', 'all')  # 'all', 'month' or 'YYYY-MM'
+        if period == 'all':
+            return ''
+        if period == 'month':
+            return timezone.now().strftime('%Y-%m')
+        try:
+            return datetime.strptime(period, '%Y-%m').strftime('%Y-%m')
+        except ValueError:
+            raise ValidationError({'period': "Use 'all', 'month' or YYYY-MM."})
 
-        queryset = self.get_queryset().filter(
-            student_id=student_id,
-            course_id=course_id
-        )
 
-        if time_period == 'month':
-            start_date = datetime.now() - timedelta(days=30)
-            queryset = queryset.filter(date__gte=start_date)
+    @action(detail=False, methods=['get'])
+    def student_report(self, request):
+        """
+        Get attendance report for a student
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        Totals come from AttendanceSummary; pass include_records=true to also
+        get the raw records for the period.
+        """
+        student_id = request.query_params.get('student_id', '')
+        course_id = request.query_params.get('course_id', '')
+        if not (student_id.isdigit() and course_id.isdigit()):
+            return Response({'error': 'student_id and course_id must be integers'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        student_id, course_id = int(student_id), int(course_id)
+        try:
+            period = self.summary_period(request)
+        except ValidationError as e:
+            return Response({'error': e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
+
+        if self.scope.user_type == 'student':
+            allowed = self.scope.student_id == student_id
+        else:
+            allowed = self.scope.can_view_course(course_id)
+        summary = None
+        if allowed:
+            summary = AttendanceSummary.objects.filter(
+                student_id=student_id, course_id=course_id, period=period
+            ).first()
+
+        report = {
+            'student_id': student_id,
+            'course_id': course_id,
+            'period': period or 'all',
+            'present': summary.present_count if summary else 0,
+            'total': summary.total_count if summary else 0,
+            'percentage': summary.percentage if summary else None,
+        }
+        if str(request.query_params.get('include_records', '')).lower() in ('1', 'true', 'yes'):
+            model = course_source('attendance', course_id) if allowed else None
+            if model is None:
+                records = []
+            elif model is Attendance and bitmap_storage_enabled():
+                months = self.get_month_queryset().filter(student_id=student_id, course_id=course_id)
+                if period:
+                    months = months.filter(month=datetime.strptime(period, '%Y-%m').date())
+                records = list(expand(months.order_by('month')))
+            else:
+                records = model.objects.select_related('student__user').filter(student_id=student_id, course_id=course_id)
+                if period:
+                    year, month = period.split('-')
+                    records = records.filter(date__year=year, date__month=month)
+                records = records.order_by('date')
+            report['records'] = self.get_serializer(records, many=True).data
+        return Response(report)
 
-class GradeViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def course_summary(self, request):
+        """
+        Get attendance totals for every student in a course
+        """
+        course_id = request.query_params.get('course_id')
+        if not course_id:
+            return Response({'error': 'course_id is required'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if not course_id.isdigit():
+            return Response({'error': 'course_id must be an integer'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            period = self.summary_period(request)
+        except ValidationError as e:
+            return Response({'error': e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
+        if self.scope.user_type == 'student' or not self.scope.can_view_course(course_id):
+            return Response({'error': 'Not authorized'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+
+        summaries = AttendanceSummary.objects.filter(
+            course_id=course_id, period=period
+        ).select_related('student__user').order_by('student__registration_number')
+        return Response(AttendanceSummarySerializer(summaries, many=True).data)
+
+class GradeViewSet(ArchiveListMixin, QueryBudgetMixin, AcademicScopeMixin, SparseFieldsViewMixin,
+                   ValuesListMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
+    values_serializer_class = GradeValuesSerializer
     permission_classes = [IsAuthenticated]
+    archive_kind = 'grade'
+    list_ordering = ('student_id', 'course_id', 'date', 'id')
+    query_budget = {'list': 4, 'retrieve': 3, 'bulk_create': 4, '*': 6}
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'student':
-            return Grade.objects.filter(student__user=user)
-        elif user.user_type == 'faculty':
-            faculty = Faculty.objects.get(user=user)
-            return Grade.objects.filter(course__faculty=faculty)
-        return super().get_queryset()
+        if self.action == 'list':
+            return self.scope_records(self.list_queryset())
+        return self.scope_records(Grade.objects.select_related('student__user'))
+
+    def perform_create(self, serializer):
+        check_course_writable(serializer.validated_data['course'].id)
+        super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        check_course_writable(getattr(serializer.validated_data.get('course'), 'id', serializer.instance.course_id))
+        super().perform_update(serializer)
 
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
@@ -301,12 +659,13 @@ class GradeViewSet(viewsets.ModelViewSet):
         grade_data = request.data.get('grades', [])
 
         try:
-            course = Course.objects.get(id=course_id)
-            if request.user != course.faculty.user:
+            course = Course.objects.select_related('faculty').get(id=course_id)
+            if request.user.id != course.faculty.user_id:
                 return Response(
                     {'error': 'Not authorized'}, 
                     status=status.HTTP_403_FORBIDDEN
                 )
+            ensure_not_archived(course.id)
 
             grades = []
             for grade in grade_data:
@@ -323,6 +682,8 @@ class GradeViewSet(viewsets.ModelViewSet):
                 )
 
             Grade.objects.bulk_create(grades)
+            # bulk_create sends no post_save, so expire cached records here
+            bump_course_version(course.id, 'records')
             return Response({'message': 'Grades recorded successfully'})
         except Exception as e:
             return Response(
@@ -330,46 +691,51 @@ class GradeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(QueryBudgetMixin, AcademicScopeMixin, ResponseCacheMixin, FileDownloadMixin,
+                  SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Note.objects.all()
     serializer_class = NoteSerializer
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [IsAuthenticated]
+    query_budget = {
+        'list': 5, 'retrieve': 4,
+        # Replacing or deleting the file releases its blob (5 queries)
+        'update': 14, 'partial_update': 14, 'destroy': 11, '*': 8,
+    }
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'student':
-            student = Student.objects.get(user=user)
-            return Note.objects.filter(
-                course__class_group__program=student.program,
-                course__class_group__semester=student.current_semester
-            )
-        elif user.user_type == 'faculty':
-            faculty = Faculty.objects.get(user=user)
-            return Note.objects.filter(course__faculty=faculty)
-        return super().get_queryset()
+        queryset = Note.objects.select_related('course')
+        if self.scope.is_restricted:
+            return queryset.filter(course_id__in=self.scope.course_ids)
+        return queryset
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+class AnnouncementViewSet(QueryBudgetMixin, AcademicScopeMixin, ResponseCacheMixin, SparseFieldsViewMixin,
+                          viewsets.ModelViewSet):
     queryset = Announcement.objects.all()
     serializer_class = AnnouncementSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {
+        'list': 5, 'retrieve': 4, 'comments': 5,
+        # A delete takes the comments and their search documents with it
+        'destroy': 9, '*': 8,
+    }
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'student':
-            student = Student.objects.get(user=user)
-            return Announcement.objects.filter(
-                course__class_group__program=student.program,
-                course__class_group__semester=student.current_semester
-            )
-        elif user.user_type == 'faculty':
-            faculty = Faculty.objects.get(user=user)
-            return Announcement.objects.filter(course__faculty=faculty)
-        return super().get_queryset()
+        queryset = Announcement.objects.select_related('course__faculty__user')
+        if self.action not in ('comment', 'comments') and self.field_requested('comment_count'):
+            queryset = queryset.annotate(comment_count=comment_count_expression('announcement_comment', 'announcement'))
+        if self.scope.is_restricted:
+            return queryset.filter(course_id__in=self.scope.course_ids)
+        return queryset
 
     @action(detail=True, methods=['post'])
     def comment(self, request, pk=None):
         announcement = self.get_object()
+        try:
+            ensure_not_archived(announcement.course_id)
+        except ValidationError as e:
+            return Response({'error': e.message_dict}, 
+                          status=status.HTTP_400_BAD_REQUEST)
         serializer = AnnouncementCommentSerializer(data={
             'announcement': announcement.id,
             'user': request.user.id,
@@ -382,7 +748,212 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
+        """
+        The announcement's comments, oldest first, paged with a cursor (follow `next`)
+        """
         announcement = self.get_object()
-        comments = AnnouncementComment.objects.filter(announcement=announcement)
-        serializer = AnnouncementCommentSerializer(comments, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        comments = course_source('announcement_comment', announcement.course_id).objects.filter(announcement=announcement).select_related('user')
+        paginator = CommentPagination()
+        page = paginator.paginate_queryset(comments, request, view=self)
+        return paginator.get_paginated_response(AnnouncementCommentSerializer(page, many=True).data)
+
+class SearchView(QueryBudgetMixin, AcademicScopeMixin, APIView):
+    """
+    Ranked full-text search across the caller's course content
+
+    Query parameters: q (required), type (comma separated kinds), course,
+    limit (max 50) and offset.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = 7
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+        unknown = set(kinds) - set(SEARCH_SOURCES)
+        if unknown:
+            return Response({'error': f'Unknown type: {", ".join(sorted(unknown))}'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 50)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            course_id = request.query_params.get('course')
+            course_id = int(course_id) if course_id else None
+        except ValueError:
+            return Response({'error': 'limit, offset and course must be integers'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        results = search(query, self.scope, kinds=kinds, course_id=course_id,
+                         limit=limit, offset=offset)
+        return Response({
+            'query': query,
+            'results': results,
+            'next_offset': offset + limit if len(results) == limit else None,
+        })
+
+class DashboardView(QueryBudgetMixin, AcademicScopeMixin, APIView):
+    """
+    Everything the student home page needs in one request
+
+    Query parameters: sections (comma separated, default all), days
+    (assignment due window, default 7) and limit (announcements and
+    grades, default 5).
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = 8
+
+    def get(self, request):
+        scope = self.scope
+        if scope.user_type != 'student' or not scope.student_id:
+            return Response({'error': 'The dashboard is only available to students'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        sections = [name for name in request.query_params.get('sections', '').split(',') if name]
+        unknown = set(sections) - set(DASHBOARD_SECTIONS)
+        if unknown:
+            return Response({'error': f'Unknown section: {", ".join(sorted(unknown))}'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        sections = [name for name in DASHBOARD_SECTIONS if not sections or name in sections]
+        try:
+            days = min(max(int(request.query_params.get('days', 7)), 1), 60)
+            limit = min(max(int(request.query_params.get('limit', 5)), 1), 20)
+        except ValueError:
+            return Response({'error': 'days and limit must be integers'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        key = dashboard_cache_key(request, scope, sections, days, limit)
+        return cached_response(
+            request, key,
+            lambda: Response(build_dashboard(request, scope, sections, days, limit)),
+            timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 120),
+        )
+
+class FeedView(QueryBudgetMixin, AcademicScopeMixin, APIView):
+    """
+    Newest announcements, assignments and notes for the student's class
+
+    Paged with an opaque cursor: follow `next` until it is null. Optional
+    query parameters: type (comma separated kinds) and limit.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = 4
+
+    def get(self, request):
+        scope = self.scope
+        if scope.user_type != 'student' or not scope.student_id:
+            return Response({'error': 'The feed is only available to students'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+        unknown = set(kinds) - set(FEED_SOURCES)
+        if unknown:
+            return Response({'error': f'Unknown type: {", ".join(sorted(unknown))}'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = FeedPagination()
+        entries = paginator.paginate_queryset(student_feed(scope, kinds), request, view=self)
+        return paginator.get_paginated_response(FeedEntrySerializer(entries, many=True).data)
+
+class JobViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Status and progress of background jobs
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = {'list': 3, 'retrieve': 2}
+
+    def get_queryset(self):
+        queryset = Job.objects.order_by('-created_at', '-id')
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(created_by_id=self.request.user.id)
+
+
+class UploadSessionViewSet(QueryBudgetMixin, AcademicScopeMixin, mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Resumable chunked uploads of note and assignment files
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    query_budget = {'create': 4, 'retrieve': 3, 'chunk': 7, 'finalize': 20, '*': 5}
+    target_serializers = {'note': NoteSerializer, 'assignment': AssignmentSerializer}
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user_id=self.request.user.id)
+
+    def create(self, request, *args, **kwargs):
+        if self.scope.user_type == 'student':
+            return Response({'error': 'Not authorized'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        open_partial(serializer.save(user_id=self.request.user.id))
+
+    def perform_destroy(self, instance):
+        discard(instance)
+        instance.delete()
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        """
+        Upload one chunk as the raw request body with an X-Chunk-Checksum header
+        """
+        session = self.get_object()
+        try:
+            write_chunk(session, int(index), request.stream or io.BytesIO(),
+                        request.headers.get('X-Chunk-Checksum'))
+        except ValidationError as e:
+            return Response({'error': e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'index': int(index), 'missing_chunks': missing_chunks(session)})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """
+        Attach the completed upload to a new or existing note/assignment
+
+        Pass object_id to replace the file of an existing object, otherwise
+        the remaining fields (course, title, ...) create a new one. An
+        optional checksum (SHA-256 hex of the whole file) is verified first.
+        """
+        session = self.get_object()
+        if self.scope.user_type == 'student':
+            return Response({'error': 'Not authorized'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        serializer_class = self.target_serializers[session.target]
+        model = serializer_class.Meta.model
+        data = {key: value for key, value in request.data.items() if key not in ('object_id', 'checksum')}
+        object_id = request.data.get('object_id')
+
+        instance = None
+        if object_id:
+            instance = model.objects.filter(pk=object_id).first()
+            if instance is None or not self.scope.can_view_course(instance.course_id):
+                return Response({'error': f'{session.target} not found'}, 
+                              status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            upload = assembled_file(session, request.data.get('checksum'))
+        except ValidationError as e:
+            return Response({'error': e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        with upload:
+            serializer = serializer_class(
+                instance, data={**data, 'file': upload}, partial=instance is not None,
+                context=self.get_serializer_context()
+            )
+            serializer.is_valid(raise_exception=True)
+            course = serializer.validated_data.get('course') or instance.course
+            if not self.scope.can_view_course(course.id):
+                return Response({'error': 'Not authorized'}, 
+                              status=status.HTTP_403_FORBIDDEN)
+            serializer.save()
+
+        discard(session)
+        session.status = 'complete'
+        session.save(update_fields=['status', 'updated_at'])
+        return Response(serializer.data, status=status.HTTP_201_CREATED)